@@ -1,3 +1,13 @@
-from . import ariston
-
-__all__ = ['ariston', 'aristonaqua']
\ No newline at end of file
+from . import ariston
+from . import dispatcher
+from . import energy
+from . import fleet
+from . import history
+from . import metrics
+from . import profiling
+from . import segments
+from . import session
+from . import sink
+from . import transport
+
+__all__ = ['ariston', 'aristonaqua', 'dispatcher', 'energy', 'fleet', 'history', 'metrics', 'profiling', 'segments', 'session', 'sink', 'transport']
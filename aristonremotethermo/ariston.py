@@ -1,19 +1,105 @@
 """Suppoort for Ariston."""
-import calendar
+import asyncio
+import collections.abc
+import concurrent.futures
 import copy
-import datetime
+import functools
+import hashlib
+import itertools
 import logging
 import re
 import threading
+import time
+import types
 from typing import Union
 import requests
 
+from .dispatcher import SubscriberDispatcher
+from .energy import CalendarIndex, EnergyDecoder
+from .history import SensorHistory
+from .metrics import InstrumentedLock, MetricsRegistry, SHORT_BUCKETS
+from .profiling import Profiler
+from .session import SessionCache
+from .sink import HistorySink
 
-class AristonHandler:
+
+def _freeze(data):
+    """Return read-only copy of the data, dictionaries become mappingproxy and lists become tuples"""
+    if isinstance(data, dict):
+        return types.MappingProxyType({key: _freeze(value) for key, value in data.items()})
+    if isinstance(data, (list, tuple)):
+        return tuple(_freeze(value) for value in data)
+    return data
+
+
+def _unfreeze(data):
+    """Return mutable copy of frozen data"""
+    if isinstance(data, (dict, types.MappingProxyType)):
+        return {key: _unfreeze(value) for key, value in data.items()}
+    if isinstance(data, tuple):
+        return [_unfreeze(value) for value in data]
+    return data
+
+
+class SensorSnapshot(collections.abc.Mapping):
+    """
+    Immutable snapshot of sensors published by the handler.
+
+    Each sensor is a read-only mapping (lists are provided as tuples).
+    'version' increases monotonically with every published snapshot.
+    Unchanged sensors are shared between consecutive snapshots.
+    """
+
+    __slots__ = ('_sensors', 'version')
+
+    def __init__(self, sensors: dict, version: int) -> None:
+        self._sensors = sensors
+        self.version = version
+
+    def __getitem__(self, sensor):
+        return self._sensors[sensor]
+
+    def __iter__(self):
+        return iter(self._sensors)
+
+    def __len__(self):
+        return len(self._sensors)
+
+    def __repr__(self):
+        return f'SensorSnapshot(version={self.version}, sensors={len(self._sensors)})'
+
+    def __deepcopy__(self, memo):
+        return self.to_dict()
+
+    def to_dict(self) -> dict:
+        """Return mutable copy of the snapshot in form of dictionaries and lists."""
+        return {sensor: _unfreeze(data) for sensor, data in self._sensors.items()}
+
+
+class AristonAccount:
+    """
+    Ariston NET account, which can be shared by handlers of several plants (gateways).
+
+    Holds http session (cookies and connection pool), login state and list of the gateways.
+    """
+
+    def __init__(self, username: str, password: str, session: requests.Session = None) -> None:
+        self.username = username
+        self.password = password
+        self.session = session if session is not None else requests.Session()
+        self.lock = threading.Lock()
+        self.logged_in = False
+        self.gateways = []
+
+
+class AsyncAristonHandler:
     """
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    Ariston NET Remotethermo API
+    Ariston NET Remotethermo API (asyncio engine)
+
+    Scheduling of requests runs as coroutines within one event loop (see async_start and async_stop),
+    blocking http exchanges are executed in the executor so many handlers can share one loop.
 
     'username' - mandatory username;
 
@@ -21,11 +107,43 @@ class AristonHandler:
 
     'sensors' - list of wanted sensors to be monitored. Check class method api_data or method supported_sensors_get
 
-    'period_request' - period to send requests (minimum is 30 seconds)
+    'period_get_request' - period of main request with current temperatures (minimum is 30 seconds)
+
+    'request_periods' - dictionary of periods in seconds per request type overriding defaults
+    (e.g. {'errors': 120, 'ch_schedule': 3600, 'last_month': 86400}), see _REQUEST_PERIODS
+
+    'request_priorities' - dictionary of priorities per request type overriding defaults, lower number is more urgent
+    (e.g. {'energy': 0}), see _REQUEST_PRIORITIES
+
+    'set_debounce' - seconds to wait for further values before setting data, the latest value of a parameter wins
+    and intermediate values are never sent (waiting is limited to _SET_DEBOUNCE_MAX_MULTIPLYER windows),
+    default 0.1 seconds keeps the delay of setting, longer values merge more changes of e.g. a temperature slider
 
     'polling' - defines multiplication factor for waiting periods to get or set the data;
 
     'logging_level' - defines level of logging - allowed values [CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET=(default)]
+
+    'executor' - executor for blocking http exchanges, event loop default executor is used if not specified
+
+    'account' - AristonAccount shared with other handlers, new account is created if not specified
+
+    'dispatcher' - SubscriberDispatcher delivering events to subscribers, may be shared with other handlers
+
+    'ariston_url' - URL of Ariston NET cloud, may point to a local stand-in (see standin module) for testing
+
+    'session_cache' - path of the file caching login session for fast restarts (session is kept alive on stop),
+    full login is done if there is no valid cached session or the server rejects it (401, 403)
+
+    'session_cache_ttl' - seconds for which the cached session is assumed to be valid (12 hours by default)
+
+    'session' - http session of the new account, e.g. recording or replaying exchanges (see transport module),
+    cannot be combined with 'account'
+
+    'metrics' - MetricsRegistry collecting metrics of the handler (see metrics property), may be shared with other
+    handlers, samples are labeled with 'gw'
+
+    'history_capacity' - number of the latest changes of every numeric sensor kept in memory (see history method),
+    history is disabled if not specified
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     """
 
@@ -37,12 +155,19 @@ class AristonHandler:
     _MAX_RETRIES = 5
     _GET_SENSORS_PERIOD_SECONDS = 30
     _SET_SENSORS_PERIOD_SECONDS = 30
+    # same delay before setting as without debouncing, see _TIME_SPLIT
+    _SET_DEBOUNCE_SECONDS = 0.1
+    _SET_DEBOUNCE_MAX_MULTIPLYER = 5
     _MAX_ERRORS = 5
     _WAIT_PERIOD_MULTIPLYER = 5
     _TIMEOUT_MIN = 5
     _TIMEOUT_AV = 15
     _TIMEOUT_MAX = 25
     _TIME_SPLIT = 0.1
+    # reply codes of rejected session
+    _SESSION_REJECTED_CODES = [401, 403]
+    # minimum interval between two get requests
+    _MIN_REQUEST_INTERVAL = 5
 
     # Log levels
     _LEVEL_CRITICAL = "CRITICAL"
@@ -350,12 +475,75 @@ class AristonHandler:
         _PARAM_DHW_ENERGY_DELTA_LAST_YEAR,
     ]
 
+    # Energy series in energy sequences and their sensors for today, yesterday, last 7 days, this month, last month, this year, last year
+    _MAP_ENERGY_SERIES = {
+        7: ("CH", [
+            _PARAM_CH_ENERGY_TODAY,
+            _PARAM_CH_ENERGY_YESTERDAY,
+            _PARAM_CH_ENERGY_LAST_7_DAYS,
+            _PARAM_CH_ENERGY_THIS_MONTH,
+            _PARAM_CH_ENERGY_LAST_MONTH,
+            _PARAM_CH_ENERGY_THIS_YEAR,
+            _PARAM_CH_ENERGY_LAST_YEAR,
+        ]),
+        10: ("DHW", [
+            _PARAM_DHW_ENERGY_TODAY,
+            _PARAM_DHW_ENERGY_YESTERDAY,
+            _PARAM_DHW_ENERGY_LAST_7_DAYS,
+            _PARAM_DHW_ENERGY_THIS_MONTH,
+            _PARAM_DHW_ENERGY_LAST_MONTH,
+            _PARAM_DHW_ENERGY_THIS_YEAR,
+            _PARAM_DHW_ENERGY_LAST_YEAR,
+        ]),
+        1: ("CH 2", [
+            _PARAM_CH_ENERGY2_TODAY,
+            _PARAM_CH_ENERGY2_YESTERDAY,
+            _PARAM_CH_ENERGY2_LAST_7_DAYS,
+            _PARAM_CH_ENERGY2_THIS_MONTH,
+            _PARAM_CH_ENERGY2_LAST_MONTH,
+            _PARAM_CH_ENERGY2_THIS_YEAR,
+            _PARAM_CH_ENERGY2_LAST_YEAR,
+        ]),
+        2: ("DHW 2", [
+            _PARAM_DHW_ENERGY2_TODAY,
+            _PARAM_DHW_ENERGY2_YESTERDAY,
+            _PARAM_DHW_ENERGY2_LAST_7_DAYS,
+            _PARAM_DHW_ENERGY2_THIS_MONTH,
+            _PARAM_DHW_ENERGY2_LAST_MONTH,
+            _PARAM_DHW_ENERGY2_THIS_YEAR,
+            _PARAM_DHW_ENERGY2_LAST_YEAR,
+        ]),
+        20: ("CH delta", [
+            _PARAM_CH_ENERGY_DELTA_TODAY,
+            _PARAM_CH_ENERGY_DELTA_YESTERDAY,
+            _PARAM_CH_ENERGY_DELTA_LAST_7_DAYS,
+            _PARAM_CH_ENERGY_DELTA_THIS_MONTH,
+            _PARAM_CH_ENERGY_DELTA_LAST_MONTH,
+            _PARAM_CH_ENERGY_DELTA_THIS_YEAR,
+            _PARAM_CH_ENERGY_DELTA_LAST_YEAR,
+        ]),
+        21: ("DHW delta", [
+            _PARAM_DHW_ENERGY_DELTA_TODAY,
+            _PARAM_DHW_ENERGY_DELTA_YESTERDAY,
+            _PARAM_DHW_ENERGY_DELTA_LAST_7_DAYS,
+            _PARAM_DHW_ENERGY_DELTA_THIS_MONTH,
+            _PARAM_DHW_ENERGY_DELTA_LAST_MONTH,
+            _PARAM_DHW_ENERGY_DELTA_THIS_YEAR,
+            _PARAM_DHW_ENERGY_DELTA_LAST_YEAR,
+        ]),
+    }
+
     # reverse mapping of Android api to sensor names
     _MAP_ARISTON_API_TO_PARAM = {value:key for key, value in _MAP_ARISTON_ZONE_0_PARAMS.items()}
     for key, value in _MAP_ARISTON_MULTIZONE_PARAMS.items():
         _MAP_ARISTON_API_TO_PARAM[value] = key
     # reverse mapping of Web menu items to sensor names
     _MAP_ARISTON_WEB_TO_PARAM = {value:key for key, value in _MAP_ARISTON_WEB_MENU_PARAMS.items()}
+    # mapping of sensor names (including zone names) to Android api key (id, zone) in main data
+    _MAP_SENSOR_TO_API_KEY = {key: (value, 0) for key, value in _MAP_ARISTON_ZONE_0_PARAMS.items()}
+    for key, value in _MAP_ARISTON_MULTIZONE_PARAMS.items():
+        for zone in range(1, 7):
+            _MAP_SENSOR_TO_API_KEY[f'{key}_zone{zone}'] = (value, zone)
 
     # List of all sensors
     _SENSOR_LIST = [
@@ -430,20 +618,27 @@ class AristonHandler:
         for sensor in sensor_list:
             _MAP_SENSOR_TO_REQUEST[sensor] = request
 
-    # Priority lists of requests (first list is High prio and second is Low prio)
-    _REQUESTS_SEQUENCE = [
-        [
-            _REQUEST_MAIN,
-            _REQUEST_ADDITIONAL,
-            _REQUEST_ERRORS
-        ],
-        [
-            _REQUEST_CH_SCHEDULE,
-            _REQUEST_DHW_SCHEDULE,
-            _REQUEST_LAST_MONTH,
-            _REQUEST_ENERGY
-        ]
-    ]
+    # Default periods of requests in seconds, period of main request is set by period_get_request
+    _REQUEST_PERIODS = {
+        _REQUEST_MAIN: _GET_SENSORS_PERIOD_SECONDS,
+        _REQUEST_ADDITIONAL: 90,
+        _REQUEST_ERRORS: 120,
+        _REQUEST_ENERGY: 1800,
+        _REQUEST_CH_SCHEDULE: 3600,
+        _REQUEST_DHW_SCHEDULE: 3600,
+        _REQUEST_LAST_MONTH: 86400,
+    }
+
+    # Priorities of requests (lower number is more urgent), requests due at the same time are sent by priority
+    _REQUEST_PRIORITIES = {
+        _REQUEST_MAIN: 0,
+        _REQUEST_ADDITIONAL: 0,
+        _REQUEST_ERRORS: 0,
+        _REQUEST_ENERGY: 1,
+        _REQUEST_CH_SCHEDULE: 1,
+        _REQUEST_DHW_SCHEDULE: 1,
+        _REQUEST_LAST_MONTH: 1,
+    }
 
     # Keys used in structures
     _VALUE = 'value'
@@ -456,6 +651,7 @@ class AristonHandler:
     _OPTIONS_TXT = 'options_text'
     _ATTRIBUTES = "attributes"
     _ATTEMPT = "attempt"
+    _REQUESTED = "requested"
 
     # Values data for data mapping from received data to readable format
     _WEEKDAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
@@ -465,12 +661,43 @@ class AristonHandler:
     _OFF_ON_TEXT = [_OFF, _ON]
     _UNIT_KWH = 'kWh'
 
+    # Methods wrapped by an attached profiler: (fixed request type, position of request type argument)
+    _PROFILED_METHODS = {
+        "_queue_get_data": ("queue", None),
+        "_control_availability_state": (None, 0),
+        "_get_http_data": (None, 0),
+        "_store_data": (None, 1),
+        "_get_energy_data": (None, None),
+        "_preparing_setting_http_data": ("set", None),
+        "_send_set_post": ("set", None),
+        "_setting_http_data_done": ("set", None),
+        "_subscribers_sensors_inform": (None, None),
+        "_subscribers_statuses_inform": (None, None),
+    }
+
     _LOGGER = logging.getLogger(__name__)
 
 
     def _get_request_for_parameter(self, sensor):
         return self._MAP_SENSOR_TO_REQUEST[sensor]
 
+    def _request_priority(self, request_type):
+        """Priority of the request, lower number is more urgent"""
+        return self._request_priorities[request_type]
+
+
+    def _request_rank(self, request_type, now):
+        """
+        Order of due requests, lower is sent first.
+
+        Requests overdue by more than their own period go ahead of the others by their deadline regardless
+        of priority, so requests of lower priority are not starved while the urgent ones are due all the time.
+        """
+        deadline = self._request_deadlines[request_type]
+        if now - deadline > self._request_periods[request_type]:
+            return 0, deadline
+        return 1, self._request_priority(request_type), deadline
+
     def _zone_sensor_name(self, sensor, zone):
         if sensor in self._MAP_ARISTON_MULTIZONE_PARAMS:
             return f'{sensor}_zone{zone}'
@@ -485,7 +712,12 @@ class AristonHandler:
                 return origial, int(sensor[-1])
         return sensor, 0
 
+    def _mark_dirty(self, *sensors):
+        """Record sensors changed since last publishing of sensors"""
+        self._dirty_sensors.update(sensors)
+
     def _reset_sensor(self, sensor):
+        self._dirty_sensors.add(sensor)
         self._ariston_sensors[sensor] = dict()
         self._ariston_sensors[sensor][self._VALUE] = None
         self._ariston_sensors[sensor][self._UNITS] = None
@@ -506,6 +738,18 @@ class AristonHandler:
                  period_set_request: int = _SET_SENSORS_PERIOD_SECONDS,
                  set_max_retries: int = _MAX_RETRIES,
                  gw: str = "",
+                 request_periods: dict = None,
+                 request_priorities: dict = None,
+                 set_debounce: float = _SET_DEBOUNCE_SECONDS,
+                 executor: concurrent.futures.Executor = None,
+                 account: AristonAccount = None,
+                 dispatcher: SubscriberDispatcher = None,
+                 session_cache: str = None,
+                 session_cache_ttl: int = SessionCache._TTL_SECONDS,
+                 ariston_url: str = _ARISTON_URL,
+                 session: requests.Session = None,
+                 metrics: MetricsRegistry = None,
+                 history_capacity: int = None,
                  ) -> None:
         """
         Initialize API.
@@ -528,6 +772,39 @@ class AristonHandler:
         if not isinstance(set_max_retries, int) or set_max_retries < 1:
             raise Exception(f"At least 1 retry to set data is expected")
 
+        if not isinstance(ariston_url, str) or not ariston_url.startswith(("http://", "https://")):
+            raise Exception("Invalid ariston_url")
+
+        if session is not None and account is not None:
+            raise Exception("Session is taken from the account when the account is specified")
+
+        if not isinstance(set_debounce, (int, float)) or set_debounce < 0:
+            raise Exception("Debounce of setting data must be a non-negative number")
+
+        if request_periods is None:
+            request_periods = dict()
+
+        if not isinstance(request_periods, dict):
+            raise Exception("Invalid request_periods type")
+
+        for request, period in request_periods.items():
+            if request not in self._REQUEST_PERIODS:
+                raise Exception(f"Unknown request {request} in request_periods")
+            if not isinstance(period, (int, float)) or period < self._MIN_REQUEST_INTERVAL:
+                raise Exception(f"Period of {request} must be a number higher than {self._MIN_REQUEST_INTERVAL}")
+
+        if request_priorities is None:
+            request_priorities = dict()
+
+        if not isinstance(request_priorities, dict):
+            raise Exception("Invalid request_priorities type")
+
+        for request, priority in request_priorities.items():
+            if request not in self._REQUEST_PRIORITIES:
+                raise Exception(f"Unknown request {request} in request_priorities")
+            if not isinstance(priority, int) or isinstance(priority, bool):
+                raise Exception(f"Priority of {request} must be an integer")
+
         """
         Logging settings
         """
@@ -545,15 +822,24 @@ class AristonHandler:
                     self._LOGGER.warning(f"Unsupported sensor {sensor}")
                     sensors.remove(sensor)
 
+        self._ARISTON_URL = ariston_url.rstrip('/')
         self._default_gw = gw
         self._user = username
         self._password = password
         self._get_period_time = period_get_request
         self._set_period_time = period_set_request
+        self._set_debounce = set_debounce
+        # start of collecting values to be set and statistics of setting
+        self._set_debounce_since = None
+        self._set_requested = 0
+        self._set_coalesced = 0
+        self._set_posts = 0
         self._max_set_retries = set_max_retries
 
         # clear read sensor values
         self._ariston_sensors = dict()
+        self._dirty_sensors = set()
+        self._changed_sensors = set()
         self._subscribed_sensors_old_value = dict()
         for sensor in self._SENSOR_LIST:
             if sensor in self._MAP_ARISTON_MULTIZONE_PARAMS:
@@ -565,6 +851,16 @@ class AristonHandler:
                 self._reset_sensor(sensor)
                 self._subscribed_sensors_old_value[sensor] = None
         
+        self._history = SensorHistory(history_capacity) if history_capacity is not None else None
+        self._history_sinks = []
+        self._energy_sensors = {sensor for _, sensors in self._MAP_ENERGY_SERIES.values() for sensor in sensors}
+
+        # published snapshot of sensors and mutable copies of published sensors for comparison
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = SensorSnapshot({}, 0)
+        self._snapshot_source = {}
+        self._publish_sensors()
+
         # clear configuration data
         self._set_param = {}
         self._features = {}
@@ -575,17 +871,34 @@ class AristonHandler:
         self._dhw_schedule_data = {}
         self._last_month_data = {}
         self._energy_use_data = {}
+        self._energy_calendar = None
+        # digests of the last stored response bodies and statistics of unchanged responses
+        self._response_digests = {}
+        # sequence numbers of started reads and of the last stored read per request type,
+        # replies of overlapping reads which arrive after a newer reply are dropped
+        self._read_sequence = itertools.count(1)
+        self._stored_sequences = {}
+        self._response_hits = {request: 0 for request in self._MAP_REQUEST}
+        self._response_misses = {request: 0 for request in self._MAP_REQUEST}
         self._zones = []
+        # indexes of received items: (id, zone) for main data and id for additional data
+        self._main_index = {}
+        self._additional_index = {}
 
         self._last_dhw_storage_temp = None
         self._reset_set_requests()
 
         # initiate all other data
         self._errors = 0
-        self._data_lock = threading.Lock()
-        self._lock = threading.Lock()
+        self._profiler = None
+        self._metrics = metrics if metrics is not None else MetricsRegistry()
+        self._init_metrics()
+        self._data_lock = InstrumentedLock(self._metric_lock_wait, self._metric_lock_hold, gw=gw, lock="data")
+        self._lock = InstrumentedLock(self._metric_lock_wait, self._metric_lock_hold, gw=gw, lock="state")
         self._plant_id_lock = threading.Lock()
-        self._session = requests.Session()
+        self._own_account = account is None
+        self._account = account if account is not None else AristonAccount(username, password, session)
+        self._session = self._account.session
         self._login = False
         self._plant_id = ""
         self._started = False
@@ -593,47 +906,48 @@ class AristonHandler:
         self._ch_available = False
         self._dhw_available = False
         self._changing_data = False
-        self._timer_periodic_read = threading.Timer(0, self._queue_get_data)
-        self._timer_queue_delay = threading.Timer(0, self._control_availability_state, [self._REQUEST_MAIN])
-        self._timer_set_delay = threading.Timer(0, self._preparing_setting_http_data)
+        self._executor = executor
+        self._loop = None
+        self._tasks = set()
+        self._task_read = None
+        self._task_set_delay = None
+        self._task_set = None
 
         self._other_parameters = []
         for sensor in self._LIST_ARISTON_WEB_PARAMS:
             if sensor in sensors:
                 self._other_parameters.append(self._MAP_ARISTON_WEB_MENU_PARAMS[sensor])
         
-        # List of requests. First list is high priority requests and second list is low priority requests.
-        # It affects frequency of the requests
-        self._requests_lists = copy.deepcopy(self._REQUESTS_SEQUENCE)
+        # Priorities of requests, the most urgent due request is sent first
+        self._request_priorities = dict(self._REQUEST_PRIORITIES)
+        self._request_priorities.update(request_priorities)
+
+        # Periods of requests, each request is sent when its deadline passes
+        self._request_periods = dict(self._REQUEST_PERIODS)
+        self._request_periods[self._REQUEST_MAIN] = period_get_request
+        self._request_periods.update(request_periods)
 
         # If no sensors specified then no need to send the requests thus increasing frequency of fetching data for wanted sensors
         for request, sensor_list in self._MAP_REQUEST.items():
             if request != self._REQUEST_MAIN:
                 # Main requests cannot be removed
                 if not any(item in sensors for item in sensor_list):
-                    if request in self._requests_lists[0]:
-                        self._requests_lists[0].remove(request)
-                    if request in self._requests_lists[1]:
-                        self._requests_lists[1].remove(request)
-
-        # At least 1 main request is present
-        self._last_request = self._requests_lists[0][-1]
-        if self._requests_lists[1]:
-            # there are requests in low prio
-            self._last_request_low_prio = self._requests_lists[1][-1]
-        else:
-            # no requests in low prio
-            self._last_request_low_prio = None
+                    del self._request_periods[request]
+
+        # Deadlines (monotonic time) of enabled requests, all are due at start
+        self._request_deadlines = {request: 0 for request in self._request_periods}
+        self._last_request = self._REQUEST_MAIN
 
         self._subscribed = list()
         self._subscribed_args = list()
         self._subscribed_kwargs = list()
-        self._subscribed_thread = None
 
         self._subscribed2 = list()
         self._subscribed2_args = list()
         self._subscribed2_kwargs = list()
-        self._subscribed2_thread = None
+        self._dispatcher = dispatcher if dispatcher is not None else SubscriberDispatcher()
+        self._session_cache = SessionCache(session_cache, session_cache_ttl) if session_cache is not None else None
+        self._session_rejections = 0
 
         self._LOGGER.info("API initiated")
 
@@ -667,24 +981,76 @@ class AristonHandler:
         self._subscribed2_kwargs.append(kwargs)
 
 
+    def set_profiler(self, profiler: Profiler = None) -> None:
+        """
+        Attach profiler to hot paths of poll and set cycles (see profiling module), None detaches the profiler.
+
+        Methods are wrapped only while a profiler is attached.
+        """
+        for name in self._PROFILED_METHODS:
+            self.__dict__.pop(name, None)
+        self._profiler = profiler
+        if profiler is not None:
+            for name, (request_type, argument) in self._PROFILED_METHODS.items():
+                setattr(self, name, profiler.wrap(name, getattr(self, name), request_type=request_type, argument=argument))
+
+
+    def add_history_sink(self, sink: HistorySink) -> None:
+        """Add sink of changed sensor values and decoded energy slots (see sink module), e.g. SQLiteSink."""
+        if sink not in self._history_sinks:
+            self._history_sinks = self._history_sinks + [sink]
+
+
+    def remove_history_sink(self, sink: HistorySink) -> None:
+        """Remove sink of history, the sink is not closed."""
+        self._history_sinks = [item for item in self._history_sinks if item is not sink]
+
+
+    def _write_history_sinks(self, changed_data):
+        """Pass changed sensors and energy slots to history sinks"""
+        timestamp = time.time()
+        energy_slots = {
+            sensor: data[self._ATTRIBUTES]
+            for sensor, data in changed_data.items()
+            if sensor in self._energy_sensors and data[self._ATTRIBUTES]
+        }
+        for sink in self._history_sinks:
+            try:
+                sink.write_values(timestamp, changed_data)
+                if energy_slots:
+                    sink.write_energy(timestamp, energy_slots)
+            except Exception as ex:
+                self._LOGGER.warning(f"History sink {sink} failed: {ex}")
+
+
     def _subscribers_sensors_inform(self):
         """
         Inform subscribers about changed sensors
         first argument is a dictionary of changed sensors
         """
 
+        with self._snapshot_lock:
+            changed_sensors, self._changed_sensors = self._changed_sensors, set()
+            snapshot = self._snapshot
+
         changed_data = dict()
 
-        for sensor in self._ariston_sensors:
-            if self._ariston_sensors[sensor][self._VALUE] != self._subscribed_sensors_old_value[sensor]:
-                self._subscribed_sensors_old_value[sensor] = self._ariston_sensors[sensor][self._VALUE]
-                changed_data[sensor] = copy.deepcopy(self._ariston_sensors[sensor])
+        # Only sensors changed in published snapshots are checked
+        for sensor in changed_sensors:
+            value = snapshot[sensor][self._VALUE]
+            if value != self._subscribed_sensors_old_value[sensor]:
+                self._subscribed_sensors_old_value[sensor] = value
+                changed_data[sensor] = snapshot[sensor]
 
         if changed_data:
+            # one read-only payload is shared by all subscribers
+            changed_data = types.MappingProxyType(changed_data)
+            if self._history_sinks:
+                self._write_history_sinks(changed_data)
             for iteration in range(len(self._subscribed)):
-                self._subscribed_thread = threading.Timer(
-                    self._TIME_SPLIT, self._subscribed[iteration], args=(changed_data, *self._subscribed_args[iteration]), kwargs=self._subscribed_kwargs[iteration])
-                self._subscribed_thread.start()
+                self._dispatcher.dispatch(
+                    (id(self), 'sensors', iteration),
+                    self._subscribed[iteration], changed_data, self._subscribed_args[iteration], self._subscribed_kwargs[iteration])
 
 
     def _subscribers_statuses_inform(self):
@@ -729,13 +1095,117 @@ class AristonHandler:
 
         if changed_data:
             for iteration in range(len(self._subscribed2)):
-                self._subscribed2_thread = threading.Timer(
-                    self._TIME_SPLIT, self._subscribed2[iteration], args=(changed_data, *self._subscribed2_args[iteration]), kwargs=self._subscribed2_kwargs[iteration])
-                self._subscribed2_thread.start()
+                self._dispatcher.dispatch(
+                    (id(self), 'statuses', iteration),
+                    self._subscribed2[iteration], changed_data, self._subscribed2_args[iteration], self._subscribed2_kwargs[iteration])
 
 
-    def _json_validator(self, data, request_type):
-        json_data = data.json()
+    def _publish_sensors(self):
+        """
+        Publish snapshot of sensors.
+
+        Only sensors marked as dirty are checked and copied if changed, the others are shared with the previous snapshot.
+        Returns list of changed sensors.
+        """
+        with self._snapshot_lock:
+            dirty_sensors, self._dirty_sensors = self._dirty_sensors, set()
+            previous = self._snapshot
+            sensors = None
+            changed_sensors = []
+            for sensor in dirty_sensors:
+                data = self._ariston_sensors[sensor]
+                if sensor in previous and self._snapshot_source[sensor] == data:
+                    continue
+                if sensors is None:
+                    sensors = dict(previous._sensors)
+                self._snapshot_source[sensor] = copy.deepcopy(data)
+                sensors[sensor] = _freeze(data)
+                self._changed_sensors.add(sensor)
+                changed_sensors.append(sensor)
+            if sensors is not None:
+                self._snapshot = SensorSnapshot(sensors, previous.version + 1)
+        return changed_sensors
+
+
+    def _init_metrics(self):
+        """Create metrics of the handler"""
+        metrics = self._metrics
+        gw = self._default_gw
+        self._metric_http_seconds = metrics.histogram(
+            "ariston_http_request_seconds", "Duration of http exchanges per endpoint", ("gw", "endpoint"))
+        self._metric_http_timeouts = metrics.counter(
+            "ariston_http_timeouts_total", "Timed out http exchanges per endpoint", ("gw", "endpoint"))
+        self._metric_http_errors = metrics.counter(
+            "ariston_http_errors_total", "Failed http exchanges per endpoint and reply code", ("gw", "endpoint", "code"))
+        self._metric_errors_detected = metrics.counter(
+            "ariston_errors_detected_total", "Failed read cycles", ("gw",))
+        self._metric_store_seconds = metrics.histogram(
+            "ariston_store_data_seconds", "Duration of storing received data per request type", ("gw", "request"),
+            buckets=SHORT_BUCKETS)
+        self._metric_lock_wait = metrics.histogram(
+            "ariston_lock_wait_seconds", "Time waiting for a lock", ("gw", "lock"), buckets=SHORT_BUCKETS)
+        self._metric_lock_hold = metrics.histogram(
+            "ariston_lock_hold_seconds", "Time holding a lock", ("gw", "lock"), buckets=SHORT_BUCKETS)
+        metrics.gauge("ariston_consecutive_errors", "Consecutive failed read cycles", ("gw",)).set_function(
+            lambda: self._errors, gw=gw)
+        metrics.gauge("ariston_backoff", "1 if reading is slowed down due to too many errors", ("gw",)).set_function(
+            lambda: int(self._errors >= self._MAX_ERRORS), gw=gw)
+        metrics.gauge("ariston_available", "1 if the plant is available", ("gw",)).set_function(
+            lambda: int(self.available), gw=gw)
+        metrics.gauge("ariston_subscriber_queue_depth", "Events waiting to be delivered to subscribers", ("gw",)).set_function(
+            lambda: self.subscriber_queue_depth, gw=gw)
+        metrics.gauge("ariston_set_pending", "Parameters waiting to be set", ("gw",)).set_function(
+            lambda: len(self._set_param), gw=gw)
+        metrics.gauge("ariston_set_pending_age_seconds", "Age of the oldest parameter waiting to be set", ("gw",)).set_function(
+            self._set_pending_age, gw=gw)
+
+
+    def _set_pending_age(self):
+        """Seconds since the oldest pending parameter was requested to be set"""
+        requested = [item[self._REQUESTED] for item in list(self._set_param.values())]
+        return time.monotonic() - min(requested) if requested else 0
+
+
+    def _decode_response(self, resp, request_type):
+        """Decode body of the response, the only place where received JSON is parsed"""
+        try:
+            return resp.json()
+        except ValueError as ex:
+            self._LOGGER.warning(f"JSON could not be decoded for the request {request_type}: {ex}")
+            raise Exception(f"JSON could not be decoded for the request {request_type}: {ex}")
+
+
+    def _setting_request(self, request_type):
+        """Check if some parameter read by the request is being set"""
+        return any(self._get_request_for_parameter(parameter) == request_type for parameter in self._set_param)
+
+
+    def _store_response(self, resp, request_type):
+        """
+        Store body of the response unless it is the same as the last stored body of the request type.
+
+        Unchanged bodies are neither decoded nor stored. Bodies received while parameters of the request
+        are being set are always stored, since visible values depend on the parameters being set.
+        """
+        digest = hashlib.blake2b(resp.content, digest_size=16)
+        if request_type == self._REQUEST_ENERGY:
+            # energy values are bucketed by the wall clock
+            digest.update(repr(CalendarIndex.slot_key()).encode())
+        digest = digest.digest()
+        if not self._setting_request(request_type) and self._response_digests.get(request_type) == digest:
+            self._response_hits[request_type] += 1
+            self._LOGGER.debug(f'Unchanged data for {request_type}')
+            return
+        self._response_misses[request_type] += 1
+        self._response_digests.pop(request_type, None)
+        start = time.perf_counter()
+        self._store_data(self._decode_response(resp, request_type), request_type)
+        self._metric_store_seconds.observe(time.perf_counter() - start, gw=self._default_gw, request=request_type)
+        if not self._setting_request(request_type):
+            self._response_digests[request_type] = digest
+
+
+    def _json_validator(self, json_data, request_type):
         try:
             if isinstance(json_data, dict):
                 if json_data == {}:
@@ -801,17 +1271,72 @@ class AristonHandler:
 
 
     @property
-    def sensor_values(self) -> dict:
+    def sensor_values(self) -> SensorSnapshot:
         """
-        Return dictionary of sensors and their values.
+        Return immutable snapshot (mapping) of sensors and their values.
 
         'value' key is used to fetch value of the specific sensor/parameter.
-        Some sensors/parameters might return dictionaries.
+        Some sensors/parameters might return mappings.
 
         'units' key is used to fetch units of measurement for specific sensor/parameter.
 
+        Snapshot is consistent and cheap to fetch, its 'version' attribute identifies published data.
+        Use method 'to_dict' of the snapshot to get a mutable copy.
+        """
+        return self._snapshot
+
+
+    @property
+    def sensor_values_version(self) -> int:
+        """Return version of the latest published sensor values."""
+        return self._snapshot.version
+
+
+    @property
+    def set_statistics(self) -> dict:
+        """
+        Return statistics of setting data.
+
+        'requested' - values requested to be set, 'coalesced' - values replaced by a newer value before being sent,
+        'posts' - http requests sent to set data.
         """
-        return copy.deepcopy(self._ariston_sensors)
+        return {
+            'requested': self._set_requested,
+            'coalesced': self._set_coalesced,
+            'posts': self._set_posts,
+        }
+
+
+    @property
+    def response_statistics(self) -> dict:
+        """Return number of unchanged (hits) and changed (misses) response bodies per request type."""
+        return {
+            request: {'hits': self._response_hits[request], 'misses': self._response_misses[request]}
+            for request in self._MAP_REQUEST
+        }
+
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """Return registry of metrics, see MetricsRegistry.snapshot and MetricsRegistry.exposition."""
+        return self._metrics
+
+
+    def history(self, sensor: str, since: float = None) -> tuple:
+        """
+        Return tuple of memoryviews (timestamps, values) with changes of the numeric sensor, see SensorHistory.history.
+
+        'since' - only changes at or after the timestamp (seconds since the epoch) are returned.
+        """
+        if self._history is None:
+            raise Exception("History is not enabled, specify history_capacity")
+        return self._history.history(sensor, since)
+
+
+    @property
+    def subscriber_queue_depth(self) -> int:
+        """Return number of events waiting to be delivered to subscribers."""
+        return self._dispatcher.queue_depth
 
 
     @property
@@ -853,19 +1378,34 @@ class AristonHandler:
 
         data from this property is used for 'set_http_data' method.
         """
-        sensors_dictionary = copy.deepcopy(self._ariston_sensors)
-        for parameter in self._ariston_sensors:
-            if parameter in self._SENSOR_SET_LIST:
+        sensors_dictionary = dict()
+        snapshot = self._snapshot
+        for parameter in self._SENSOR_SET_LIST:
+            if parameter in snapshot:
+                sensors_dictionary[parameter] = _unfreeze(snapshot[parameter])
                 del sensors_dictionary[parameter][self._VALUE]
                 del sensors_dictionary[parameter][self._UNITS]
                 del sensors_dictionary[parameter][self._ATTRIBUTES]
-            else:
-                del sensors_dictionary[parameter]
         return sensors_dictionary
 
 
+    def _observe_http_exception(self, endpoint, ex):
+        """Count failed http exchange"""
+        if isinstance(ex, requests.exceptions.Timeout):
+            self._metric_http_timeouts.inc(gw=self._default_gw, endpoint=endpoint)
+        self._metric_http_errors.inc(gw=self._default_gw, endpoint=endpoint, code=type(ex).__name__)
+
+
+    def _observe_http_reply(self, endpoint, resp, start):
+        """Observe duration of http exchange and count error replies"""
+        self._metric_http_seconds.observe(time.perf_counter() - start, gw=self._default_gw, endpoint=endpoint)
+        if not resp.ok:
+            self._metric_http_errors.inc(gw=self._default_gw, endpoint=endpoint, code=str(resp.status_code))
+
+
     def _request_post(self, url, json_data, timeout=_TIMEOUT_MIN, error_msg=''):
         """ post request """
+        start = time.perf_counter()
         try:
             resp = self._session.post(
                 url,
@@ -873,8 +1413,12 @@ class AristonHandler:
                 json=json_data,
                 verify=True)
         except requests.exceptions.RequestException as ex:
+            self._observe_http_exception(error_msg, ex)
             self._LOGGER.warning(f'{error_msg} exception: {ex}')
             raise Exception(f'{error_msg} exception: {ex}')
+        self._observe_http_reply(error_msg, resp, start)
+        if resp.status_code in self._SESSION_REJECTED_CODES:
+            self._session_rejected()
         if not resp.ok:
             self._LOGGER.warning(f'{error_msg} reply code: {resp.status_code}')
             self._LOGGER.warning(f'{resp.text}')
@@ -883,15 +1427,20 @@ class AristonHandler:
 
 
     def _request_get(self, url, timeout=_TIMEOUT_MIN, error_msg='', ignore_errors=False):
+        start = time.perf_counter()
         try:
             resp = self._session.get(
                 url,
                 timeout=timeout,
                 verify=True)
         except requests.exceptions.RequestException as ex:
+            self._observe_http_exception(error_msg, ex)
             self._LOGGER.warning(f'{error_msg} exception: {ex}')
             if not ignore_errors:
                 raise Exception(f'{error_msg} exception: {ex}')
+        self._observe_http_reply(error_msg, resp, start)
+        if resp.status_code in self._SESSION_REJECTED_CODES:
+            self._session_rejected()
         if not resp.ok:
             log_text = True
             if resp.status_code == 500:
@@ -902,9 +1451,11 @@ class AristonHandler:
                         check_menu = f"&quot;{html_item}&quot;"
                         if check_menu in re_string:
                             self._LOGGER.error(f'Unsupported sensor {sensor} detected with menu item {menu_item}')
-                            self._other_parameters.remove(menu_item)
-                            if not self._other_parameters:
-                                self._requests_lists[0].remove(self._REQUEST_ADDITIONAL)
+                            with self._data_lock:
+                                self._other_parameters.remove(menu_item)
+                                if not self._other_parameters:
+                                    self._request_periods.pop(self._REQUEST_ADDITIONAL, None)
+                                    self._request_deadlines.pop(self._REQUEST_ADDITIONAL, None)
                             log_text = False
             self._LOGGER.warning(f'{error_msg} reply code: {resp.status_code}')
             if log_text:
@@ -914,28 +1465,72 @@ class AristonHandler:
         return resp
 
 
+    def _restore_session(self):
+        """Restore login from the session cache, returns True if restored"""
+        if self._session_cache is None:
+            return False
+        cached = self._session_cache.load(self._user, self._default_gw)
+        if cached is None:
+            return False
+        with self._account.lock:
+            self._session_cache.restore_cookies(self._session, cached)
+            self._account.logged_in = True
+            if cached["plant_id"] not in self._account.gateways:
+                self._account.gateways.append(cached["plant_id"])
+        with self._plant_id_lock:
+            self._features = cached["features"]
+            if cached["zones"]:
+                self._zones = cached["zones"]
+            self._plant_id = cached["plant_id"]
+            self._gw_name = self._plant_id + '_'
+            self._login = True
+        self._LOGGER.info(f'Plant ID is {self._plant_id} (cached session)')
+        return True
+
+
+    def _session_rejected(self):
+        """Server rejected the session, full login is needed"""
+        if not self._login:
+            # login in progress
+            return
+        self._LOGGER.warning("Session rejected, login is needed")
+        self._session_rejections += 1
+        if self._session_cache is not None:
+            self._session_cache.invalidate()
+        with self._plant_id_lock:
+            self._login = False
+        with self._account.lock:
+            self._account.logged_in = False
+
+
     def _login_session(self):
         """Login to fetch Ariston Plant ID and confirm login"""
+        if not self._login and self._started and self._restore_session():
+            return
         if not self._login and self._started:
-            # First login
-            login_data = {
-                "email": self._user,
-                "password": self._password,
-                "rememberMe": False,
-                "language": "English_Us"
-                }
-            self._request_post(
-                url=f'{self._ARISTON_URL}/R2/Account/Login?returnUrl=%2FR2%2FHome',
-                json_data=login_data,
-                error_msg='Login'
-            )
-    
-            # Fetch plant IDs
-            resp = self._request_get(
-                url=f'{self._ARISTON_URL}/api/v2/remote/plants/lite',
-                error_msg='Gateways'
-            )
-            gateways = [item['gwId'] for item in resp.json()]
+            with self._account.lock:
+                if not self._account.logged_in:
+                    # First login, the account might be already logged in by other plant's handler
+                    login_data = {
+                        "email": self._user,
+                        "password": self._password,
+                        "rememberMe": False,
+                        "language": "English_Us"
+                        }
+                    self._request_post(
+                        url=f'{self._ARISTON_URL}/R2/Account/Login?returnUrl=%2FR2%2FHome',
+                        json_data=login_data,
+                        error_msg='Login'
+                    )
+
+                    # Fetch plant IDs
+                    resp = self._request_get(
+                        url=f'{self._ARISTON_URL}/api/v2/remote/plants/lite',
+                        error_msg='Gateways'
+                    )
+                    self._account.gateways = [item['gwId'] for item in resp.json()]
+                    self._account.logged_in = True
+                gateways = list(self._account.gateways)
             
             # ZMIENIONY KOD - jeśli podano Gateway ID ręcznie, użyj go bez walidacji
             if self._default_gw:
@@ -964,13 +1559,16 @@ class AristonHandler:
             features = resp.json()
             if plant_id:
                 with self._plant_id_lock:
-                    self._features = copy.deepcopy(features)
+                    self._features = features
                     if self._features["zones"]:
                         self._zones = [item["num"] for item in self._features["zones"]]
                     self._plant_id = plant_id
                     self._gw_name = plant_id + '_'
                     self._login = True
                     self._LOGGER.info(f'Plant ID is {self._plant_id}')
+                if self._session_cache is not None:
+                    with self._account.lock:
+                        self._session_cache.store(self._user, self._session, plant_id, self._features, self._zones)
         return
 
 
@@ -993,27 +1591,24 @@ class AristonHandler:
         value = None
         request_type = self._get_request_for_parameter(sensor)
         if request_type == self._REQUEST_MAIN:
-            original_sensor, zone = self._zone_sensor_split(sensor)
-            for item in self._main_data["items"]:
-                if original_sensor == self._MAP_ARISTON_API_TO_PARAM[item["id"]] and zone == item["zone"]:
-                    value = item["value"]
-                    if "options" in item:
-                        use_index = item["options"].index(int(item["value"]))
-                        if "optTexts" in item:
-                            value = item["optTexts"][use_index]
-                        elif item["options"] == self._OFF_ON_NUMERAL:
-                            value = self._OFF_ON_TEXT[use_index]
-                    break
+            item = self._main_index.get(self._MAP_SENSOR_TO_API_KEY.get(sensor))
+            if item is not None:
+                value = item["value"]
+                if "options" in item:
+                    use_index = item["options"].index(int(item["value"]))
+                    if "optTexts" in item:
+                        value = item["optTexts"][use_index]
+                    elif item["options"] == self._OFF_ON_NUMERAL:
+                        value = self._OFF_ON_TEXT[use_index]
         elif request_type == self._REQUEST_ADDITIONAL:
-            for item in self._additional_data["data"]:
-                if sensor == self._MAP_ARISTON_WEB_TO_PARAM[item["id"]]:
-                    value = item["value"]
-                    if "dropDownOptions" in item and item["dropDownOptions"]:
-                        for option in item["dropDownOptions"]:
-                            if option["value"] == item["value"]:
-                                value = option["text"]
-                                break
-                    break
+            item = self._additional_index.get(self._MAP_ARISTON_WEB_MENU_PARAMS.get(sensor))
+            if item is not None:
+                value = item["value"]
+                if "dropDownOptions" in item and item["dropDownOptions"]:
+                    for option in item["dropDownOptions"]:
+                        if option["value"] == item["value"]:
+                            value = option["text"]
+                            break
         if sensor == self._PARAM_DHW_FLAME:
             value = None
             try:
@@ -1063,21 +1658,29 @@ class AristonHandler:
         return attributes
 
 
-    def _store_data(self, resp, request_type=""):
-        """Store received dictionary"""
-        if not self._json_validator(resp, request_type):
+    def _store_data(self, json_data, request_type=""):
+        """
+        Store received decoded JSON data.
+
+        Decoded data is owned by the handler afterwards thus it is stored without copying.
+        """
+        if not self._json_validator(json_data, request_type):
             self._LOGGER.warning(f"JSON did not pass validation for the request {request_type}")
             raise Exception(f"JSON did not pass validation for the request {request_type}")
 
         if request_type == self._REQUEST_MAIN:
 
-            self._main_data = copy.deepcopy(resp.json())
+            self._main_data = json_data
+            self._main_index = {}
+            for item in self._main_data["items"]:
+                self._main_index.setdefault((item["id"], item["zone"]), item)
             for item in self._main_data["items"]:
                 try:
                     original_sensor = self._MAP_ARISTON_API_TO_PARAM[item["id"]]
                     zone = item["zone"]
                     sensor = self._zone_sensor_name(original_sensor, zone=zone)
                     self._ariston_sensors[sensor]
+                    self._mark_dirty(sensor)
                     try:
                         self._ariston_sensors[sensor][self._VALUE] = self._get_visible_sensor_value(sensor)
                         if "min" in item:
@@ -1089,9 +1692,9 @@ class AristonHandler:
                         if "unit" in item and item["unit"]:
                             self._ariston_sensors[sensor][self._UNITS] = item["unit"]
                         if "options" in item:
-                            self._ariston_sensors[sensor][self._OPTIONS] = copy.deepcopy(item["options"])
+                            self._ariston_sensors[sensor][self._OPTIONS] = list(item["options"])
                             if "optTexts" in item:
-                                self._ariston_sensors[sensor][self._OPTIONS_TXT] = copy.deepcopy(item["optTexts"])
+                                self._ariston_sensors[sensor][self._OPTIONS_TXT] = list(item["optTexts"])
                             elif item["options"] == self._OFF_ON_NUMERAL:
                                 self._ariston_sensors[sensor][self._OPTIONS_TXT] = self._OFF_ON_TEXT
                     except Exception as ex:
@@ -1104,6 +1707,7 @@ class AristonHandler:
 
             # Extrapolate DHW Flame
             sensor = self._PARAM_DHW_FLAME
+            self._mark_dirty(sensor)
             dhw_flame = self._get_visible_sensor_value(sensor)
             self._ariston_sensors[sensor][self._VALUE] = dhw_flame
             if dhw_flame:
@@ -1115,6 +1719,7 @@ class AristonHandler:
 
             # Fix min and Max for CH set temperature
             for zone in self._zones:
+                self._mark_dirty(self._zone_sensor_name(self._PARAM_CH_SET_TEMPERATURE, zone))
                 self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_SET_TEMPERATURE, zone)][self._MIN] = \
                     self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone)][self._MIN]
                 self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_SET_TEMPERATURE, zone)][self._MAX] = \
@@ -1124,8 +1729,9 @@ class AristonHandler:
 
         elif request_type == self._REQUEST_ERRORS:
 
-            self._error_data = copy.deepcopy(resp.json())
+            self._error_data = json_data
             sensor = self._PARAM_ERRORS_COUNT
+            self._mark_dirty(sensor)
             try:
                 # TEST DATA BELOW FOR PARSING PURPOSES
                 # self._error_data = [{"gw":"F0AD4E0590BD","timestamp":"2022-07-14T10:55:04","fault":45,"mult":0,"code":"501","pri":1053500,"errDex":"No flame detected","res":False,"blk":True}]
@@ -1140,8 +1746,9 @@ class AristonHandler:
 
         elif request_type == self._REQUEST_CH_SCHEDULE:
 
-            self._ch_schedule_data = copy.deepcopy(resp.json())
+            self._ch_schedule_data = json_data
             sensor = self._PARAM_CH_PROGRAM
+            self._mark_dirty(sensor)
             try:
                 self._ariston_sensors[sensor][self._VALUE] = "Available"
                 self._ariston_sensors[sensor][self._ATTRIBUTES] = self._schedule_attributes(self._ch_schedule_data["ChZn1"]["plans"])
@@ -1151,8 +1758,9 @@ class AristonHandler:
 
         elif request_type == self._REQUEST_DHW_SCHEDULE:
 
-            self._dhw_schedule_data = copy.deepcopy(resp.json())
+            self._dhw_schedule_data = json_data
             sensor = self._PARAM_DHW_PROGRAM
+            self._mark_dirty(sensor)
             try:
                 self._ariston_sensors[sensor][self._VALUE] = "Available"
                 self._ariston_sensors[sensor][self._ATTRIBUTES] = self._schedule_attributes(self._dhw_schedule_data["Dhw"]["plans"])
@@ -1162,11 +1770,15 @@ class AristonHandler:
 
         elif request_type == self._REQUEST_ADDITIONAL:
             
-            self._additional_data = copy.deepcopy(resp.json())
+            self._additional_data = json_data
+            self._additional_index = {}
+            for item in self._additional_data["data"]:
+                self._additional_index.setdefault(item["id"], item)
             for item in self._additional_data["data"]:
                 try:
                     sensor = self._MAP_ARISTON_WEB_TO_PARAM[item["id"]]
                     self._ariston_sensors[sensor]
+                    self._mark_dirty(sensor)
                     try:
                         self._ariston_sensors[sensor][self._VALUE] = self._get_visible_sensor_value(sensor)
                         if "min" in item:
@@ -1190,7 +1802,7 @@ class AristonHandler:
 
         elif request_type == self._REQUEST_LAST_MONTH:
 
-            self._last_month_data = copy.deepcopy(resp.json())
+            self._last_month_data = json_data
             self._reset_sensor(self._PARAM_CH_LAST_MONTH_GAS)
             self._reset_sensor(self._PARAM_CH_LAST_MONTH_ELECTRICITY)
             self._reset_sensor(self._PARAM_DHW_LAST_MONTH_GAS)
@@ -1227,423 +1839,59 @@ class AristonHandler:
                 sum_energy_new = 0
                 for item in self._energy_use_data:
                     sum_energy_old += sum(item['v'])
-                for item in resp.json():
+                for item in json_data:
                     sum_energy_new += sum(item['v'])
                 if sum_energy_old > 0 and sum_energy_new == 0:
                     # if non-zero values are present and new value is zero - ignore it 
                     return
 
-            self._energy_use_data = copy.deepcopy(resp.json())
-            this_month = datetime.date.today().month
-            this_year = datetime.date.today().year
-            this_day = datetime.date.today().day
-            this_day_week = datetime.date.today().weekday()
-            this_hour = datetime.datetime.now().hour
-            CH_ENERGY = 7
-            DHW_ENERGY = 10
-            CH_ENERGY2 = 1
-            DHW_ENERGY2 = 2
-            CH_ENERGY_DELTA = 20
-            DHW_ENERGY_DELTA = 21
-            # 2hour during scanning is decreased by 2 at the beginning
-            if this_hour % 2 == 1:
-                # odd value means we calculate even value and add 2 hours due to following decrease
-                this_2hour = (this_hour // 2) * 2 + 2
-            else:
-                # we assume that previous 2 hours would be used
-                this_2hour = this_hour + 2
-            try:
-                (
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    CH_ENERGY,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_LAST_YEAR][self._UNITS] = self._UNIT_KWH
-            except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for CH, {ex}')
-                self._reset_sensor(self._PARAM_CH_ENERGY_TODAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY_YESTERDAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_CH_ENERGY_THIS_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY_LAST_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY_THIS_YEAR)
-                self._reset_sensor(self._PARAM_CH_ENERGY_LAST_YEAR)
+            self._energy_use_data = json_data
+            self._mark_dirty(*self._LIST_ENERGY)
+            # sequences are bucketed once, calendar index is shared by all series and kept until 2 hour slot changes
+            energy_decoder = EnergyDecoder(calendar_index=self._energy_calendar)
+            self._energy_calendar = energy_decoder.calendar_index
             try:
-                (
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    DHW_ENERGY,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_LAST_YEAR][self._UNITS] = self._UNIT_KWH
+                energy_decoder.load(self._energy_use_data)
             except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for DHW, {ex}')
-                self._reset_sensor(self._PARAM_DHW_ENERGY_TODAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_YESTERDAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_THIS_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_LAST_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_THIS_YEAR)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_LAST_YEAR)
-            try:
-                (
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    CH_ENERGY2,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY2_LAST_YEAR][self._UNITS] = self._UNIT_KWH
-            except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for CH 2, {ex}')
-                self._reset_sensor(self._PARAM_CH_ENERGY2_TODAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_YESTERDAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_THIS_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_LAST_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_THIS_YEAR)
-                self._reset_sensor(self._PARAM_CH_ENERGY2_LAST_YEAR)
-            try:
-                (
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    DHW_ENERGY2,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY2_LAST_YEAR][self._UNITS] = self._UNIT_KWH
-            except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for DHW 2, {ex}')
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_TODAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_YESTERDAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_THIS_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_LAST_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_THIS_YEAR)
-                self._reset_sensor(self._PARAM_DHW_ENERGY2_LAST_YEAR)
-            try:
-                (
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    CH_ENERGY_DELTA,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_CH_ENERGY_DELTA_LAST_YEAR][self._UNITS] = self._UNIT_KWH
-            except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for CH 2, {ex}')
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_TODAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_YESTERDAY)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_THIS_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_LAST_MONTH)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_THIS_YEAR)
-                self._reset_sensor(self._PARAM_CH_ENERGY_DELTA_LAST_YEAR)
-            try:
-                (
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_TODAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_YESTERDAY][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_7_DAYS][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_MONTH][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_YEAR][self._VALUE],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_TODAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_YESTERDAY][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_7_DAYS][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_MONTH][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_YEAR][self._ATTRIBUTES],
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_YEAR][self._ATTRIBUTES],
-                    found_key,
-                ) = self._get_energy_data(
-                    DHW_ENERGY_DELTA,
-                    this_year=this_year,
-                    this_month=this_month,
-                    this_day=this_day,
-                    this_day_week=this_day_week,
-                    this_2hour=this_2hour)
-                if found_key:
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_TODAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_YESTERDAY][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_7_DAYS][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_MONTH][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_THIS_YEAR][self._UNITS] = self._UNIT_KWH
-                    self._ariston_sensors[self._PARAM_DHW_ENERGY_DELTA_LAST_YEAR][self._UNITS] = self._UNIT_KWH
-            except Exception as ex:
-                self._LOGGER.warn(f'Issue handling energy used for DHW 2, {ex}')
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_TODAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_YESTERDAY)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_LAST_7_DAYS)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_THIS_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_LAST_MONTH)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_THIS_YEAR)
-                self._reset_sensor(self._PARAM_DHW_ENERGY_DELTA_LAST_YEAR)
+                self._LOGGER.warn(f'Issue handling energy used, {ex}')
+            for k_num, (series_name, sensors) in self._MAP_ENERGY_SERIES.items():
+                try:
+                    energy_data = self._get_energy_data(energy_decoder, k_num)
+                    found_key = energy_data[-1]
+                    for index, sensor in enumerate(sensors):
+                        self._ariston_sensors[sensor][self._VALUE] = energy_data[index]
+                        self._ariston_sensors[sensor][self._ATTRIBUTES] = energy_data[index + len(sensors)]
+                        if found_key:
+                            self._ariston_sensors[sensor][self._UNITS] = self._UNIT_KWH
+                except Exception as ex:
+                    self._LOGGER.warn(f'Issue handling energy used for {series_name}, {ex}')
+                    for sensor in sensors:
+                        self._reset_sensor(sensor)
 
+        changed_sensors = self._publish_sensors()
+        if self._history is not None:
+            timestamp = time.time()
+            for sensor in changed_sensors:
+                self._history.append(sensor, timestamp, self._ariston_sensors[sensor][self._VALUE])
         self._subscribers_sensors_inform()
 
 
-    def _get_energy_data(self, k_num, this_year, this_month, this_day, this_day_week, this_2hour):
-        energy_today = 0
-        energy_yesterday = 0
-        energy_last_7_days = 0
-        energy_this_month = 0
-        energy_last_month = 0
-        energy_this_year = 0
-        energy_last_year = 0
-        energy_today_attr = {}
-        energy_yesterday_attr = {}
-        energy_last_7_days_attr = {}
-        energy_this_month_attr = {}
-        energy_last_month_attr = {}
-        energy_this_year_attr = {}
-        energy_last_year_attr = {}
-        hour_text = "{}_{}_{:02}_{:02}"
-        weekday_text = "{}_{}_{:02}_{}"
-        month_text = "{}_{}_{:02}"
-        year_text = "{}_{}"
-        found_key = False
-        for item in self._energy_use_data:
-            if item["k"] == k_num:
-                found_key = True
-                scan_month = this_month
-                scan_year = this_year
-                scan_day = this_day
-                scan_day_week = this_day_week
-                scan_2hour = this_2hour
-                scan_break = 0
-                if item['p'] == 1:
-                    prev_day, prev_month, prev_year, _ = self._get_prev_day(day=this_day, month=this_month, year=this_year, scan_break=0)
-                    prev_day_2, prev_month_2, prev_year_2, _ = self._get_prev_day(day=prev_day, month=prev_month, year=prev_year, scan_break=0)
-                    use_day, use_month, use_year = this_day, this_month, this_year
-                    if this_2hour == 2:
-                        midnight = True
-                    else:
-                        midnight = False
-                    for value in reversed(item['v']):
-                        scan_2hour, scan_break = self._get_prev_hour(hour=scan_2hour, scan_break=scan_break)
-                        if midnight and scan_break == 1:
-                            # ignore first break
-                            scan_break = 0
-                            use_day, use_month, use_year = prev_day, prev_month, prev_year
-                            prev_day, prev_month, prev_year = prev_day_2, prev_month_2, prev_year_2
-                            midnight = False
-                        if scan_break == 0:
-                            energy_today_attr[hour_text.format(use_year, calendar.month_abbr[use_month], use_day, scan_2hour)] = value
-                            energy_today += value
-                        elif scan_break == 1:
-                            energy_yesterday_attr[hour_text.format(prev_year, calendar.month_abbr[prev_month], prev_day, scan_2hour)] = value
-                            energy_yesterday += value
-                if item['p'] == 2:
-                    for value in reversed(item['v']):
-                        scan_day, scan_month, scan_year, _ = self._get_prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=0)
-                        scan_day_week = self._get_prev_day_week(day=scan_day_week)
-                        energy_last_7_days_attr[weekday_text.format(scan_year, calendar.month_abbr[scan_month], scan_day, calendar.day_abbr[scan_day_week])] = value
-                        energy_last_7_days += value
-                if item['p'] == 3:
-                    energy_this_month_attr[month_text.format(this_year, calendar.month_abbr[this_month], this_day)] = energy_today
-                    energy_this_month += energy_today
-                    for value in reversed(item['v']):
-                        scan_day, scan_month, scan_year, scan_break = self._get_prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=scan_break)
-                        if scan_break == 0:
-                            energy_this_month_attr[month_text.format(scan_year, calendar.month_abbr[scan_month], scan_day)] = value
-                            energy_this_month += value
-                        elif scan_break == 1:
-                            energy_last_month_attr[month_text.format(scan_year, calendar.month_abbr[scan_month], scan_day)] = value
-                            energy_last_month += value
-                if item['p'] == 4:
-                    energy_this_year_attr[year_text.format(this_year, calendar.month_abbr[this_month])] = energy_this_month
-                    energy_this_year += energy_this_month
-                    for value in reversed(item['v']):
-                        scan_month, scan_year, scan_break = self._get_prev_month(month=scan_month, year=scan_year, scan_break=scan_break)
-                        if scan_break == 0:
-                            energy_this_year_attr[year_text.format(scan_year, calendar.month_abbr[scan_month])] = value
-                            energy_this_year += value
-                        elif scan_break == 1:
-                            energy_last_year_attr[year_text.format(scan_year, calendar.month_abbr[scan_month])] = value
-                            energy_last_year += value
-        if not found_key:
-            energy_today = None
-            energy_yesterday = None
-            energy_last_7_days = None
-            energy_this_month = None
-            energy_last_month = None
-            energy_this_year = None
-            energy_last_year = None
-        return (
-            energy_today,
-            energy_yesterday,
-            energy_last_7_days,
-            energy_this_month,
-            energy_last_month,
-            energy_this_year,
-            energy_last_year,
-            energy_today_attr,
-            energy_yesterday_attr,
-            energy_last_7_days_attr,
-            energy_this_month_attr,
-            energy_last_month_attr,
-            energy_this_year_attr,
-            energy_last_year_attr,
-            found_key
-        )
-
-
-    def _get_prev_month(self, month, year, scan_break):
-        if month > 1:
-            return month - 1, year, scan_break
-        else:
-            return 12, year - 1, scan_break + 1
-
-
-    def _get_prev_day(self, day, month, year, scan_break):
-        if day > 1:
-            return day - 1, month, year, scan_break
-        else:
-            if month > 1:
-                return calendar.monthrange(year=year, month=month - 1)[1], month - 1, year, scan_break + 1
-            else:
-                return calendar.monthrange(year=year, month=12)[1], 12, year - 1, scan_break + 1
-
-
-    def _get_prev_day_week(self, day):
-        if day > 0:
-            return day - 1
-        else:
-            return 6
-
-
-    def _get_prev_hour(self, hour, scan_break):
-        if hour > 0:
-            return hour - 2, scan_break
-        else:
-            return 22, scan_break + 1
+    def _get_energy_data(self, energy_decoder, k_num):
+        """Decode energy series, see EnergyDecoder.series"""
+        return energy_decoder.series(k_num)
 
 
     def _get_http_data(self, request_type=""):
-        """Common fetching of http data"""
+        """
+        Common fetching of http data.
+
+        The lock is held only while received data is stored, so setting of data is not blocked by slow responses.
+        """
         self._login_session()
         if self._login and self._plant_id != "":
 
+            sequence = next(self._read_sequence)
+
             if request_type == self._REQUEST_MAIN:
 
                 request_data = {
@@ -1657,74 +1905,69 @@ class AristonHandler:
                     for zone in self._zones:
                         for param in self._MAP_ARISTON_MULTIZONE_PARAMS.values():
                             request_data['items'].append({"id": param, "zn":zone})
-                with self._data_lock:
-                    resp = self._request_post(
-                        url=f'{self._ARISTON_URL}/api/v2/remote/dataItems/{self._plant_id}/get?umsys=si',
-                        json_data=request_data,
-                        timeout=self._TIMEOUT_MAX,
-                        error_msg="Main read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_post(
+                    url=f'{self._ARISTON_URL}/api/v2/remote/dataItems/{self._plant_id}/get?umsys=si',
+                    json_data=request_data,
+                    timeout=self._TIMEOUT_MAX,
+                    error_msg="Main read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_ERRORS:
 
-                with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/api/v2/busErrors?gatewayId={self._plant_id}&blockingOnly=False&culture=en-US',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="Errors read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/api/v2/busErrors?gatewayId={self._plant_id}&blockingOnly=False&culture=en-US',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="Errors read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_CH_SCHEDULE:
 
-                with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/api/v2/remote/timeProgs/{self._plant_id}/ChZn1?umsys=si',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="CH Schedule read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/api/v2/remote/timeProgs/{self._plant_id}/ChZn1?umsys=si',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="CH Schedule read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_DHW_SCHEDULE:
 
-                with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/api/v2/remote/timeProgs/{self._plant_id}/Dhw?umsys=si',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="DHW Schedule read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/api/v2/remote/timeProgs/{self._plant_id}/Dhw?umsys=si',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="DHW Schedule read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_ADDITIONAL:
 
                 with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/R2/PlantMenu/Refresh?id={self._plant_id}&paramIds={",".join(self._other_parameters)}',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="Additional data read"
-                    )
-                    self._store_data(resp, request_type)
+                    param_ids = ",".join(self._other_parameters)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/R2/PlantMenu/Refresh?id={self._plant_id}&paramIds={param_ids}',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="Additional data read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_LAST_MONTH:
 
-                with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/api/v2/remote/reports/{self._plant_id}/energyAccount',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="Last month data read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/api/v2/remote/reports/{self._plant_id}/energyAccount',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="Last month data read"
+                )
+                self._store_read(resp, request_type, sequence)
 
             elif request_type == self._REQUEST_ENERGY:
 
-                with self._data_lock:
-                    resp = self._request_get(
-                        url=f'{self._ARISTON_URL}/api/v2/remote/reports/{self._plant_id}/consSequencesApi8?usages=Ch%2CDhw&hasSlp=False',
-                        timeout=self._TIMEOUT_AV,
-                        error_msg="Energy data read"
-                    )
-                    self._store_data(resp, request_type)
+                resp = self._request_get(
+                    url=f'{self._ARISTON_URL}/api/v2/remote/reports/{self._plant_id}/consSequencesApi8?usages=Ch%2CDhw&hasSlp=False',
+                    timeout=self._TIMEOUT_AV,
+                    error_msg="Energy data read"
+                )
+                self._store_read(resp, request_type, sequence)
 
         else:
             self._LOGGER.warning(f"Not properly logged in to read {request_type}")
@@ -1733,65 +1976,126 @@ class AristonHandler:
         return True
 
 
+    def _store_read(self, resp, request_type, sequence):
+        """Store response of a read unless a reply of a newer read of the same request type was stored"""
+        with self._data_lock:
+            if sequence < self._stored_sequences.get(request_type, 0):
+                self._LOGGER.info(f"Dropping outdated reply of {request_type}")
+                return
+            self._stored_sequences[request_type] = sequence
+            self._store_response(resp, request_type)
+
+
     def _queue_get_data(self):
-        """Queue all request items"""
+        """Choose next request to be sent and time until the following one"""
         with self._data_lock:
-            # schedule next get request
-            if self._errors >= self._MAX_ERRORS:
-                # give a little rest to the system if too many errors
-                retry_in = self._get_period_time * self._WAIT_PERIOD_MULTIPLYER
-            else:
-                # work as usual
-                retry_in = self._get_period_time
-            self._timer_periodic_read.cancel()
+            now = time.monotonic()
             if not self.available or self._errors > 0:
                 # Initial or error situation, use main request
-                if self.available and self._last_request == self._REQUEST_ADDITIONAL and self._last_request in self._requests_lists[0]:
+                if self.available and self._last_request == self._REQUEST_ADDITIONAL and self._REQUEST_ADDITIONAL in self._request_periods:
                     # Potential error with parameters where they are removed 1 by 1 request
-                    request_to_send = self._last_request
+                    request_to_send = self._REQUEST_ADDITIONAL
                 else:
-                    request_to_send = self._requests_lists[0][0]
-            else:
-                if self._set_requests[self._REQUEST_MAIN]:
-                    # Changing parameters
                     request_to_send = self._REQUEST_MAIN
-                elif self._set_requests[self._REQUEST_ADDITIONAL]:
-                    # Changing parameters
-                    request_to_send = self._REQUEST_ADDITIONAL
-                elif self._last_request in self._requests_lists[0]:
-                    # High prio more frequent (e.g. current temperatures, flame, errors)
-                    last_index = self._requests_lists[0].index(self._last_request)
-                    if len(self._requests_lists[0]) <= last_index + 1:
-                        # Last request was the last item
-                        if self._requests_lists[1]:
-                            # There are requests
-                            last_index_low_prio = self._requests_lists[1].index(self._last_request_low_prio)
-                            if len(self._requests_lists[1]) <= last_index_low_prio + 1:
-                                # Last request in low prio item
-                                request_to_send = self._requests_lists[1][0]
-                            else:
-                                request_to_send = self._requests_lists[1][last_index_low_prio + 1]
-                            self._last_request_low_prio = request_to_send
-                        else:
-                            # No low prio requests
-                            request_to_send = self._requests_lists[0][0]
-                    else:
-                        request_to_send = self._requests_lists[0][last_index + 1]
+            elif self._set_requests[self._REQUEST_MAIN]:
+                # Changing parameters
+                request_to_send = self._REQUEST_MAIN
+            elif self._set_requests[self._REQUEST_ADDITIONAL] and self._REQUEST_ADDITIONAL in self._request_periods:
+                # Changing parameters
+                request_to_send = self._REQUEST_ADDITIONAL
+            else:
+                # Most urgent request among those with passed deadline
+                due_requests = [request for request, deadline in self._request_deadlines.items() if deadline <= now]
+                if due_requests:
+                    request_to_send = min(due_requests, key=lambda request: self._request_rank(request, now))
                 else:
-                    # Low prio less frequent requests (e.g. energy use)
-                    request_to_send = self._requests_lists[0][0]
-            self._last_request = request_to_send
-
-            if self._started:
-                self._LOGGER.info(f'Shall send next request in {retry_in} seconds, current request is {request_to_send}')
-                self._timer_queue_delay = threading.Timer(self._TIME_SPLIT, self._control_availability_state, [request_to_send])
-                self._timer_queue_delay.start()
-                self._timer_periodic_read = threading.Timer(retry_in, self._queue_get_data)
-                self._timer_periodic_read.start()
-                
+                    request_to_send = None
+            if request_to_send is not None:
+                self._request_deadlines[request_to_send] = now + self._request_periods[request_to_send]
+                self._last_request = request_to_send
+            # schedule next get request
+            if self._errors >= self._MAX_ERRORS:
+                # give a little rest to the system if too many errors
+                retry_in = self._get_period_time * self._WAIT_PERIOD_MULTIPLYER
+            elif not self.available or self._errors > 0:
+                retry_in = self._get_period_time
+            else:
+                # work as usual, wait for the nearest deadline
+                retry_in = max(min(self._request_deadlines.values()) - now, self._MIN_REQUEST_INTERVAL)
+        return request_to_send, retry_in
+
+
+    async def _periodic_read(self):
+        """Periodically queue requests to the server"""
+        await asyncio.sleep(self._TIME_SPLIT)
+        while self._started:
+            if self._task_read is not None and not self._task_read.done():
+                # keep one read in flight, next request is queued when the slow one completes
+                await asyncio.wait({self._task_read})
+                continue
+            request_to_send, retry_in = await self._run_blocking(self._queue_get_data)
+            if not self._started:
+                break
+            self._LOGGER.info(f'Shall send next request in {retry_in} seconds, current request is {request_to_send}')
+            if request_to_send is not None:
+                self._task_read = self._create_task(self._delayed_read(request_to_send))
+            await asyncio.sleep(retry_in)
+
+
+    async def _delayed_read(self, request_type):
+        """Read data after short delay"""
+        await asyncio.sleep(self._TIME_SPLIT)
+        await self._run_blocking(self._control_availability_state, request_type)
+
+
+    async def _delayed_set(self, delay):
+        """
+        Set data after the delay.
+
+        The task can be cancelled by _restart_set_task until the setting starts, the setting itself runs
+        in its own task, so posts in flight are always followed by _setting_http_data_done.
+        """
+        await asyncio.sleep(delay)
+        while self._task_set is not None and not self._task_set.done():
+            # previous setting is in flight, the new one starts when it is done
+            await asyncio.wait({self._task_set})
+        if self._task_set_delay is asyncio.current_task():
+            self._task_set_delay = None
+        self._task_set = self._create_task(self._setting_http_data())
+
+
+    async def _run_blocking(self, func, *args):
+        """Run blocking function in the executor"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+
+    def _create_task(self, coroutine):
+        """Create task within the event loop and keep reference until it is done"""
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+
+    def _restart_set_task(self, delay):
+        """Cancel pending setting of data which has not started yet and schedule new one, must run in the event loop"""
+        if self._task_set_delay is not None:
+            self._task_set_delay.cancel()
+            self._task_set_delay = None
+        if self._started:
+            self._task_set_delay = self._create_task(self._delayed_set(delay))
+
+
+    def _schedule_set_data(self, delay):
+        """Schedule setting of data, may be called from any thread"""
+        loop = self._loop
+        if self._started and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._restart_set_task, delay)
+
 
     def _error_detected(self):
         """Error detected"""
+        self._metric_errors_detected.inc(gw=self._default_gw)
         with self._lock:
             was_online = self.available
             self._errors += 1
@@ -1813,12 +2117,18 @@ class AristonHandler:
             self._LOGGER.info("No more errors")
 
 
-    def _control_availability_state(self, request_type=""):
+    def _control_availability_state(self, request_type="", relogin=True):
         """Control component availability"""
+        session_rejections = self._session_rejections
         try:
             result_ok = self._get_http_data(request_type)
             self._LOGGER.info(f"ariston action ok for {request_type}")
         except Exception as ex:
+            if relogin and session_rejections != self._session_rejections and not self._login and self._started:
+                # session was rejected, read again after full login
+                self._LOGGER.info(f"Reading {request_type} again after login")
+                self._control_availability_state(request_type, relogin=False)
+                return
             self._error_detected()
             self._LOGGER.warning(f"ariston action nok for {request_type}: {ex}")
             return
@@ -1828,185 +2138,198 @@ class AristonHandler:
 
 
     def _preparing_setting_http_data(self):
-        """Preparing and setting http data"""
+        """
+        Preparing of setting http data.
+
+        Returns tuple (posts, sent_values) or None if there is nothing to set, see _prepare_set_posts.
+        """
         self._login_session()
         with self._data_lock:
-            if self._available and self._set_param:
+            self._set_debounce_since = None
+            if not self._available or not self._set_param:
+                return None
+            posts = self._prepare_set_posts()
+            self._set_posts += len(posts)
+            sent_values = {parameter: self._set_param.get(parameter) for parameters, _, _, _ in posts for parameter in parameters}
+        return posts, sent_values
 
-                set_additional_params = []
-                parameters = [key for key in self._set_param.keys()]
 
-                for parameter in parameters:
-
-                    try:
-
-                        original_parameter, zone = self._zone_sensor_split(parameter)
-                        set_value = self._set_param[parameter][self._SET_VALUE]
-                        self._LOGGER.info(f'Setting {parameter} new value {self._set_param[parameter][self._VALUE]} [{set_value}]')
-                        
-                        if original_parameter == self._PARAM_MODE:
-
-                            old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/mode',
-                                json_data={"new": set_value,"old": old_value},
-                                error_msg='Set Mode',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
-
-                        elif original_parameter == self._PARAM_CH_MODE:
+    def _send_set_post(self, parameters, url, json_data, error_msg):
+        """Send one request to set data, returns parameters to be dropped due to failure"""
+        try:
+            self._request_post(
+                url=url,
+                json_data=json_data,
+                error_msg=error_msg,
+                timeout=self._TIMEOUT_AV
+            )
+        except Exception as ex:
+            if parameters:
+                self._LOGGER.warning(f"Problem setting {', '.join(parameters)}: {ex}")
+            else:
+                self._LOGGER.warning(f"Problem setting multiple parameters: {ex}")
+            return parameters
+        return ()
 
-                            old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/mode',
-                                json_data={"new": set_value,"old": old_value},
-                                error_msg='Set CH Mode',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
 
-                        elif original_parameter == self._PARAM_DHW_MODE:
+    def _setting_http_data_done(self, failed_parameters, sent_values):
+        """Apply results of setting http data"""
+        with self._data_lock:
+            for parameter in failed_parameters:
+                # value might have been changed meanwhile
+                if parameter in self._set_param and self._set_param[parameter] is sent_values[parameter]:
+                    del self._set_param[parameter]
 
-                            old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwMode',
-                                json_data={"new": set_value,"old": old_value},
-                                error_msg='Set DHW Mode',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
+            self._publish_sensors()
+            self._subscribers_sensors_inform()
+            self._subscribers_statuses_inform()
+            self._reset_set_requests()
 
-                        elif original_parameter == self._PARAM_CH_SET_TEMPERATURE:
-                            
-                            comfort_old = self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone))
-                            comfort_new = self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone)][self._VALUE]
-                            economy_old= self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)) 
-                            economy_new = self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)][self._VALUE]
-                            set_temp = self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_SET_TEMPERATURE, zone))
-                            if set_temp == economy_old and self._get_sensor_value(self._PARAM_CH_MODE) == "Time program":
-                                economy_new = set_value
-                            else:
-                                comfort_new = set_value
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/temperatures?umsys=si',
-                                json_data={"new":{"comf": comfort_new, "econ": economy_new}, "old":{"comf": comfort_old, "econ": economy_old}},
-                                error_msg='Set CH Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
+            if self._set_param:
+                if self._started:
+                    self._LOGGER.info(f"Attempting to set parameter values in {self._set_period_time} seconds")
+                    self._schedule_set_data(self._set_period_time)
 
-                        elif original_parameter == self._PARAM_CH_COMFORT_TEMPERATURE:
-                            
-                            comfort_old = self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone))
-                            economy_old= self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)) 
-                            economy_new = self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)][self._VALUE]
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/temperatures?umsys=si',
-                                json_data={"new":{"comf": set_value, "econ": economy_new}, "old":{"comf": comfort_old, "econ": economy_old}},
-                                error_msg='Set CH Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
 
-                        elif original_parameter == self._PARAM_CH_ECONOMY_TEMPERATURE:
-                            
-                            comfort_old = self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone))
-                            comfort_new = self._ariston_sensors[self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone)][self._VALUE]
-                            economy_old= self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)) 
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/temperatures?umsys=si',
-                                json_data={"new":{"comf": comfort_new, "econ": set_value}, "old":{"comf": comfort_old, "econ": economy_old}},
-                                error_msg='Set CH Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
+    async def _setting_http_data(self):
+        """
+        Setting http data.
 
-                        elif original_parameter == self._PARAM_DHW_SET_TEMPERATURE:
+        Requests are prepared and results are applied under the lock, http exchanges run without it.
+        Requests to different endpoints are sent concurrently.
+        """
+        prepared = await self._run_blocking(self._preparing_setting_http_data)
+        if prepared is None:
+            return
+        posts, sent_values = prepared
+        results = await asyncio.gather(*(self._run_blocking(self._send_set_post, *post) for post in posts))
+        failed_parameters = [parameter for parameters in results for parameter in parameters]
+        await self._run_blocking(self._setting_http_data_done, failed_parameters, sent_values)
 
-                            old_value = self._get_sensor_value(parameter) 
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwTemp?umsys=si',
-                                json_data={"new": set_value,"old": old_value},
-                                error_msg='Set DHW Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
 
-                        elif original_parameter == self._PARAM_DHW_COMFORT_TEMPERATURE:
-
-                            comfort_old = self._get_sensor_value(self._PARAM_DHW_COMFORT_TEMPERATURE) 
-                            economy_old= self._get_sensor_value(self._PARAM_DHW_ECONOMY_TEMPERATURE) 
-                            economy_new = self._ariston_sensors[self._PARAM_DHW_ECONOMY_TEMPERATURE][self._VALUE]
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwTimeProgTemperatures?umsys=si',
-                                json_data={"new":{"comf": set_value, "econ": economy_new}, "old":{"comf": comfort_old, "econ": economy_old}},
-                                error_msg='Set DHW Comfort Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
+    def _prepare_set_posts(self):
+        """
+        Prepare requests to set all pending parameters, must be called with the data lock.
 
-                        elif original_parameter == self._PARAM_DHW_ECONOMY_TEMPERATURE:
-
-                            comfort_old = self._get_sensor_value(self._PARAM_DHW_COMFORT_TEMPERATURE)
-                            comfort_new = self._ariston_sensors[self._PARAM_DHW_COMFORT_TEMPERATURE][self._VALUE]
-                            economy_old= self._get_sensor_value(self._PARAM_DHW_ECONOMY_TEMPERATURE) 
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwTimeProgTemperatures?umsys=si',
-                                json_data={"new":{"comf": comfort_new, "econ": set_value}, "old":{"comf": comfort_old, "econ": economy_old}},
-                                error_msg='Set DHW Economy Temperature',
-                                timeout=self._TIMEOUT_AV
-                            )
-                            break
+        Parameters of the same endpoint are merged into one request (e.g. comfort and economy temperatures).
+        Returns list of tuples (parameters, url, json_data, error_msg), parameters are dropped if the request fails
+        (request setting additional parameters has no such parameters).
+        """
+        posts = {}
+        set_additional_params = []
+        parameters = [key for key in self._set_param.keys()]
 
-                        elif original_parameter in self._LIST_ARISTON_WEB_PARAMS:
+        for parameter in parameters:
 
-                            # Many parameters in one request
-                            
-                            set_additional_params.append(
-                                {
-                                    "id": self._MAP_ARISTON_WEB_MENU_PARAMS[parameter],
-                                    "value": set_value,
-                                    "prevValue": self._string_option_to_number(parameter, self._get_sensor_value(parameter))
-                                }
-                            )
+            try:
 
+                original_parameter, zone = self._zone_sensor_split(parameter)
+                set_value = self._set_param[parameter][self._SET_VALUE]
+                self._LOGGER.info(f'Setting {parameter} new value {self._set_param[parameter][self._VALUE]} [{set_value}]')
+
+                if original_parameter == self._PARAM_MODE:
+
+                    old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
+                    url = f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/mode'
+                    posts[url] = ([parameter], {"new": set_value,"old": old_value}, 'Set Mode')
+
+                elif original_parameter == self._PARAM_CH_MODE:
+
+                    old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
+                    url = f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/mode'
+                    posts[url] = ([parameter], {"new": set_value,"old": old_value}, 'Set CH Mode')
+
+                elif original_parameter == self._PARAM_DHW_MODE:
+
+                    old_value = self._string_option_to_number(parameter, self._get_sensor_value(parameter))
+                    url = f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwMode'
+                    posts[url] = ([parameter], {"new": set_value,"old": old_value}, 'Set DHW Mode')
+
+                elif original_parameter in [
+                    self._PARAM_CH_SET_TEMPERATURE,
+                    self._PARAM_CH_COMFORT_TEMPERATURE,
+                    self._PARAM_CH_ECONOMY_TEMPERATURE]:
+
+                    # Comfort and economy temperatures of the zone are set together
+                    url = f'{self._ARISTON_URL}/api/v2/remote/zones/{self._plant_id}/{zone}/temperatures?umsys=si'
+                    if url not in posts:
+                        comfort_sensor = self._zone_sensor_name(self._PARAM_CH_COMFORT_TEMPERATURE, zone)
+                        economy_sensor = self._zone_sensor_name(self._PARAM_CH_ECONOMY_TEMPERATURE, zone)
+                        posts[url] = ([], {
+                            "new": {"comf": self._ariston_sensors[comfort_sensor][self._VALUE], "econ": self._ariston_sensors[economy_sensor][self._VALUE]},
+                            "old": {"comf": self._get_sensor_value(comfort_sensor), "econ": self._get_sensor_value(economy_sensor)}
+                        }, 'Set CH Temperature')
+                    post_parameters, json_data, _ = posts[url]
+                    if original_parameter == self._PARAM_CH_SET_TEMPERATURE:
+                        set_temp = self._get_sensor_value(self._zone_sensor_name(self._PARAM_CH_SET_TEMPERATURE, zone))
+                        if set_temp == json_data["old"]["econ"] and self._get_sensor_value(self._PARAM_CH_MODE) == "Time program":
+                            json_data["new"]["econ"] = set_value
                         else:
-                            self._LOGGER.error(f"Unsupported parameter to set {parameter}")
-                            raise Exception(f"Unsupported parameter to set {parameter}")
+                            json_data["new"]["comf"] = set_value
+                    elif original_parameter == self._PARAM_CH_COMFORT_TEMPERATURE:
+                        json_data["new"]["comf"] = set_value
+                    else:
+                        json_data["new"]["econ"] = set_value
+                    post_parameters.append(parameter)
+
+                elif original_parameter == self._PARAM_DHW_SET_TEMPERATURE:
+
+                    old_value = self._get_sensor_value(parameter)
+                    url = f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwTemp?umsys=si'
+                    posts[url] = ([parameter], {"new": set_value,"old": old_value}, 'Set DHW Temperature')
+
+                elif original_parameter in [
+                    self._PARAM_DHW_COMFORT_TEMPERATURE,
+                    self._PARAM_DHW_ECONOMY_TEMPERATURE]:
+
+                    # Comfort and economy temperatures are set together
+                    url = f'{self._ARISTON_URL}/api/v2/remote/plantData/{self._plant_id}/dhwTimeProgTemperatures?umsys=si'
+                    if url not in posts:
+                        posts[url] = ([], {
+                            "new": {"comf": self._ariston_sensors[self._PARAM_DHW_COMFORT_TEMPERATURE][self._VALUE], "econ": self._ariston_sensors[self._PARAM_DHW_ECONOMY_TEMPERATURE][self._VALUE]},
+                            "old": {"comf": self._get_sensor_value(self._PARAM_DHW_COMFORT_TEMPERATURE), "econ": self._get_sensor_value(self._PARAM_DHW_ECONOMY_TEMPERATURE)}
+                        }, 'Set DHW Temperatures')
+                    post_parameters, json_data, _ = posts[url]
+                    if original_parameter == self._PARAM_DHW_COMFORT_TEMPERATURE:
+                        json_data["new"]["comf"] = set_value
+                    else:
+                        json_data["new"]["econ"] = set_value
+                    post_parameters.append(parameter)
+
+                elif original_parameter in self._LIST_ARISTON_WEB_PARAMS:
+
+                    # Many parameters in one request
+                    set_additional_params.append(
+                        {
+                            "id": self._MAP_ARISTON_WEB_MENU_PARAMS[parameter],
+                            "value": set_value,
+                            "prevValue": self._string_option_to_number(parameter, self._get_sensor_value(parameter))
+                        }
+                    )
 
-                    except Exception as ex:
-                        self._LOGGER.warning(f"Problem setting {parameter}: {ex}")
-                        del self._set_param[parameter]
-                        continue
+                else:
+                    self._LOGGER.error(f"Unsupported parameter to set {parameter}")
+                    raise Exception(f"Unsupported parameter to set {parameter}")
 
-                    self._set_param[parameter][self._ATTEMPT] += 1
-                    if self._set_param[parameter][self._ATTEMPT] > self._max_set_retries:
-                        del self._set_param[parameter]
+            except Exception as ex:
+                self._LOGGER.warning(f"Problem setting {parameter}: {ex}")
+                del self._set_param[parameter]
+                continue
 
-                else:
-                    try:
-                        if set_additional_params:
-                            self._request_post(
-                                url=f'{self._ARISTON_URL}/R2/PlantMenu/Submit/{self._plant_id}',
-                                json_data=set_additional_params,
-                                error_msg='Set additional parameters',
-                                timeout=self._TIMEOUT_AV
-                            )
-                    except Exception as ex:
-                        self._LOGGER.warning(f"Problem setting multiple parameters: {ex}")
+            self._set_param[parameter][self._ATTEMPT] += 1
+            if self._set_param[parameter][self._ATTEMPT] > self._max_set_retries:
+                del self._set_param[parameter]
 
-                self._subscribers_sensors_inform()
-                self._subscribers_statuses_inform()
-                self._reset_set_requests()
+        set_posts = [(tuple(post_parameters), url, json_data, error_msg) for url, (post_parameters, json_data, error_msg) in posts.items()]
+        if set_additional_params:
+            set_posts.append((
+                (),
+                f'{self._ARISTON_URL}/R2/PlantMenu/Submit/{self._plant_id}',
+                set_additional_params,
+                'Set additional parameters'
+            ))
+        return set_posts
 
-                if self._set_param:
-                    self._timer_set_delay.cancel()
-                    if self._started:
-                        self._LOGGER.info(f"Attempting to set parameter values in {self._set_period_time} seconds")
-                        self._timer_set_delay = threading.Timer(self._set_period_time, self._preparing_setting_http_data)
-                        self._timer_set_delay.start()
-                
 
     def _reset_set_requests(self):
         self._set_requests = {request: False for request in self._MAP_REQUEST}
@@ -2029,6 +2352,27 @@ class AristonHandler:
         return self._ariston_sensors[sensor][self._VALUE]
 
 
+    def _queue_set_param(self, parameter, value, set_value):
+        """Queue value to be set, the value replaces previous value of the parameter if it was not sent yet"""
+        requested = time.monotonic()
+        if parameter in self._set_param:
+            # parameter is pending since the first request
+            requested = self._set_param[parameter][self._REQUESTED]
+            if self._set_param[parameter][self._ATTEMPT] == 0:
+                self._set_coalesced += 1
+        self._set_requested += 1
+        self._set_param[parameter] = {self._VALUE: value, self._SET_VALUE: set_value, self._ATTEMPT: 0, self._REQUESTED: requested}
+
+
+    def _set_debounce_delay(self):
+        """Delay of setting data, each new value extends waiting up to maximum since the first value"""
+        now = time.monotonic()
+        if self._set_debounce_since is None:
+            self._set_debounce_since = now
+        max_delay = self._set_debounce_since + self._set_debounce * self._SET_DEBOUNCE_MAX_MULTIPLYER - now
+        return max(min(self._set_debounce, max_delay), self._TIME_SPLIT)
+
+
     def set_http_data(self, **parameter_list: Union[str, int, float, bool]) -> None:
         """
         Set data over http, where **parameter_list excepts parameters and wanted values.
@@ -2054,8 +2398,9 @@ class AristonHandler:
                         if value in self._ariston_sensors[parameter][self._OPTIONS_TXT]:
                             set_value = self._string_option_to_number(parameter, value)
                             if value != self._ariston_sensors[parameter][self._VALUE]:
-                                self._set_param[parameter] = {self._VALUE: value, self._SET_VALUE: set_value, self._ATTEMPT: 0}
+                                self._queue_set_param(parameter, value, set_value)
                                 self._ariston_sensors[parameter][self._VALUE] = value
+                                self._mark_dirty(parameter)
                         else:
                             bad_values[parameter] = value
                     if self._is_digit_string(value) != None:
@@ -2070,15 +2415,14 @@ class AristonHandler:
                             else:
                                 value = round(value)
                             if value != self._ariston_sensors[parameter][self._VALUE]:
-                                self._set_param[parameter] = {self._VALUE: value, self._SET_VALUE: value, self._ATTEMPT: 0}
+                                self._queue_set_param(parameter, value, value)
                                 self._ariston_sensors[parameter][self._VALUE] = value
+                                self._mark_dirty(parameter)
                         else:
                             bad_values[parameter] = value
 
-                self._timer_set_delay.cancel()
-                if self._started:
-                    self._timer_set_delay = threading.Timer(self._TIME_SPLIT, self._preparing_setting_http_data)
-                    self._timer_set_delay.start()
+                self._publish_sensors()
+                self._schedule_set_data(self._set_debounce_delay())
 
                 if bad_values:
                     self._LOGGER.error(f"Unsupported parameters to be set: {bad_values}")
@@ -2089,46 +2433,109 @@ class AristonHandler:
             raise Exception("Connection data error, problem to set data")
 
     def _clear_data(self):
+        # login of the account is shared with other plants, it is invalidated only when the session is rejected
         with self._plant_id_lock:
             self._login = False
         self._features = {}
         self._main_data = {}
         self._additional_data = {}
+        self._main_index = {}
+        self._additional_index = {}
         self._error_data = {}
         self._ch_schedule_data = {}
         self._dhw_schedule_data = {}
         self._set_param = {}
+        self._set_debounce_since = None
         self._last_month_data = {}
         self._energy_use_data = {}
+        self._response_digests = {}
         self._last_dhw_storage_temp = None
         self._zones = []
         for sensor in self._ariston_sensors:
             self._reset_sensor(sensor)
         self._reset_set_requests()
+        self._publish_sensors()
         self._subscribers_sensors_inform()
         self._subscribers_statuses_inform()
 
-    def start(self) -> None:
-        """Start communication with the server."""
+    async def async_start(self, poll: bool = True) -> None:
+        """
+        Start communication with the server within the running event loop.
+
+        'poll' - if False, reading of data is driven externally (e.g. by AristonFleet) with _queue_get_data and _control_availability_state.
+        """
+        self._loop = asyncio.get_running_loop()
         self._started = True
         self._LOGGER.info("Connection started")
-        self._timer_periodic_read = threading.Timer(self._TIME_SPLIT, self._queue_get_data)
-        self._timer_periodic_read.start()
+        if poll:
+            self._create_task(self._periodic_read())
 
 
-    def stop(self) -> None:
+    async def async_stop(self) -> None:
         """Stop communication with the server."""
         self._started = False
-        self._timer_periodic_read.cancel()
-        self._timer_queue_delay.cancel()
-
-        if self._login and self.available:
-            self._request_get(
-                url=f'{self._ARISTON_URL}/R2/Account/Logout',
-                error_msg="Logout",
-                ignore_errors=True
-            )
-        self._session.close()
+        for task in list(self._tasks):
+            task.cancel()
+        self._task_read = None
+        self._task_set_delay = None
+        self._task_set = None
+        await self._run_blocking(self._close_connection)
+
+
+    async def async_set_http_data(self, **parameter_list: Union[str, int, float, bool]) -> None:
+        """Set data over http without blocking the event loop, see set_http_data."""
+        await self._run_blocking(functools.partial(self.set_http_data, **parameter_list))
+
+
+    def _close_connection(self):
+        """Logout and clear the data"""
+        if self._own_account:
+            # Shared account is closed by its owner, cached session is kept alive for the next start
+            if self._login and self.available and self._session_cache is None:
+                self._request_get(
+                    url=f'{self._ARISTON_URL}/R2/Account/Logout',
+                    error_msg="Logout",
+                    ignore_errors=True
+                )
+            self._session.close()
+            with self._account.lock:
+                self._account.logged_in = False
         self._clear_data()
         self._subscribers_statuses_inform()
         self._LOGGER.info("Connection stopped")
+
+
+class AristonHandler(AsyncAristonHandler):
+    """
+    Ariston NET Remotethermo API with blocking interface.
+
+    Thin wrapper running AsyncAristonHandler on a private event loop within a single background thread.
+    Arguments are the same as for AsyncAristonHandler.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._loop_thread = None
+
+
+    def start(self) -> None:
+        """Start communication with the server."""
+        loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=loop.run_forever, name="AristonHandler", daemon=True)
+        self._loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self.async_start(), loop).result()
+
+
+    def stop(self) -> None:
+        """Stop communication with the server."""
+        loop = self._loop
+        if loop is None:
+            self._started = False
+            self._close_connection()
+            return
+        asyncio.run_coroutine_threadsafe(self.async_stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop_thread.join()
+        loop.close()
+        self._loop = None
+        self._loop_thread = None
@@ -0,0 +1,141 @@
+"""Delivery of events to subscribers by a bounded pool of worker threads."""
+import collections
+import collections.abc
+import logging
+import threading
+import types
+
+
+class _Subscriber:
+    """Pending events of one subscriber"""
+
+    __slots__ = ('pending', 'scheduled')
+
+    def __init__(self):
+        self.pending = collections.deque()
+        self.scheduled = False
+
+
+class SubscriberDispatcher:
+    """
+    Dispatcher of subscriber callbacks.
+
+    'workers' - maximum number of worker threads, idle workers exit after a while and are restarted when needed;
+
+    'max_pending' - maximum number of pending events per subscriber, on overflow the latest pending event
+    is coalesced with the new one (mappings are merged with the newest values winning, other payloads are replaced).
+
+    Events of one subscriber are delivered one at a time in the order of dispatching.
+    """
+
+    _WORKERS = 2
+    _MAX_PENDING = 10
+    _IDLE_TIMEOUT = 60
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self,
+                 workers: int = _WORKERS,
+                 max_pending: int = _MAX_PENDING,
+                 name: str = "AristonDispatcher",
+                 ) -> None:
+        if not isinstance(workers, int) or workers < 1:
+            raise Exception("At least 1 worker is expected")
+
+        if not isinstance(max_pending, int) or max_pending < 1:
+            raise Exception("At least 1 pending event is expected")
+
+        self._max_workers = workers
+        self._max_pending = max_pending
+        self._name = name
+        self._condition = threading.Condition()
+        self._ready = collections.deque()
+        self._subscribers = {}
+        self._workers = 0
+        self._idle = 0
+        self._queue_depth = 0
+        self._delivered = 0
+        self._coalesced = 0
+        self._failed = 0
+
+
+    @property
+    def queue_depth(self) -> int:
+        """Return number of events waiting for delivery."""
+        return self._queue_depth
+
+
+    @property
+    def statistics(self) -> dict:
+        """Return counters of the dispatcher."""
+        with self._condition:
+            return {
+                'queue_depth': self._queue_depth,
+                'delivered': self._delivered,
+                'coalesced': self._coalesced,
+                'failed': self._failed,
+                'workers': self._workers,
+            }
+
+
+    @staticmethod
+    def _coalesce(old_payload, new_payload):
+        if isinstance(old_payload, collections.abc.Mapping) and isinstance(new_payload, collections.abc.Mapping):
+            return types.MappingProxyType({**old_payload, **new_payload})
+        return new_payload
+
+
+    def dispatch(self, key, func, payload, args: tuple = (), kwargs: dict = None) -> None:
+        """Queue call func(payload, *args, **kwargs) for subscriber identified by hashable 'key'."""
+        if kwargs is None:
+            kwargs = {}
+        with self._condition:
+            subscriber = self._subscribers.get(key)
+            if subscriber is None:
+                subscriber = self._subscribers[key] = _Subscriber()
+            if len(subscriber.pending) >= self._max_pending:
+                _, old_payload, _, _ = subscriber.pending[-1]
+                subscriber.pending[-1] = (func, self._coalesce(old_payload, payload), args, kwargs)
+                self._coalesced += 1
+            else:
+                subscriber.pending.append((func, payload, args, kwargs))
+                self._queue_depth += 1
+            if not subscriber.scheduled:
+                subscriber.scheduled = True
+                self._ready.append(key)
+                if self._idle:
+                    self._condition.notify()
+                elif self._workers < self._max_workers:
+                    self._workers += 1
+                    threading.Thread(target=self._worker, name=f"{self._name}_{self._workers}", daemon=True).start()
+
+
+    def _worker(self):
+        """Deliver events of ready subscribers"""
+        while True:
+            with self._condition:
+                while not self._ready:
+                    self._idle += 1
+                    notified = self._condition.wait(self._IDLE_TIMEOUT)
+                    self._idle -= 1
+                    if not notified and not self._ready:
+                        self._workers -= 1
+                        return
+                key = self._ready.popleft()
+                subscriber = self._subscribers[key]
+                func, payload, args, kwargs = subscriber.pending.popleft()
+                self._queue_depth -= 1
+            try:
+                func(payload, *args, **kwargs)
+                failed = False
+            except Exception as ex:
+                self._LOGGER.warning(f"Subscriber {func} failed: {ex}")
+                failed = True
+            with self._condition:
+                self._delivered += 1
+                if failed:
+                    self._failed += 1
+                if subscriber.pending:
+                    self._ready.append(key)
+                else:
+                    subscriber.scheduled = False
@@ -0,0 +1,273 @@
+"""Decoding of Ariston energy sequences (consSequencesApi8)."""
+import bisect
+import calendar
+import collections
+import datetime
+import functools
+import operator
+
+
+CalendarSlot = collections.namedtuple('CalendarSlot', ['year', 'month', 'day', 'weekday', 'hour'])
+CalendarSlot.__doc__ = """Calendar slot of one position in energy sequences, fields not relevant to the period are None"""
+
+
+def _prev_month(month, year, scan_break):
+    if month > 1:
+        return month - 1, year, scan_break
+    else:
+        return 12, year - 1, scan_break + 1
+
+
+def _prev_day(day, month, year, scan_break):
+    if day > 1:
+        return day - 1, month, year, scan_break
+    else:
+        if month > 1:
+            return calendar.monthrange(year=year, month=month - 1)[1], month - 1, year, scan_break + 1
+        else:
+            return calendar.monthrange(year=year, month=12)[1], 12, year - 1, scan_break + 1
+
+
+def _prev_day_week(day):
+    if day > 0:
+        return day - 1
+    else:
+        return 6
+
+
+def _prev_hour(hour, scan_break):
+    if hour > 0:
+        return hour - 2, scan_break
+    else:
+        return 22, scan_break + 1
+
+
+def _slot(year, month, day, hour=None):
+    return CalendarSlot(year, month, day, calendar.weekday(year, month, day), hour)
+
+
+def _sum(values, start):
+    """Sum values one by one in the given order, so results are the same as with repeated addition"""
+    return functools.reduce(operator.add, values, start)
+
+
+class CalendarIndex:
+    """
+    Calendar index of positions in energy sequences of every period.
+
+    Every position counted from the most recent value is mapped to its bucket (0 - this day, week, month or year,
+    1 - previous one), calendar slot and attribute label. Positions are computed lazily once per period and
+    the index stays valid until the 2 hour slot of the wall clock changes, see 'valid_for'.
+    """
+
+    _HOUR_TEXT = "{}_{}_{:02}_{:02}"
+    _WEEKDAY_TEXT = "{}_{}_{:02}_{}"
+    _MONTH_TEXT = "{}_{}_{:02}"
+    _YEAR_TEXT = "{}_{}"
+
+    def __init__(self, now: datetime.datetime = None) -> None:
+        if now is None:
+            now = datetime.datetime.now()
+        self._this_year = now.year
+        self._this_month = now.month
+        self._this_day = now.day
+        self._this_day_week = now.weekday()
+        self._this_2hour = self._2hour(now)
+        self._periods = {}
+
+
+    @classmethod
+    def slot_key(cls, now: datetime.datetime = None) -> tuple:
+        """Return wall clock slot (year, month, day, 2 hour) of 'now', current time is used if not specified."""
+        if now is None:
+            now = datetime.datetime.now()
+        return now.year, now.month, now.day, cls._2hour(now)
+
+
+    @staticmethod
+    def _2hour(now):
+        # 2hour during scanning is decreased by 2 at the beginning
+        if now.hour % 2 == 1:
+            # odd value means we calculate even value and add 2 hours due to following decrease
+            return (now.hour // 2) * 2 + 2
+        else:
+            # we assume that previous 2 hours would be used
+            return now.hour + 2
+
+
+    @property
+    def key(self) -> tuple:
+        """Return wall clock slot (year, month, day, 2 hour) the index was built for."""
+        return self._this_year, self._this_month, self._this_day, self._this_2hour
+
+
+    def valid_for(self, now: datetime.datetime) -> bool:
+        """Return True if index can be used at 'now'."""
+        return self.key == self.slot_key(now)
+
+
+    def positions(self, period: int, length: int) -> tuple:
+        """
+        Return tuple of lists (buckets, slots, labels) of the period with at least 'length' positions.
+
+        Position 0 is the most recent value. For periods 3 and 4 position 0 is the running day or month.
+        """
+        positions = self._periods.get(period)
+        if positions is None or len(positions[0]) < length:
+            positions = self._periods[period] = self._build(period, length)
+        return positions
+
+
+    def _build(self, period, length):
+        buckets = []
+        slots = []
+        this_year, this_month, this_day = self._this_year, self._this_month, self._this_day
+        scan_year, scan_month, scan_day = this_year, this_month, this_day
+        scan_break = 0
+        if period == 1:
+            prev_day, prev_month, prev_year, _ = _prev_day(day=this_day, month=this_month, year=this_year, scan_break=0)
+            prev_day_2, prev_month_2, prev_year_2, _ = _prev_day(day=prev_day, month=prev_month, year=prev_year, scan_break=0)
+            use_day, use_month, use_year = this_day, this_month, this_year
+            midnight = self._this_2hour == 2
+            scan_2hour = self._this_2hour
+            for _ in range(length):
+                scan_2hour, scan_break = _prev_hour(hour=scan_2hour, scan_break=scan_break)
+                if midnight and scan_break == 1:
+                    # ignore first break
+                    scan_break = 0
+                    use_day, use_month, use_year = prev_day, prev_month, prev_year
+                    prev_day, prev_month, prev_year = prev_day_2, prev_month_2, prev_year_2
+                    midnight = False
+                buckets.append(scan_break)
+                if scan_break == 0:
+                    slots.append(_slot(use_year, use_month, use_day, scan_2hour))
+                else:
+                    slots.append(_slot(prev_year, prev_month, prev_day, scan_2hour))
+            labels = [self._HOUR_TEXT.format(slot.year, calendar.month_abbr[slot.month], slot.day, slot.hour) for slot in slots]
+        elif period == 2:
+            scan_day_week = self._this_day_week
+            for _ in range(length):
+                scan_day, scan_month, scan_year, _ = _prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=0)
+                scan_day_week = _prev_day_week(day=scan_day_week)
+                buckets.append(0)
+                slots.append(CalendarSlot(scan_year, scan_month, scan_day, scan_day_week, None))
+            labels = [self._WEEKDAY_TEXT.format(slot.year, calendar.month_abbr[slot.month], slot.day, calendar.day_abbr[slot.weekday]) for slot in slots]
+        elif period == 3:
+            buckets.append(0)
+            slots.append(_slot(this_year, this_month, this_day))
+            for _ in range(length):
+                scan_day, scan_month, scan_year, scan_break = _prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=scan_break)
+                buckets.append(scan_break)
+                slots.append(_slot(scan_year, scan_month, scan_day))
+            labels = [self._MONTH_TEXT.format(slot.year, calendar.month_abbr[slot.month], slot.day) for slot in slots]
+        elif period == 4:
+            buckets.append(0)
+            slots.append(CalendarSlot(this_year, this_month, None, None, None))
+            for _ in range(length):
+                scan_month, scan_year, scan_break = _prev_month(month=scan_month, year=scan_year, scan_break=scan_break)
+                buckets.append(scan_break)
+                slots.append(CalendarSlot(scan_year, scan_month, None, None, None))
+            labels = [self._YEAR_TEXT.format(slot.year, calendar.month_abbr[slot.month]) for slot in slots]
+        else:
+            labels = []
+        return buckets, slots, labels
+
+
+class EnergyDecoder:
+    """
+    Decoder of energy sequences.
+
+    Every sequence item has series key 'k', period 'p' and values 'v' where the last value is the most recent one:
+        - period 1 - 2 hour slots of today and yesterday;
+        - period 2 - days of the last 7 days;
+        - period 3 - days of this and last month;
+        - period 4 - months of this and last year.
+
+    Items are bucketed by series in one pass. Positions are mapped to buckets and labels by CalendarIndex,
+    which is shared by all series and can be reused by following decoders while it is valid
+    (see 'calendar_index'), totals are reduced over slices of the reversed values.
+    """
+
+    def __init__(self, now: datetime.datetime = None, calendar_index: CalendarIndex = None) -> None:
+        if now is None:
+            now = datetime.datetime.now()
+        if calendar_index is None or not calendar_index.valid_for(now):
+            calendar_index = CalendarIndex(now)
+        self._calendar_index = calendar_index
+        self._series = {}
+
+
+    @property
+    def calendar_index(self) -> CalendarIndex:
+        """Return calendar index used by the decoder."""
+        return self._calendar_index
+
+
+    def load(self, energy_data: list) -> None:
+        """Bucket sequence items by series key in one pass."""
+        series = {}
+        for item in energy_data:
+            series.setdefault(item["k"], []).append(item)
+        self._series = series
+
+
+    def _reduce(self, period, values, totals, attributes, first=None):
+        """Add reversed values to totals and attributes of this (index 0) and previous (index 1) bucket"""
+        offset = 0 if first is None else 1
+        buckets, _, labels = self._calendar_index.positions(period, len(values) + offset)
+        if first is not None:
+            attributes[0][labels[0]] = first
+            totals[0] = totals[0] + first
+        end_this = bisect.bisect_right(buckets, 0, offset, len(values) + offset)
+        end_prev = bisect.bisect_right(buckets, 1, end_this, len(values) + offset)
+        this_values = values[:end_this - offset]
+        prev_values = values[end_this - offset:end_prev - offset]
+        attributes[0].update(zip(labels[offset:end_this], this_values))
+        totals[0] = _sum(this_values, totals[0])
+        if len(totals) > 1:
+            attributes[1].update(zip(labels[end_this:end_prev], prev_values))
+            totals[1] = _sum(prev_values, totals[1])
+
+
+    def series(self, k_num: int) -> tuple:
+        """
+        Decode one series and return tuple of:
+            - values of today, yesterday, last 7 days, this month, last month, this year, last year;
+            - attributes (slot label to value) in the same order;
+            - flag if the series was found.
+        """
+        day = [0, 0]
+        week = [0]
+        month = [0, 0]
+        year = [0, 0]
+        day_attr = [{}, {}]
+        week_attr = [{}]
+        month_attr = [{}, {}]
+        year_attr = [{}, {}]
+        items = self._series.get(k_num, [])
+        for item in items:
+            values = item['v'][::-1]
+            if item['p'] == 1:
+                self._reduce(1, values, day, day_attr)
+            if item['p'] == 2:
+                self._reduce(2, values, week, week_attr)
+            if item['p'] == 3:
+                self._reduce(3, values, month, month_attr, first=day[0])
+            if item['p'] == 4:
+                self._reduce(4, values, year, year_attr, first=month[0])
+        found_key = bool(items)
+        if found_key:
+            totals = (day[0], day[1], week[0], month[0], month[1], year[0], year[1])
+        else:
+            totals = (None,) * 7
+        return (
+            *totals,
+            day_attr[0],
+            day_attr[1],
+            week_attr[0],
+            month_attr[0],
+            month_attr[1],
+            year_attr[0],
+            year_attr[1],
+            found_key
+        )
@@ -0,0 +1,196 @@
+"""Support for many Ariston plants sharing logins and a single scheduler."""
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import logging
+
+from .ariston import AristonAccount, AsyncAristonHandler
+from .dispatcher import SubscriberDispatcher
+
+
+class AristonFleet:
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Fleet of Ariston NET Remotethermo plants
+
+    'plants' - list of dictionaries with mandatory keys 'username', 'password' and 'gw' and optional key 'sensors';
+
+    'max_concurrent_requests' - maximum number of http exchanges running at the same time for the whole fleet;
+
+    other keyword arguments are passed to every AsyncAristonHandler.
+
+    Plants of the same account share one login and one http session (cookies and connection pool).
+    Requests of all plants are fetched from one priority queue, high priority requests (e.g. main) go first.
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    _MAX_CONCURRENT_REQUESTS = 4
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self,
+                 plants: list,
+                 max_concurrent_requests: int = _MAX_CONCURRENT_REQUESTS,
+                 **handler_kwargs,
+                 ) -> None:
+        """
+        Initialize fleet.
+        """
+        if not isinstance(plants, list) or not plants:
+            raise Exception("At least one plant is expected")
+
+        if not isinstance(max_concurrent_requests, int) or max_concurrent_requests < 1:
+            raise Exception("At least 1 concurrent request is expected")
+
+        self._max_concurrent = max_concurrent_requests
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_requests,
+            thread_name_prefix="AristonFleet")
+
+        self._dispatcher = SubscriberDispatcher(name="AristonFleetDispatcher")
+        self._accounts = {}
+        self._handlers = {}
+        for plant in plants:
+            username = plant["username"]
+            gw = plant["gw"]
+            if not gw:
+                raise Exception("Gateway must be specified for every plant in the fleet")
+            if gw in self._handlers:
+                raise Exception(f"Gateway {gw} is specified more than once")
+            if username not in self._accounts:
+                self._accounts[username] = AristonAccount(username, plant["password"])
+            self._handlers[gw] = AsyncAristonHandler(
+                username=username,
+                password=plant["password"],
+                sensors=list(plant.get("sensors", [])),
+                gw=gw,
+                executor=self._executor,
+                account=self._accounts[username],
+                dispatcher=self._dispatcher,
+                **handler_kwargs)
+
+        self._started = False
+        self._queue = None
+        self._timers = []
+        self._wakeup = None
+        self._tasks = set()
+        self._sequence = itertools.count()
+
+
+    @property
+    def handlers(self) -> dict:
+        """Return dictionary of handlers with gateway as a key."""
+        return dict(self._handlers)
+
+
+    @property
+    def queue_size(self) -> int:
+        """Return number of requests waiting to be sent."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+    def snapshots(self) -> dict:
+        """Return sensor values of every plant with gateway as a key, see AsyncAristonHandler.sensor_values."""
+        return {gw: handler.sensor_values for gw, handler in self._handlers.items()}
+
+
+    async def async_set_http_data(self, gw: str, **parameter_list) -> None:
+        """Set data of the plant with gateway 'gw', see AsyncAristonHandler.set_http_data."""
+        await self._handlers[gw].async_set_http_data(**parameter_list)
+
+
+    def _create_task(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+
+    def _schedule(self, delay, handler):
+        """Schedule handler to queue its next request after the delay"""
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._timers, (due, next(self._sequence), handler))
+        self._wakeup.set()
+
+
+    async def _enqueue(self, handler):
+        """Queue next request of the handler with its priority"""
+        try:
+            request_type, retry_in = await handler._run_blocking(handler._queue_get_data)
+        except Exception as ex:
+            self._LOGGER.warning(f"Problem queuing request for {handler.plant_id}: {ex}")
+            request_type, retry_in = None, handler._get_period_time
+        if not self._started:
+            return
+        if request_type is not None:
+            priority = handler._request_priority(request_type)
+            self._queue.put_nowait((priority, next(self._sequence), handler, request_type))
+        self._schedule(retry_in, handler)
+
+
+    async def _timer_loop(self):
+        """Move handlers with elapsed deadline to the request queue"""
+        loop = asyncio.get_running_loop()
+        while self._started:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, handler = heapq.heappop(self._timers)
+                self._create_task(self._enqueue(handler))
+            timeout = self._timers[0][0] - now if self._timers else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+    async def _worker(self):
+        """Send requests from the priority queue"""
+        while self._started:
+            _, _, handler, request_type = await self._queue.get()
+            try:
+                await handler._run_blocking(handler._control_availability_state, request_type)
+            finally:
+                self._queue.task_done()
+
+
+    async def async_start(self) -> None:
+        """Start communication with the server for all plants."""
+        self._started = True
+        self._queue = asyncio.PriorityQueue()
+        self._wakeup = asyncio.Event()
+        for handler in self._handlers.values():
+            await handler.async_start(poll=False)
+            self._schedule(handler._TIME_SPLIT, handler)
+        self._create_task(self._timer_loop())
+        for _ in range(self._max_concurrent):
+            self._create_task(self._worker())
+        self._LOGGER.info(f"Fleet of {len(self._handlers)} plants started")
+
+
+    async def async_stop(self) -> None:
+        """Stop communication with the server for all plants and logout."""
+        self._started = False
+        for task in list(self._tasks):
+            task.cancel()
+        self._timers = []
+        loop = asyncio.get_running_loop()
+        url = next(iter(self._handlers.values()))._ARISTON_URL
+        for account in self._accounts.values():
+            await loop.run_in_executor(self._executor, self._logout, account, url)
+        for handler in self._handlers.values():
+            await handler.async_stop()
+        self._executor.shutdown(wait=False)
+        self._LOGGER.info("Fleet stopped")
+
+
+    def _logout(self, account, url):
+        """Logout shared account and close its session"""
+        if account.logged_in:
+            try:
+                account.session.get(f'{url}/R2/Account/Logout', timeout=AsyncAristonHandler._TIMEOUT_MIN)
+            except Exception as ex:
+                self._LOGGER.warning(f'Logout exception: {ex}')
+        account.session.close()
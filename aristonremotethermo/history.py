@@ -0,0 +1,108 @@
+"""In-memory history of numeric sensor values."""
+import array
+import bisect
+import threading
+
+
+class _Ring:
+    """
+    Ring buffer of timestamps and values.
+
+    Every item is written twice (at position and position + capacity), so the latest 'count' items are
+    always contiguous and can be returned as a memoryview without copying.
+    """
+
+    __slots__ = ('timestamps', 'values', 'start', 'count', 'capacity')
+
+    def __init__(self, capacity):
+        self.timestamps = array.array('d', bytes(16 * capacity))
+        self.values = array.array('d', bytes(16 * capacity))
+        self.start = 0
+        self.count = 0
+        self.capacity = capacity
+
+
+    def append(self, timestamp, value):
+        if self.count < self.capacity:
+            position = self.start + self.count
+            self.count += 1
+        else:
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+        position %= self.capacity
+        self.timestamps[position] = self.timestamps[position + self.capacity] = timestamp
+        self.values[position] = self.values[position + self.capacity] = value
+
+
+    def last_value(self):
+        if not self.count:
+            return None
+        return self.values[self.start + self.count - 1]
+
+
+class SensorHistory:
+    """
+    Fixed capacity history of numeric sensors.
+
+    'capacity' - number of the latest values kept per sensor.
+
+    A value is appended only if it differs from the previous value of the sensor, non-numeric values are ignored.
+    """
+
+    _CAPACITY = 2880
+
+    def __init__(self, capacity: int = _CAPACITY) -> None:
+        if not isinstance(capacity, int) or capacity < 1:
+            raise Exception("Capacity of history must be a positive integer")
+        self._capacity = capacity
+        self._rings = {}
+        self._lock = threading.Lock()
+
+
+    @property
+    def capacity(self) -> int:
+        """Return number of values kept per sensor."""
+        return self._capacity
+
+
+    @property
+    def sensors(self) -> list:
+        """Return sensors with recorded values."""
+        return list(self._rings)
+
+
+    def append(self, sensor: str, timestamp: float, value) -> bool:
+        """Append value of the sensor, return True if it was appended."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        with self._lock:
+            ring = self._rings.get(sensor)
+            if ring is None:
+                ring = self._rings[sensor] = _Ring(self._capacity)
+            elif ring.last_value() == value:
+                return False
+            ring.append(timestamp, value)
+        return True
+
+
+    def history(self, sensor: str, since: float = None) -> tuple:
+        """
+        Return tuple of memoryviews (timestamps, values) of the sensor from the oldest to the latest value.
+
+        'since' - only values with timestamp at or after it are returned.
+
+        Views share memory with the buffers, values older than 'capacity' appends are overwritten,
+        copy the views (e.g. with tolist) to keep them.
+        """
+        with self._lock:
+            ring = self._rings.get(sensor)
+            if ring is None:
+                empty = memoryview(array.array('d'))
+                return empty, empty
+            timestamps = memoryview(ring.timestamps)[ring.start:ring.start + ring.count]
+            values = memoryview(ring.values)[ring.start:ring.start + ring.count]
+        if since is not None:
+            first = bisect.bisect_left(timestamps, since)
+            timestamps = timestamps[first:]
+            values = values[first:]
+        return timestamps, values
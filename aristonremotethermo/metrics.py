@@ -0,0 +1,284 @@
+"""Metrics of Ariston NET handlers with Prometheus text exposition."""
+import abc
+import bisect
+import math
+import threading
+import time
+
+
+# Default buckets in seconds, suitable for http exchanges
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25)
+# Buckets in seconds for lock waiting and holding and other short operations
+SHORT_BUCKETS = (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value):
+    # quotes are escaped only in label values
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Metric(abc.ABC):
+    """Metric with samples per combination of label values"""
+
+    _TYPE = ""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise Exception(f"Metric {self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+    def _labels(self, key):
+        return tuple(zip(self.labelnames, key))
+
+
+    @abc.abstractmethod
+    def samples(self) -> list:
+        """Return list of samples as dictionaries with labels and values."""
+
+
+    def exposition(self) -> list:
+        """Return lines of Prometheus text exposition of the samples."""
+        return [
+            f"{self.name}{_format_labels(tuple(sample['labels'].items()))} {_format_value(sample['value'])}"
+            for sample in self.samples()
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    _TYPE = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase counter of the labels by the amount."""
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+    def value(self, **labels) -> float:
+        """Return value of the labels."""
+        return self._samples.get(self._key(labels), 0)
+
+
+    def samples(self) -> list:
+        with self._lock:
+            items = list(self._samples.items())
+        return [{"labels": dict(self._labels(key)), "value": value} for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value which can go up and down, set directly or computed by a function at collection"""
+
+    _TYPE = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """Set value of the labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = value
+
+
+    def set_function(self, func, **labels) -> None:
+        """Compute value of the labels by calling 'func' without arguments at collection."""
+        self.set(func, **labels)
+
+
+    def _items(self):
+        with self._lock:
+            items = list(self._samples.items())
+        return [(key, value() if callable(value) else value) for key, value in items]
+
+
+    def value(self, **labels) -> float:
+        """Return value of the labels."""
+        value = self._samples.get(self._key(labels), 0)
+        return value() if callable(value) else value
+
+
+    def samples(self) -> list:
+        return [{"labels": dict(self._labels(key)), "value": value} for key, value in self._items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    _TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+
+    def observe(self, value: float, **labels) -> None:
+        """Observe the value for the labels."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                # counts per bucket (the last one is +Inf), sum and count
+                sample = self._samples[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+
+    def _items(self):
+        with self._lock:
+            return [(key, list(counts), total, count) for key, (counts, total, count) in self._samples.items()]
+
+
+    def samples(self) -> list:
+        samples = []
+        for key, counts, total, count in self._items():
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                buckets[bound] = cumulative
+            samples.append({"labels": dict(self._labels(key)), "buckets": buckets, "sum": total, "count": count})
+        return samples
+
+
+    def exposition(self) -> list:
+        lines = []
+        for sample in self.samples():
+            labels = tuple(sample["labels"].items())
+            for bound, cumulative in sample["buckets"].items():
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', _format_value(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {sample['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registry of metrics.
+
+    Metrics are created on first use and returned on following calls with the same name, so one registry
+    can be shared by handlers of several plants (samples are distinguished by labels).
+    """
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+
+    def _get_or_create(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+                raise Exception(f"Metric {name} is already registered with other type or labels")
+            return metric
+
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """Return counter of the name."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        """Return gauge of the name."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """Return histogram of the name."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+    def snapshot(self) -> dict:
+        """Return dictionary of metric name to its type, documentation and samples."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric._TYPE, "documentation": metric.documentation, "samples": metric.samples()}
+            for metric in metrics
+        }
+
+
+    def exposition(self) -> str:
+        """Return metrics in Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric._TYPE}")
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedLock:
+    """
+    Lock observing time spent waiting for it and holding it.
+
+    'wait' and 'hold' - histograms observing seconds with 'labels'.
+    """
+
+    def __init__(self, wait: Histogram, hold: Histogram, **labels) -> None:
+        self._lock = threading.Lock()
+        self._wait = wait
+        self._hold = hold
+        self._labels = labels
+        self._acquired = 0.0
+
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired = time.perf_counter()
+            self._wait.observe(self._acquired - start, **self._labels)
+        return acquired
+
+
+    def release(self) -> None:
+        held = time.perf_counter() - self._acquired
+        self._lock.release()
+        self._hold.observe(held, **self._labels)
+
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+
+    def __exit__(self, *args):
+        self.release()
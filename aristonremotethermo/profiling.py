@@ -0,0 +1,348 @@
+"""
+Profiling of poll cycles of Ariston NET handlers.
+
+Profilers are attached with AsyncAristonHandler.set_profiler, which wraps hot methods of the handler.
+Nothing is wrapped while no profiler is attached, so there is no cost when profiling is disabled.
+
+Every wrapped call is a span labeled with the request type (e.g. 'main', 'energy', 'set' or 'queue'),
+nested spans inherit the request type of the outermost span running in the same thread (the cycle).
+"""
+import collections
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+class Profiler:
+    """
+    Base class of profilers.
+
+    'request_types' - request types to be profiled, all if not specified;
+
+    'max_cycles' - number of cycles to be profiled per request type, unlimited if not specified
+    (1 profiles a single poll cycle of every request type).
+    """
+
+    _OTHER = "other"
+
+    def __init__(self, request_types: list = None, max_cycles: int = None) -> None:
+        if max_cycles is not None and (not isinstance(max_cycles, int) or max_cycles < 1):
+            raise Exception("At least 1 cycle to profile is expected")
+        self._request_types = set(request_types) if request_types is not None else None
+        self._max_cycles = max_cycles
+        self._cycles = collections.Counter()
+        self._cycles_lock = threading.Lock()
+        self._local = threading.local()
+
+
+    def wrap(self, name: str, func, request_type: str = None, argument: int = None):
+        """
+        Return func wrapped into a span.
+
+        'request_type' - fixed request type of the span;
+
+        'argument' - position of the request type among arguments of func, used if 'request_type' is not specified.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = getattr(self._local, "stack", None)
+            if stack is None:
+                stack = self._local.stack = []
+            elif stack and stack[-1] is None:
+                # cycle is not profiled
+                return func(*args, **kwargs)
+            if request_type is not None:
+                span_request = request_type
+            elif argument is not None:
+                span_request = kwargs.get("request_type", args[argument] if len(args) > argument else "")
+            elif stack:
+                span_request = stack[-1][1]
+            else:
+                span_request = self._OTHER
+            if not stack:
+                if not self._start_cycle(span_request):
+                    # mark the cycle as not profiled, so nested spans are skipped
+                    stack.append(None)
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        stack.pop()
+            stack.append((name, span_request))
+            token = self.start_span(name, span_request, len(stack) == 1)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stop_span(name, span_request, len(stack) == 1, token)
+                stack.pop()
+        return wrapper
+
+
+    def _start_cycle(self, request_type):
+        """Check if the cycle shall be profiled and count it"""
+        if self._request_types is not None and request_type not in self._request_types:
+            return False
+        with self._cycles_lock:
+            if self._max_cycles is not None and self._cycles[request_type] >= self._max_cycles:
+                return False
+            self._cycles[request_type] += 1
+        return True
+
+
+    @property
+    def cycles(self) -> dict:
+        """Return number of profiled cycles per request type."""
+        return dict(self._cycles)
+
+
+    def start_span(self, name: str, request_type: str, cycle: bool):
+        """Start span, 'cycle' is True for the outermost span. Returned token is passed to stop_span."""
+        return None
+
+
+    def stop_span(self, name: str, request_type: str, cycle: bool, token) -> None:
+        """Stop span."""
+
+
+    def report(self) -> str:
+        """Return text report of the results."""
+        return ""
+
+
+    def dump(self, directory: str) -> list:
+        """Dump results per request type into the directory, return list of created files."""
+        return []
+
+
+    def close(self) -> None:
+        """Release resources of the profiler."""
+
+
+class SpanTimer(Profiler):
+    """Wall clock timer of spans per request type and span name"""
+
+    def __init__(self, request_types: list = None, max_cycles: int = None) -> None:
+        super().__init__(request_types, max_cycles)
+        # request type -> span name -> [count, total, maximum]
+        self._spans = collections.defaultdict(dict)
+        self._spans_lock = threading.Lock()
+
+
+    def start_span(self, name, request_type, cycle):
+        return time.perf_counter()
+
+
+    def stop_span(self, name, request_type, cycle, token):
+        elapsed = time.perf_counter() - token
+        with self._spans_lock:
+            span = self._spans[request_type].setdefault(name, [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += elapsed
+            span[2] = max(span[2], elapsed)
+
+
+    def statistics(self) -> dict:
+        """Return dictionary request type -> span name -> count, total and maximum seconds."""
+        with self._spans_lock:
+            return {
+                request_type: {
+                    name: {"count": count, "total": total, "max": maximum}
+                    for name, (count, total, maximum) in spans.items()
+                }
+                for request_type, spans in self._spans.items()
+            }
+
+
+    def report(self):
+        lines = [f"{'request':<18}{'span':<32}{'count':>7}{'mean ms':>10}{'max ms':>10}"]
+        for request_type, spans in sorted(self.statistics().items()):
+            for name, span in sorted(spans.items(), key=lambda item: -item[1]["total"]):
+                lines.append(f"{request_type:<18}{name:<32}{span['count']:>7}"
+                             f"{span['total'] / span['count'] * 1e3:>10.2f}{span['max'] * 1e3:>10.2f}")
+        return "\n".join(lines)
+
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "spans.json")
+        with open(path, "w", encoding="utf-8") as spans_file:
+            json.dump(self.statistics(), spans_file, indent=2)
+        return [path]
+
+
+class CProfiler(Profiler):
+    """
+    Deterministic profiler (cProfile) of cycles per request type.
+
+    Only one cycle is profiled at a time, cycles running concurrently in other threads are skipped.
+    """
+
+    def __init__(self, request_types: list = None, max_cycles: int = None) -> None:
+        super().__init__(request_types, max_cycles)
+        self._profile_lock = threading.Lock()
+        self._stats = {}
+
+
+    def _start_cycle(self, request_type):
+        if not self._profile_lock.acquire(blocking=False):
+            return False
+        if not super()._start_cycle(request_type):
+            self._profile_lock.release()
+            return False
+        return True
+
+
+    def start_span(self, name, request_type, cycle):
+        if not cycle:
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+
+    def stop_span(self, name, request_type, cycle, token):
+        if not cycle:
+            return
+        token.disable()
+        try:
+            if request_type in self._stats:
+                self._stats[request_type].add(token)
+            else:
+                self._stats[request_type] = pstats.Stats(token)
+        finally:
+            self._profile_lock.release()
+
+
+    def report(self, limit: int = 20):
+        with self._profile_lock:
+            stats = dict(self._stats)
+            output = io.StringIO()
+            for request_type, request_stats in sorted(stats.items()):
+                output.write(f"==== {request_type} ====\n")
+                request_stats.stream = output
+                request_stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        with self._profile_lock:
+            for request_type, request_stats in self._stats.items():
+                path = os.path.join(directory, f"{request_type}.prof")
+                request_stats.dump_stats(path)
+                paths.append(path)
+        return paths
+
+
+class SamplingProfiler(Profiler):
+    """
+    Sampling profiler of cycles per request type.
+
+    'interval' - seconds between samples of stacks of threads running profiled cycles.
+
+    Stacks are dumped in folded format (one 'frame;frame;frame count' line per stack), which is accepted by
+    flamegraph.pl and speedscope. Overhead does not depend on the number of calls, so it suits slow devices.
+    """
+
+    _INTERVAL = 0.005
+
+    def __init__(self, request_types: list = None, max_cycles: int = None, interval: float = _INTERVAL) -> None:
+        super().__init__(request_types, max_cycles)
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise Exception("Sampling interval must be a positive number")
+        self._interval = interval
+        # thread ident -> request type of the running cycle
+        self._active = {}
+        # request type -> folded stack -> count
+        self._samples = collections.defaultdict(collections.Counter)
+        self._condition = threading.Condition()
+        self._sampler = None
+        self._closed = False
+
+
+    def start_span(self, name, request_type, cycle):
+        if cycle:
+            with self._condition:
+                self._active[threading.get_ident()] = request_type
+                if self._sampler is None and not self._closed:
+                    self._sampler = threading.Thread(target=self._sample, name="AristonSampler", daemon=True)
+                    self._sampler.start()
+                self._condition.notify()
+        return None
+
+
+    def stop_span(self, name, request_type, cycle, token):
+        if cycle:
+            with self._condition:
+                self._active.pop(threading.get_ident(), None)
+
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+    def _sample(self):
+        """Sample stacks of active threads until closed"""
+        while True:
+            with self._condition:
+                while not self._active and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                active = dict(self._active)
+            frames = sys._current_frames()
+            folded = [(request_type, self._fold(frames[ident])) for ident, request_type in active.items()
+                      if ident in frames]
+            with self._condition:
+                for request_type, stack in folded:
+                    self._samples[request_type][stack] += 1
+            time.sleep(self._interval)
+
+
+    def _snapshot(self):
+        """Return copy of samples, taken under the lock the sampler writes with"""
+        with self._condition:
+            return {request_type: dict(stacks) for request_type, stacks in self._samples.items()}
+
+
+    def report(self, limit: int = 10):
+        lines = []
+        for request_type, stacks in sorted(self._snapshot().items()):
+            total = sum(stacks.values())
+            leaves = collections.Counter()
+            for stack, count in stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            lines.append(f"==== {request_type} ({total} samples) ====")
+            for leaf, count in leaves.most_common(limit):
+                lines.append(f"{count / total * 100:6.1f}%  {leaf}")
+        return "\n".join(lines)
+
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for request_type, stacks in self._snapshot().items():
+            path = os.path.join(directory, f"{request_type}.folded")
+            with open(path, "w", encoding="utf-8") as folded_file:
+                for stack, count in stacks.items():
+                    folded_file.write(f"{stack} {count}\n")
+            paths.append(path)
+        return paths
+
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
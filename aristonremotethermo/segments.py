@@ -0,0 +1,507 @@
+"""
+Compressed history of numeric sensors in fixed-size segment files read through mmap.
+
+Every sensor has its own directory of segment files named by the first timestamp. A segment starts
+with a header followed by a bit stream of points:
+    - timestamps (whole seconds) are delta-of-delta encoded:
+        '0' same delta, '10' + 7 bits, '110' + 9 bits, '1110' + 12 bits, '1111' + 32 bits;
+    - values are delta encoded as hundredths when both the value and the previous value are exact
+      in hundredths (temperatures, pressures, energy), otherwise XOR encoded as floats:
+        '0' same value, '10' + 7 bits, '110' + 16 bits, '1110' + 32 bits,
+        '1111' + 6 bits of leading zeros + 6 bits of length - 1 + meaningful bits of XOR.
+A point whose delta-of-delta does not fit into 32 bits starts a new segment, whose header keeps the full timestamp.
+
+Typical points take 2 - 3 bytes, so years of changes of all sensors of a plant fit into a few MB.
+Only segments overlapping the queried range are decoded.
+"""
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from .sink import HistorySink
+
+
+_MAGIC = b"ARSG"
+_VERSION = 1
+# magic, version, reserved, count, first timestamp, last timestamp, first value, length of bit stream
+_HEADER = struct.Struct("<4sHHIqqdI")
+_HEADER_SIZE = 64
+# maximum bits of one encoded point
+_MAX_POINT_BITS = 36 + 4 + 12 + 64
+_SCALE = 100
+_SENSOR_NAME = re.compile(r"^[A-Za-z0-9_.\- ]+$")
+
+_TIMESTAMP_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12), (0b1111, 4, 32))
+_VALUE_BUCKETS = ((0b10, 2, 7), (0b110, 3, 16), (0b1110, 4, 32))
+
+
+def _fits(value, bits):
+    return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+
+
+def _signed(value, bits):
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+def _float_bits(value):
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+def _scaled(value):
+    """Return value in hundredths if it is exact, otherwise None"""
+    if not math.isfinite(value):
+        return None
+    scaled = round(value * _SCALE)
+    return scaled if scaled / _SCALE == value else None
+
+
+class _BitWriter:
+    """Writer of bits into zero filled buffer"""
+
+    __slots__ = ('buffer', 'position')
+
+    def __init__(self, buffer, position):
+        self.buffer = buffer
+        self.position = position
+
+
+    def write(self, value, bits):
+        value &= (1 << bits) - 1
+        while bits:
+            index = self.position >> 3
+            free = 8 - (self.position & 7)
+            take = min(free, bits)
+            chunk = (value >> (bits - take)) & ((1 << take) - 1)
+            self.buffer[index] |= chunk << (free - take)
+            self.position += take
+            bits -= take
+
+
+class _BitReader:
+    """Reader of bits from buffer"""
+
+    __slots__ = ('buffer', 'position')
+
+    def __init__(self, buffer, position):
+        self.buffer = buffer
+        self.position = position
+
+
+    def read(self, bits):
+        value = 0
+        while bits:
+            index = self.position >> 3
+            free = 8 - (self.position & 7)
+            take = min(free, bits)
+            chunk = (self.buffer[index] >> (free - take)) & ((1 << take) - 1)
+            value = (value << take) | chunk
+            self.position += take
+            bits -= take
+        return value
+
+
+    def read_prefix(self, maximum):
+        """Read number of leading 1 bits terminated by 0, at most 'maximum' bits"""
+        ones = 0
+        while ones < maximum and self.read(1):
+            ones += 1
+        return ones
+
+
+class _Encoder:
+    """State of encoding of one segment"""
+
+    __slots__ = ('timestamp', 'delta', 'value')
+
+    def __init__(self, timestamp, value):
+        self.timestamp = timestamp
+        self.delta = 0
+        self.value = value
+
+
+    def fits(self, timestamp):
+        """Check if delta-of-delta of the timestamp can be encoded"""
+        return _fits(timestamp - self.timestamp - self.delta, _TIMESTAMP_BUCKETS[-1][2])
+
+
+    def encode(self, writer, timestamp, value):
+        delta = timestamp - self.timestamp
+        dod = delta - self.delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for code, code_bits, bits in _TIMESTAMP_BUCKETS:
+                if _fits(dod, bits):
+                    writer.write(code, code_bits)
+                    writer.write(dod, bits)
+                    break
+        self.timestamp = timestamp
+        self.delta = delta
+
+        if _float_bits(value) == _float_bits(self.value):
+            # bitwise comparison, so repeated NaN is the same value
+            writer.write(0, 1)
+        else:
+            scaled = _scaled(value)
+            previous = _scaled(self.value)
+            difference = scaled - previous if scaled is not None and previous is not None else None
+            if difference == 0:
+                # values differ only in sign of zero
+                difference = None
+            for code, code_bits, bits in _VALUE_BUCKETS:
+                if difference is not None and _fits(difference, bits):
+                    writer.write(code, code_bits)
+                    writer.write(difference, bits)
+                    break
+            else:
+                xor = _float_bits(value) ^ _float_bits(self.value)
+                leading = min(64 - xor.bit_length(), 63)
+                trailing = (xor & -xor).bit_length() - 1
+                length = 64 - leading - trailing
+                writer.write(0b1111, 4)
+                writer.write(leading, 6)
+                writer.write(length - 1, 6)
+                writer.write(xor >> trailing, length)
+        self.value = value
+
+
+    @staticmethod
+    def decode(reader, count, timestamp, value):
+        """Yield 'count' points following the first one"""
+        delta = 0
+        for _ in range(count):
+            prefix = reader.read_prefix(4)
+            if prefix:
+                bits = _TIMESTAMP_BUCKETS[prefix - 1][2]
+                delta += _signed(reader.read(bits), bits)
+            timestamp += delta
+
+            prefix = reader.read_prefix(4)
+            if prefix == 4:
+                leading = reader.read(6)
+                length = reader.read(6) + 1
+                trailing = 64 - leading - length
+                value = _bits_float(_float_bits(value) ^ (reader.read(length) << trailing))
+            elif prefix:
+                bits = _VALUE_BUCKETS[prefix - 1][2]
+                value = (_scaled(value) + _signed(reader.read(bits), bits)) / _SCALE
+            yield timestamp, value
+
+
+class _Segment:
+    """Segment file mapped into memory"""
+
+    def __init__(self, path, size, writable):
+        self.path = path
+        self.size = size
+        self._file = open(path, "r+b" if writable else "rb")
+        self.map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+
+    def header(self):
+        magic, version, _, count, first, last, value, bits = _HEADER.unpack_from(self.map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise Exception(f"Invalid segment {self.path}")
+        return count, first, last, value, bits
+
+
+    def points(self, start=None, end=None):
+        count, first, last, value, bits = self.header()
+        if not count:
+            return
+        points = [(first, value)]
+        points.extend(_Encoder.decode(_BitReader(self.map, _HEADER_SIZE * 8), count - 1, first, value))
+        for timestamp, point_value in points:
+            if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                yield timestamp, point_value
+
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+
+class _SensorSegments:
+    """Sealed segments and the active segment of a sensor"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (first timestamp, last timestamp, path) of sealed segments
+        self.sealed = []
+        self.active = None
+        self.encoder = None
+        self.writer = None
+        self.count = 0
+
+
+class SegmentStore(HistorySink):
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Store of compressed history segments, may be added to the handler as a history sink
+
+    'directory' - directory of the store, created if it does not exist;
+
+    'segment_size' - size of every segment file in bytes.
+
+    Numeric values of changed sensors are appended with timestamps rounded to whole seconds,
+    non-numeric values are ignored. The active segment of every sensor is written through mmap
+    and left to the operating system to be flushed, see flush.
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    _SEGMENT_SIZE = 4096
+    _MIN_SEGMENT_SIZE = 256
+    _SUFFIX = ".seg"
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self, directory: str, segment_size: int = _SEGMENT_SIZE) -> None:
+        if not isinstance(segment_size, int) or segment_size < self._MIN_SEGMENT_SIZE:
+            raise Exception(f"Segment size must be at least {self._MIN_SEGMENT_SIZE} bytes")
+        self._directory = directory
+        self._segment_size = segment_size
+        self._sensors = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for sensor in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, sensor)):
+                self._load_sensor(sensor)
+
+
+    def _load_sensor(self, sensor):
+        """Load headers of sealed segments and reopen the active one"""
+        segments = self._sensors[sensor] = _SensorSegments(os.path.join(self._directory, sensor))
+        names = sorted(
+            (name for name in os.listdir(segments.directory) if name.endswith(self._SUFFIX)),
+            key=lambda name: int(name[:-len(self._SUFFIX)]))
+        for index, name in enumerate(names):
+            path = os.path.join(segments.directory, name)
+            try:
+                segment = _Segment(path, self._segment_size, writable=index == len(names) - 1)
+                count, first, last, value, bits = segment.header()
+            except Exception as ex:
+                self._LOGGER.warning(f"Segment {path} is skipped: {ex}")
+                continue
+            segments.count += count
+            if index < len(names) - 1:
+                segments.sealed.append((first, last, path))
+                segment.close()
+            else:
+                self._resume(segments, segment)
+
+
+    def _resume(self, segments, segment):
+        """Restore encoder state of the active segment"""
+        count, first, last, value, bits = segment.header()
+        encoder = _Encoder(first, value)
+        previous = first
+        for timestamp, point_value in list(segment.points())[1:]:
+            encoder.delta = timestamp - previous
+            encoder.timestamp = previous = timestamp
+            encoder.value = point_value
+        segments.active = segment
+        segments.encoder = encoder
+        segments.writer = _BitWriter(segment.map, _HEADER_SIZE * 8 + bits)
+
+
+    def _new_segment(self, segments, timestamp, value):
+        """Seal the active segment and start a new one with the point"""
+        if segments.active is not None:
+            count, first, last, _, _ = segments.active.header()
+            segments.active.map.flush()
+            segments.active.close()
+            segments.sealed.append((first, last, segments.active.path))
+        os.makedirs(segments.directory, exist_ok=True)
+        path = os.path.join(segments.directory, f"{timestamp}{self._SUFFIX}")
+        with open(path, "wb") as segment_file:
+            segment_file.truncate(self._segment_size)
+        segment = _Segment(path, self._segment_size, writable=True)
+        _HEADER.pack_into(segment.map, 0, _MAGIC, _VERSION, 0, 1, timestamp, timestamp, value, 0)
+        segments.active = segment
+        segments.encoder = _Encoder(timestamp, value)
+        segments.writer = _BitWriter(segment.map, _HEADER_SIZE * 8)
+        segments.count += 1
+
+
+    def append(self, sensor: str, timestamp: float, value) -> bool:
+        """Append numeric value of the sensor, return True if it was appended."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not _SENSOR_NAME.match(sensor):
+            return False
+        timestamp = int(round(timestamp))
+        value = float(value)
+        with self._lock:
+            segments = self._sensors.get(sensor)
+            if segments is None:
+                segments = self._sensors[sensor] = _SensorSegments(os.path.join(self._directory, sensor))
+            if segments.active is None:
+                self._new_segment(segments, timestamp, value)
+                return True
+            count, first, last, first_value, bits = segments.active.header()
+            if timestamp < last:
+                return False
+            writer = segments.writer
+            if writer.position + _MAX_POINT_BITS > self._segment_size * 8 or not segments.encoder.fits(timestamp):
+                self._new_segment(segments, timestamp, value)
+                return True
+            segments.encoder.encode(writer, timestamp, value)
+            _HEADER.pack_into(
+                segments.active.map, 0, _MAGIC, _VERSION, 0, count + 1, first, timestamp, first_value,
+                writer.position - _HEADER_SIZE * 8)
+            segments.count += 1
+        return True
+
+
+    def write_values(self, timestamp, sensors):
+        for sensor, data in sensors.items():
+            value = data.get("value") if hasattr(data, "get") else data
+            self.append(sensor, timestamp, value)
+
+
+    @property
+    def sensors(self) -> list:
+        """Return sensors with stored values."""
+        return list(self._sensors)
+
+
+    @property
+    def statistics(self) -> dict:
+        """Return number of points, segments and bytes of segment files."""
+        with self._lock:
+            segments = sum(len(item.sealed) + (item.active is not None) for item in self._sensors.values())
+            return {
+                'points': sum(item.count for item in self._sensors.values()),
+                'segments': segments,
+                'bytes': segments * self._segment_size,
+            }
+
+
+    def query(self, sensor: str, start: float = None, end: float = None) -> list:
+        """Return list of (timestamp, value) points of the sensor within [start, end)."""
+        with self._lock:
+            segments = self._sensors.get(sensor)
+            if segments is None:
+                return []
+            sealed = [
+                path for first, last, path in segments.sealed
+                if (start is None or last >= start) and (end is None or first < end)
+            ]
+            points = []
+            for path in sealed:
+                segment = _Segment(path, self._segment_size, writable=False)
+                try:
+                    points.extend(segment.points(start, end))
+                finally:
+                    segment.close()
+            if segments.active is not None:
+                count, first, last, _, _ = segments.active.header()
+                if (start is None or last >= start) and (end is None or first < end):
+                    points.extend(segments.active.points(start, end))
+        return points
+
+
+    def _last_point_before(self, sensor, timestamp):
+        """Return the latest point of the sensor before the timestamp or None"""
+        with self._lock:
+            segments = self._sensors.get(sensor)
+            if segments is None:
+                return None
+            # the latest segment starting before the timestamp holds the point
+            if segments.active is not None and segments.active.header()[1] < timestamp:
+                candidates = [list(segments.active.points(None, timestamp))]
+            else:
+                candidates = []
+                for first, last, path in reversed(segments.sealed):
+                    if first < timestamp:
+                        segment = _Segment(path, self._segment_size, writable=False)
+                        try:
+                            candidates.append(list(segment.points(None, timestamp)))
+                        finally:
+                            segment.close()
+                        break
+        return candidates[0][-1] if candidates and candidates[0] else None
+
+
+    def aggregate(self, sensor: str, start: float, end: float, bucket: float, fn: str) -> list:
+        """
+        Return list of (bucket start, value) of buckets covering [start, end) computed from stored points.
+
+        Functions are the same as in SQLiteSink.aggregate. All points are kept, so any positive bucket is accepted,
+        only segments overlapping the range (and the one with the preceding point for 'integral') are decoded.
+        """
+        if fn not in self._AGGREGATE_FUNCTIONS:
+            raise Exception(f"Aggregate function must be one of {self._AGGREGATE_FUNCTIONS}")
+        if isinstance(bucket, bool) or not isinstance(bucket, (int, float)) or bucket <= 0:
+            raise Exception("Bucket must be a positive number of seconds")
+        first_bucket = start - start % bucket
+        points = self.query(sensor, first_bucket, end)
+        carry = None
+        if fn == "integral":
+            previous = self._last_point_before(sensor, first_bucket)
+            carry = previous[1] if previous is not None else None
+
+        now = time.time()
+        results = []
+        index = 0
+        bucket_start = first_bucket
+        while bucket_start < end:
+            bucket_end = bucket_start + bucket
+            values = []
+            integral = 0.0
+            cursor = bucket_start
+            while index < len(points) and points[index][0] < bucket_end:
+                timestamp, value = points[index]
+                index += 1
+                values.append(value)
+                # values hold until the next point, time after the current time is not counted
+                position = max(min(timestamp, now), cursor)
+                if carry is not None:
+                    integral += carry * (position - cursor)
+                cursor = position
+                carry = value
+            if fn == "integral":
+                if carry is not None and cursor < min(bucket_end, now):
+                    integral += carry * (min(bucket_end, now) - cursor)
+                value = integral
+            elif fn == "count":
+                value = len(values)
+            elif not values:
+                value = None
+            elif fn == "min":
+                value = min(values)
+            elif fn == "max":
+                value = max(values)
+            elif fn == "mean":
+                value = sum(values) / len(values)
+            else:
+                value = values[-1]
+            results.append((bucket_start, value))
+            bucket_start = bucket_end
+        return results
+
+
+    def flush(self) -> None:
+        """Flush active segments to the disk."""
+        with self._lock:
+            for segments in self._sensors.values():
+                if segments.active is not None:
+                    segments.active.map.flush()
+
+
+    def close(self) -> None:
+        """Flush and unmap active segments."""
+        with self._lock:
+            for segments in self._sensors.values():
+                if segments.active is not None:
+                    segments.active.map.flush()
+                    segments.active.close()
+                    segments.active = None
@@ -0,0 +1,125 @@
+"""On-disk cache of Ariston NET login sessions for fast restarts."""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Union
+
+import requests
+
+
+class SessionCache:
+    """
+    Cache of a login session (cookies, plant ID, features and zones) in a file readable only by its owner.
+
+    'path' - file of the cache, one file per plant;
+
+    'ttl' - seconds for which the cached session is assumed to be valid.
+
+    Password is never stored and username is stored only as a digest.
+    """
+
+    _TTL_SECONDS = 43200
+    _FILE_MODE = 0o600
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self, path: str, ttl: int = _TTL_SECONDS) -> None:
+        if not isinstance(path, str) or not path:
+            raise Exception("Path of the session cache must be specified")
+
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise Exception("TTL of the session cache must be a positive number")
+
+        self._path = path
+        self._ttl = ttl
+
+
+    @staticmethod
+    def _user_digest(username):
+        return hashlib.sha256(username.encode()).hexdigest()
+
+
+    def load(self, username: str, plant_id: str = "") -> Union[dict, None]:
+        """
+        Return cached session of the user or None if there is no valid session.
+
+        'plant_id' - wanted plant ID, any cached plant is accepted if empty.
+        """
+        try:
+            with open(self._path, encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as ex:
+            self._LOGGER.warning(f"Session cache could not be read: {ex}")
+            return None
+        try:
+            if cached["user"] != self._user_digest(username):
+                return None
+            if plant_id and cached["plant_id"] != plant_id:
+                return None
+            if not 0 <= time.time() - cached["saved"] < self._ttl:
+                self._LOGGER.info("Cached session expired")
+                return None
+            if not cached["plant_id"] or not cached["cookies"]:
+                return None
+        except (KeyError, TypeError) as ex:
+            self._LOGGER.warning(f"Session cache is invalid: {ex}")
+            return None
+        return cached
+
+
+    def store(self, username: str, session: requests.Session, plant_id: str, features: dict, zones: list) -> None:
+        """Store session of the user, the file is replaced atomically."""
+        cached = {
+            "user": self._user_digest(username),
+            "saved": time.time(),
+            "plant_id": plant_id,
+            "features": features,
+            "zones": zones,
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "expires": cookie.expires,
+                    "secure": cookie.secure,
+                }
+                for cookie in session.cookies
+            ],
+        }
+        temp_path = f"{self._path}.tmp"
+        try:
+            file_descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self._FILE_MODE)
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as cache_file:
+                json.dump(cached, cache_file)
+            os.chmod(temp_path, self._FILE_MODE)
+            os.replace(temp_path, self._path)
+        except OSError as ex:
+            self._LOGGER.warning(f"Session cache could not be stored: {ex}")
+
+
+    @staticmethod
+    def restore_cookies(session: requests.Session, cached: dict) -> None:
+        """Put cached cookies into the session."""
+        for cookie in cached["cookies"]:
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie["path"],
+                expires=cookie["expires"],
+                secure=cookie["secure"])
+
+
+    def invalidate(self) -> None:
+        """Remove cached session."""
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+        except OSError as ex:
+            self._LOGGER.warning(f"Session cache could not be removed: {ex}")
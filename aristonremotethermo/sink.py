@@ -0,0 +1,359 @@
+"""Persistent sinks of sensor history, see AsyncAristonHandler.add_history_sink."""
+import collections.abc
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+
+class HistorySink:
+    """
+    Base class of history sinks.
+
+    Methods are called by the handler while it stores received data, so they must not block.
+    """
+
+    # aggregate functions of sinks supporting aggregate queries
+    _AGGREGATE_FUNCTIONS = ("min", "max", "mean", "last", "count", "integral")
+
+    def write_values(self, timestamp: float, sensors: collections.abc.Mapping) -> None:
+        """Write changed sensors, 'sensors' maps sensor name to its data (value, units, attributes...)."""
+
+
+    def write_energy(self, timestamp: float, slots: collections.abc.Mapping) -> None:
+        """Write decoded energy slots, 'slots' maps energy sensor name to dictionary of slot label and value."""
+
+
+    def close(self) -> None:
+        """Write pending data and release resources."""
+
+
+class SQLiteSink(HistorySink):
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    SQLite history sink
+
+    'path' - file of the database;
+
+    'batch_interval' - seconds of collecting changes before they are written in one transaction;
+
+    'batch_size' - number of collected changes which are written immediately;
+
+    'retention' - seconds of keeping raw samples, forever if None;
+
+    'rollups' - dictionary of rollup resolution in seconds to retention in seconds (None - forever),
+    every rollup bucket keeps count, minimum, maximum, sum and the last value of numeric samples,
+    timestamp of the first sample and integral from the first sample to the end of the bucket
+    (values hold until the next sample), see aggregate. Rollups assume samples of a sensor in time order, samples
+    of a batch are sorted, a sample older than the latest written sample of the sensor is kept only as a raw sample.
+
+    Writes are done by a background thread in WAL mode, so an SD card sees one transaction per batch
+    instead of one write per change. Tables:
+        - samples (sensor, ts, value, text) with index on (sensor, ts), 'text' holds non-numeric values;
+        - energy_slots (sensor, slot, value, ts) with the latest value of every energy slot;
+        - rollups (sensor, resolution, bucket, count, min, max, sum, last, first_ts, integral).
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    _BATCH_INTERVAL = 60
+    _BATCH_SIZE = 500
+    _RETENTION = 30 * 86400
+    _ROLLUPS = {60: 7 * 86400, 3600: 400 * 86400, 86400: None}
+    _PRUNE_INTERVAL = 3600
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS samples (sensor TEXT NOT NULL, ts REAL NOT NULL, value REAL, text TEXT)",
+        "CREATE INDEX IF NOT EXISTS samples_sensor_ts ON samples (sensor, ts)",
+        "CREATE TABLE IF NOT EXISTS energy_slots ("
+        "sensor TEXT NOT NULL, slot TEXT NOT NULL, value REAL, ts REAL NOT NULL, PRIMARY KEY (sensor, slot))",
+        "CREATE TABLE IF NOT EXISTS rollups ("
+        "sensor TEXT NOT NULL, resolution INTEGER NOT NULL, bucket REAL NOT NULL, "
+        "count INTEGER NOT NULL, min REAL, max REAL, sum REAL, last REAL, first_ts REAL, integral REAL, "
+        "PRIMARY KEY (sensor, resolution, bucket))",
+    )
+
+    _ROLLUP_UPSERT = (
+        "INSERT INTO rollups (sensor, resolution, bucket, count, min, max, sum, last, first_ts, integral) "
+        "VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (sensor, resolution, bucket) DO UPDATE SET count = count + 1, min = min(min, excluded.min), "
+        "max = max(max, excluded.max), sum = sum + excluded.sum, last = excluded.last, "
+        # the previous last value is replaced by the new one from the new sample to the end of the bucket
+        "integral = integral + (excluded.last - last) * (bucket + resolution - excluded.first_ts)"
+    )
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self,
+                 path: str,
+                 batch_interval: float = _BATCH_INTERVAL,
+                 batch_size: int = _BATCH_SIZE,
+                 retention: float = _RETENTION,
+                 rollups: dict = None,
+                 ) -> None:
+        if not isinstance(batch_interval, (int, float)) or batch_interval < 0:
+            raise Exception("Batch interval must be a non-negative number")
+
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise Exception("Batch size must be a positive integer")
+
+        if retention is not None and (not isinstance(retention, (int, float)) or retention <= 0):
+            raise Exception("Retention must be a positive number or None")
+
+        if rollups is None:
+            rollups = dict(self._ROLLUPS)
+        for resolution, rollup_retention in rollups.items():
+            if not isinstance(resolution, int) or resolution < 1:
+                raise Exception("Rollup resolution must be a positive number of seconds")
+            if rollup_retention is not None and (not isinstance(rollup_retention, (int, float)) or rollup_retention <= 0):
+                raise Exception("Rollup retention must be a positive number or None")
+
+        self._path = path
+        self._batch_interval = batch_interval
+        self._batch_size = batch_size
+        self._retention = retention
+        self._rollups = dict(rollups)
+        self._queue = queue.Queue()
+        self._written = 0
+        self._transactions = 0
+        self._late = 0
+        # timestamp of the latest sample of every sensor added to rollups
+        self._latest = {}
+
+        # schema is created synchronously, so configuration errors are reported to the caller
+        connection = self._connect()
+        connection.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="AristonSQLiteSink", daemon=True)
+        self._writer.start()
+
+
+    def _connect(self):
+        connection = sqlite3.connect(self._path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+        return connection
+
+
+    @property
+    def statistics(self) -> dict:
+        """Return number of written rows, transactions, late samples left out of rollups and items waiting to be written."""
+        return {
+            'written': self._written,
+            'transactions': self._transactions,
+            'late': self._late,
+            'pending': self._queue.qsize(),
+        }
+
+
+    def write_values(self, timestamp, sensors):
+        for sensor, data in sensors.items():
+            value = data["value"] if isinstance(data, collections.abc.Mapping) else data
+            self._queue.put(("value", sensor, timestamp, value))
+
+
+    def write_energy(self, timestamp, slots):
+        for sensor, sensor_slots in slots.items():
+            for slot, value in sensor_slots.items():
+                self._queue.put(("energy", sensor, timestamp, (slot, value)))
+
+
+    def close(self) -> None:
+        """Write pending data and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+
+    def _write_loop(self):
+        """Collect items and write them in batches"""
+        connection = self._connect()
+        self._latest = dict(connection.execute(
+            "SELECT sensor, max(ts) FROM samples WHERE value IS NOT NULL GROUP BY sensor").fetchall())
+        last_prune = 0
+        closing = False
+        try:
+            while not closing:
+                batch = []
+                item = self._queue.get()
+                deadline = time.monotonic() + self._batch_interval
+                while True:
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self._batch_size:
+                        break
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if batch:
+                    try:
+                        self._write_batch(connection, batch)
+                    except sqlite3.Error as ex:
+                        self._LOGGER.warning(f"History batch of {len(batch)} items could not be written: {ex}")
+                if time.monotonic() - last_prune >= self._PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    try:
+                        self._prune(connection)
+                    except sqlite3.Error as ex:
+                        self._LOGGER.warning(f"History could not be pruned: {ex}")
+        finally:
+            connection.close()
+
+
+    def _write_batch(self, connection, batch):
+        samples = []
+        rollups = []
+        energy_slots = []
+        # stable sort keeps order of samples with the same timestamp
+        for kind, sensor, timestamp, value in sorted(batch, key=lambda item: item[2]):
+            if kind == "energy":
+                slot, slot_value = value
+                energy_slots.append((sensor, slot, slot_value, timestamp))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                samples.append((sensor, timestamp, value, None))
+                latest = self._latest.get(sensor)
+                if latest is not None and timestamp < latest:
+                    # integral of the rollup bucket is already computed up to the later sample
+                    self._late += 1
+                    self._LOGGER.debug(f"Late sample of {sensor} at {timestamp} is not added to rollups")
+                    continue
+                self._latest[sensor] = timestamp
+                for resolution in self._rollups:
+                    bucket = timestamp - timestamp % resolution
+                    rollups.append(
+                        (sensor, resolution, bucket, value, value, value, value, timestamp, value * (bucket + resolution - timestamp)))
+            else:
+                text = value if isinstance(value, str) or value is None else json.dumps(value, default=str)
+                samples.append((sensor, timestamp, None, text))
+        with connection:
+            connection.executemany("INSERT INTO samples (sensor, ts, value, text) VALUES (?, ?, ?, ?)", samples)
+            connection.executemany(self._ROLLUP_UPSERT, rollups)
+            connection.executemany(
+                "INSERT OR REPLACE INTO energy_slots (sensor, slot, value, ts) VALUES (?, ?, ?, ?)", energy_slots)
+        self._written += len(samples) + len(energy_slots)
+        self._transactions += 1
+
+
+    def _prune(self, connection):
+        """Remove samples and rollups older than their retention"""
+        now = time.time()
+        with connection:
+            if self._retention is not None:
+                connection.execute("DELETE FROM samples WHERE ts < ?", (now - self._retention,))
+            for resolution, retention in self._rollups.items():
+                if retention is not None:
+                    connection.execute(
+                        "DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (resolution, now - retention))
+
+
+    def query(self, sensor: str, start: float = None, end: float = None) -> list:
+        """Return list of (timestamp, value) samples of the sensor within [start, end), values written so far."""
+        connection = sqlite3.connect(self._path)
+        try:
+            return connection.execute(
+                "SELECT ts, coalesce(value, text) FROM samples WHERE sensor = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (sensor, start if start is not None else float("-inf"), end if end is not None else float("inf"))
+            ).fetchall()
+        finally:
+            connection.close()
+
+
+    def _aggregate_resolution(self, bucket):
+        """Return the coarsest rollup resolution dividing the bucket"""
+        resolutions = [resolution for resolution in self._rollups if isinstance(bucket, int) and bucket > 0 and bucket % resolution == 0]
+        if not resolutions:
+            raise Exception(f"Bucket must be a multiple of one of rollup resolutions {sorted(self._rollups)}")
+        return max(resolutions)
+
+
+    def aggregate(self, sensor: str, start: float, end: float, bucket: int, fn: str) -> list:
+        """
+        Return list of (bucket start, value) of buckets covering [start, end) computed from rollups.
+
+        'bucket' - seconds of a bucket, multiple of a rollup resolution, buckets are aligned to multiples of it;
+
+        'fn' - aggregate function of samples within a bucket:
+            - 'min', 'max', 'mean', 'last', 'count' - of samples, None if the bucket has no samples;
+            - 'integral' - value multiplied by seconds, values hold until the next sample (also across empty buckets),
+              time after the current time is not counted.
+
+        Only rollups written so far are used, samples waiting in the batch are not.
+        """
+        if fn not in self._AGGREGATE_FUNCTIONS:
+            raise Exception(f"Aggregate function must be one of {self._AGGREGATE_FUNCTIONS}")
+        resolution = self._aggregate_resolution(bucket)
+        first_bucket = start - start % bucket
+        connection = sqlite3.connect(self._path)
+        try:
+            rows = connection.execute(
+                "SELECT bucket, count, min, max, sum, last, first_ts, integral FROM rollups "
+                "WHERE sensor = ? AND resolution = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (sensor, resolution, first_bucket, end)).fetchall()
+            carry = None
+            if fn == "integral":
+                previous = connection.execute(
+                    "SELECT last FROM rollups WHERE sensor = ? AND resolution = ? AND bucket < ? "
+                    "ORDER BY bucket DESC LIMIT 1", (sensor, resolution, first_bucket)).fetchone()
+                carry = previous[0] if previous is not None else None
+        finally:
+            connection.close()
+
+        now = time.time()
+        results = []
+        index = 0
+        bucket_start = first_bucket
+        while bucket_start < end:
+            bucket_end = bucket_start + bucket
+            count = 0
+            minimum = maximum = last = None
+            total = 0.0
+            integral = 0.0
+            cursor = bucket_start
+            while index < len(rows) and rows[index][0] < bucket_end:
+                row_bucket, row_count, row_min, row_max, row_sum, row_last, row_first, row_integral = rows[index]
+                index += 1
+                count += row_count
+                minimum = row_min if minimum is None else min(minimum, row_min)
+                maximum = row_max if maximum is None else max(maximum, row_max)
+                total += row_sum
+                last = row_last
+                if fn == "integral":
+                    row_end = row_bucket + resolution
+                    if carry is not None:
+                        integral += carry * (max(min(row_first, now), cursor) - cursor)
+                    integral += row_integral
+                    if row_end > now:
+                        # the last value holds to the end of the rollup bucket, remove the future part
+                        integral -= row_last * (row_end - max(now, row_first))
+                    cursor = row_end
+                    carry = row_last
+            if fn == "integral":
+                if carry is not None and cursor < min(bucket_end, now):
+                    integral += carry * (min(bucket_end, now) - cursor)
+                value = integral
+            elif fn == "count":
+                value = count
+            elif not count:
+                value = None
+            elif fn == "min":
+                value = minimum
+            elif fn == "max":
+                value = maximum
+            elif fn == "mean":
+                value = total / count
+            else:
+                value = last
+            results.append((bucket_start, value))
+            bucket_start = bucket_end
+        return results
@@ -0,0 +1,482 @@
+"""
+Local stand-in of the Ariston NET cloud for offline testing and load tests.
+
+Implements the endpoints used by AsyncAristonHandler with configurable latency, error injection and
+number of zones. Point the handler to the stand-in with its 'ariston_url' argument.
+
+Usage:
+    python -m aristonremotethermo.standin [--port 8080] [--plants 1] [--zones 2] [--latency 0.2] [--error-rate 0.05]
+"""
+import argparse
+import collections
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Plant wide data items (value and value description)
+_ZONE_0_ITEMS = {
+    "ChFlowSetpointTemp": {"value": 45, "min": 20, "max": 80, "step": 1, "unit": "°C"},
+    "HeatingCircuitPressure": {"value": 1.5, "min": 0, "max": 4, "step": 0.1, "unit": "bar"},
+    "OutsideTemp": {"value": 5.5, "min": -40, "max": 50, "step": 0.5, "unit": "°C"},
+    "Weather": {"value": 1},
+    "PlantMode": {"value": 1, "options": [0, 1, 2, 3, 5], "optTexts": ["Summer", "Winter", "Heating only", "Cooling", "OFF"]},
+    "Holiday": {"value": 0, "options": [0, 1]},
+    "IsFlameOn": {"value": 0, "options": [0, 1]},
+    "DhwTemp": {"value": 50, "min": 40, "max": 65, "step": 1, "unit": "°C"},
+    "DhwMode": {"value": 0, "options": [0, 1, 2], "optTexts": ["Manual", "Time program", "Comfort"]},
+    "DhwTimeProgComfortTemp": {"value": 55, "min": 40, "max": 65, "step": 1, "unit": "°C"},
+    "DhwTimeProgEconomyTemp": {"value": 45, "min": 40, "max": 65, "step": 1, "unit": "°C"},
+    "DhwStorageTemperature": {"value": 48, "min": 0, "max": 100, "step": 0.5, "unit": "°C"},
+    "IsHeatingPumpOn": {"value": 0, "options": [0, 1]},
+}
+
+# Data items of every zone
+_ZONE_ITEMS = {
+    "ZoneHeatRequest": {"value": 0, "options": [0, 1]},
+    "ZoneMode": {"value": 2, "options": [0, 1, 2], "optTexts": ["OFF", "Manual", "Time program"]},
+    "ZoneDesiredTemp": {"value": 21, "min": 5, "max": 30, "step": 0.5, "unit": "°C"},
+    "ZoneMeasuredTemp": {"value": 20.5, "min": -10, "max": 50, "step": 0.5, "unit": "°C"},
+    "ZoneDeroga": {"value": 0, "min": -5, "max": 5, "step": 0.5, "unit": "°C"},
+    "ZoneComfortTemp": {"value": 21, "min": 5, "max": 30, "step": 0.5, "unit": "°C"},
+    "IsZonePilotOn": {"value": 0, "options": [0, 1]},
+    "ZoneEconomyTemp": {"value": 18, "min": 5, "max": 30, "step": 0.5, "unit": "°C"},
+    "HeatingFlowTemp": {"value": 40, "min": 20, "max": 80, "step": 1, "unit": "°C"},
+    "HeatingFlowOffset": {"value": 0, "min": -14, "max": 14, "step": 1, "unit": "°C"},
+    "CoolingFlowTemp": {"value": 18, "min": 5, "max": 25, "step": 1, "unit": "°C"},
+    "CoolingFlowOffset": {"value": 0, "min": -14, "max": 14, "step": 1, "unit": "°C"},
+}
+
+_OFF_ON_OPTIONS = [{"value": 0, "text": "OFF"}, {"value": 1, "text": "ON"}]
+
+# Web menu parameters
+_MENU_ITEMS = {
+    "U6_16_6": {"value": 1, "dropDownOptions": _OFF_ON_OPTIONS},
+    "U6_16_7": {"value": 0, "dropDownOptions": _OFF_ON_OPTIONS},
+    "U6_9_5_0": {"value": 0, "dropDownOptions": _OFF_ON_OPTIONS},
+    "U6_3_3": {"value": 1, "dropDownOptions": _OFF_ON_OPTIONS},
+    "U6_9_2": {"value": 1, "dropDownOptions": [{"value": 0, "text": "Disabled"}, {"value": 1, "text": "Time based"}, {"value": 2, "text": "Always active"}]},
+    "U6_16_5": {"value": 75, "min": 0, "max": 100, "increment": 1, "unitLabel": "%"},
+    "U6_9_5_1": {"value": 7, "min": 1, "max": 30, "increment": 1, "unitLabel": "days"},
+    "U6_3_0_0": {"value": 45, "min": 20, "max": 80, "increment": 1, "unitLabel": "°C"},
+    "U6_3_0_1": {"value": 50, "min": 20, "max": 80, "increment": 1, "unitLabel": "°C"},
+}
+
+# Energy series keys and lengths of periods in consSequencesApi8
+_ENERGY_SERIES = [7, 10, 1, 2, 20, 21]
+_ENERGY_PERIODS = {1: 12, 2: 7, 3: 31, 4: 12}
+
+
+class _Plant:
+    """State of one plant"""
+
+    def __init__(self, gw, zones, rnd):
+        self.gw = gw
+        self.zones = list(range(1, zones + 1))
+        self.items = {}
+        for item_id, item in _ZONE_0_ITEMS.items():
+            self.items[(item_id, 0)] = dict(item)
+        for zone in self.zones:
+            for item_id, item in _ZONE_ITEMS.items():
+                self.items[(item_id, zone)] = dict(item)
+        self.menu = {menu_id: dict(item) for menu_id, item in _MENU_ITEMS.items()}
+        self.errors = []
+        self.energy = [
+            {"k": k_num, "p": period, "v": [rnd.randint(0, 9) for _ in range(length)]}
+            for k_num in _ENERGY_SERIES
+            for period, length in _ENERGY_PERIODS.items()
+        ]
+
+    def features(self):
+        return {
+            "zones": [{"num": zone, "name": f"Zone {zone}"} for zone in self.zones],
+            "hasDhw": True,
+            "hasBoiler": True,
+        }
+
+    def data_items(self, request_items):
+        items = []
+        for request_item in request_items:
+            key = (request_item["id"], request_item["zn"])
+            if key in self.items:
+                items.append({"id": key[0], "zone": key[1], **self.items[key]})
+        return {"items": items}
+
+    def set_value(self, item_id, zone, value):
+        self.items[(item_id, zone)]["value"] = value
+
+
+class AristonStandIn:
+    """
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Local stand-in of Ariston NET cloud
+
+    'plants' - number of plants (gateways GW1, GW2, ...) of the account;
+
+    'zones' - number of zones of every plant;
+
+    'latency' - seconds to wait before every reply;
+
+    'jitter' - maximum of random seconds added to the latency;
+
+    'error_rate' - probability of replying to data requests with 'error_code' instead of data;
+
+    'require_login' - reply 401 to requests without session cookie of a previous login;
+
+    'drift' - maximum random change of measured temperatures on every main read (so replies are not identical);
+
+    'seed' - seed of random generator for reproducible runs.
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    """
+
+    _SESSION_COOKIE = ".AspNet.ApplicationCookie"
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self,
+                 plants: int = 1,
+                 zones: int = 1,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_code: int = 500,
+                 require_login: bool = True,
+                 drift: float = 0.0,
+                 seed: int = None,
+                 ) -> None:
+        if not isinstance(plants, int) or plants < 1:
+            raise Exception("At least 1 plant is expected")
+
+        if not isinstance(zones, int) or not 1 <= zones <= 6:
+            raise Exception("Number of zones must be from 1 to 6")
+
+        if not 0 <= error_rate <= 1:
+            raise Exception("Error rate must be from 0 to 1")
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.require_login = require_login
+        self.drift = drift
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._plants = {f"GW{index}": _Plant(f"GW{index}", zones, self._random) for index in range(1, plants + 1)}
+        self._sessions = set()
+        self._requests = collections.Counter()
+        self._injected_errors = 0
+        self._server = None
+        self._thread = None
+        self._routes = [
+            ("POST", r"/R2/Account/Login", self._login),
+            ("GET", r"/R2/Account/Logout", self._logout),
+            ("GET", r"/api/v2/remote/plants/lite", self._plants_lite),
+            ("GET", r"/api/v2/remote/plants/(?P<gw>\w+)/features", self._features),
+            ("POST", r"/api/v2/remote/dataItems/(?P<gw>\w+)/get", self._data_items),
+            ("GET", r"/api/v2/busErrors", self._bus_errors),
+            ("GET", r"/api/v2/remote/timeProgs/(?P<gw>\w+)/(?P<program>ChZn1|Dhw)", self._time_program),
+            ("GET", r"/R2/PlantMenu/Refresh", self._menu_refresh),
+            ("POST", r"/R2/PlantMenu/Submit/(?P<gw>\w+)", self._menu_submit),
+            ("GET", r"/api/v2/remote/reports/(?P<gw>\w+)/energyAccount", self._energy_account),
+            ("GET", r"/api/v2/remote/reports/(?P<gw>\w+)/consSequencesApi8", self._energy_sequences),
+            ("POST", r"/api/v2/remote/plantData/(?P<gw>\w+)/mode", self._set_mode),
+            ("POST", r"/api/v2/remote/plantData/(?P<gw>\w+)/dhwMode", self._set_dhw_mode),
+            ("POST", r"/api/v2/remote/plantData/(?P<gw>\w+)/dhwTemp", self._set_dhw_temperature),
+            ("POST", r"/api/v2/remote/plantData/(?P<gw>\w+)/dhwTimeProgTemperatures", self._set_dhw_temperatures),
+            ("POST", r"/api/v2/remote/zones/(?P<gw>\w+)/(?P<zone>\d)/mode", self._set_zone_mode),
+            ("POST", r"/api/v2/remote/zones/(?P<gw>\w+)/(?P<zone>\d)/temperatures", self._set_zone_temperatures),
+        ]
+
+
+    @property
+    def url(self) -> str:
+        """Return URL of the running stand-in to be used as 'ariston_url' of the handler."""
+        if self._server is None:
+            return ""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    @property
+    def statistics(self) -> dict:
+        """Return number of requests per endpoint and number of injected errors."""
+        with self._lock:
+            return {"requests": dict(self._requests), "injected_errors": self._injected_errors}
+
+
+    def plant(self, gw: str = "GW1") -> dict:
+        """Return current data item values of the plant with (item id, zone) as a key."""
+        with self._lock:
+            return {key: item["value"] for key, item in self._plants[gw].items.items()}
+
+
+    def add_error(self, gw: str, code: str, description: str) -> None:
+        """Add active error of the plant reported by busErrors."""
+        with self._lock:
+            self._plants[gw].errors.append({
+                "gw": gw,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "fault": 0,
+                "mult": 0,
+                "code": code,
+                "pri": 0,
+                "errDex": description,
+                "res": False,
+                "blk": True,
+            })
+
+
+    def clear_sessions(self) -> None:
+        """Forget all sessions, following requests are rejected until login."""
+        with self._lock:
+            self._sessions.clear()
+
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving in a background thread and return URL of the stand-in."""
+        self._server = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="AristonStandIn", daemon=True)
+        self._thread.start()
+        self._LOGGER.info(f"Ariston stand-in serving at {self.url}")
+        return self.url
+
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def _make_request_handler(self):
+        standin = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                standin._LOGGER.debug(format % args)
+
+            def do_GET(self):
+                standin._handle(self, "GET")
+
+            def do_POST(self):
+                standin._handle(self, "POST")
+
+        return _RequestHandler
+
+
+    def _handle(self, request, method):
+        """Route the request and send the reply"""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        parsed = urllib.parse.urlsplit(request.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        body = None
+        if method == "POST":
+            length = int(request.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(request.rfile.read(length) or b"null")
+            except ValueError:
+                return self._reply(request, 400, {"error": "invalid json"})
+        for route_method, pattern, action in self._routes:
+            match = re.fullmatch(pattern, parsed.path)
+            if match and route_method == method:
+                break
+        else:
+            return self._reply(request, 404, {"error": "unknown endpoint"})
+        with self._lock:
+            self._requests[action.__name__.lstrip("_")] += 1
+            if action not in (self._login, self._logout):
+                if self.require_login and self._session_of(request) not in self._sessions:
+                    return self._reply(request, 401, {"error": "not logged in"})
+                if self.error_rate and self._random.random() < self.error_rate:
+                    self._injected_errors += 1
+                    return self._reply(request, self.error_code, {"error": "injected error"})
+            gw = match.groupdict().get("gw") or query.get("gatewayId") or query.get("id")
+            if gw is not None and gw not in self._plants:
+                return self._reply(request, 404, {"error": f"unknown gateway {gw}"})
+            plant = self._plants.get(gw)
+            try:
+                return action(request, plant, match, query, body)
+            except (KeyError, TypeError, ValueError) as ex:
+                return self._reply(request, 400, {"error": f"invalid request {ex}"})
+
+
+    def _session_of(self, request):
+        for cookie in request.headers.get("Cookie", "").split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name == self._SESSION_COOKIE:
+                return value
+        return None
+
+
+    @staticmethod
+    def _reply(request, code, data, headers=None):
+        body = json.dumps(data).encode()
+        request.send_response(code)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+
+    def _login(self, request, plant, match, query, body):
+        if not body or not body.get("email") or not body.get("password"):
+            return self._reply(request, 401, {"ok": False})
+        session = uuid.uuid4().hex
+        self._sessions.add(session)
+        return self._reply(request, 200, {"ok": True}, {"Set-Cookie": f"{self._SESSION_COOKIE}={session}; Path=/; HttpOnly"})
+
+
+    def _logout(self, request, plant, match, query, body):
+        self._sessions.discard(self._session_of(request))
+        return self._reply(request, 200, {})
+
+
+    def _plants_lite(self, request, plant, match, query, body):
+        return self._reply(request, 200, [{"gwId": gw, "name": f"Plant {gw}"} for gw in self._plants])
+
+
+    def _features(self, request, plant, match, query, body):
+        return self._reply(request, 200, plant.features())
+
+
+    def _data_items(self, request, plant, match, query, body):
+        if self.drift:
+            for zone in plant.zones:
+                item = plant.items[("ZoneMeasuredTemp", zone)]
+                item["value"] = round(item["value"] + self._random.uniform(-self.drift, self.drift), 1)
+        return self._reply(request, 200, plant.data_items(body["items"]))
+
+
+    def _bus_errors(self, request, plant, match, query, body):
+        return self._reply(request, 200, plant.errors)
+
+
+    def _time_program(self, request, plant, match, query, body):
+        if match.group("program") == "ChZn1":
+            slices = [{"from": 360, "temp": 1}, {"from": 1320, "temp": 0}]
+        else:
+            slices = [{"from": 300, "temp": 1}, {"from": 1380, "temp": 0}]
+        plans = [{"days": [1, 2, 3, 4, 5], "slices": slices}, {"days": [0, 6], "slices": [{"from": 480, "temp": 1}]}]
+        return self._reply(request, 200, {match.group("program"): {"plans": plans}})
+
+
+    def _menu_refresh(self, request, plant, match, query, body):
+        menu_ids = [menu_id for menu_id in query.get("paramIds", "").split(",") if menu_id]
+        unknown = [menu_id for menu_id in menu_ids if menu_id not in plant.menu]
+        if unknown:
+            # the cloud reports unsupported menu items within HTML of the internal error
+            menu = unknown[0].replace("U", "").replace("_", ".")
+            return self._reply(request, 500, f"Violated Postcondition &quot;{menu}&quot; menu")
+        return self._reply(request, 200, {"data": [{"id": menu_id, **plant.menu[menu_id]} for menu_id in menu_ids]})
+
+
+    def _menu_submit(self, request, plant, match, query, body):
+        for item in body:
+            plant.menu[item["id"]]["value"] = item["value"]
+        return self._reply(request, 200, {"ok": True})
+
+
+    def _energy_account(self, request, plant, match, query, body):
+        return self._reply(request, 200, {"LastMonth": [{"use": 1, "gas": 120, "elect": 4}, {"use": 2, "gas": 45, "elect": 1}]})
+
+
+    def _energy_sequences(self, request, plant, match, query, body):
+        return self._reply(request, 200, plant.energy)
+
+
+    def _set_mode(self, request, plant, match, query, body):
+        plant.set_value("PlantMode", 0, body["new"])
+        return self._reply(request, 200, {})
+
+
+    def _set_dhw_mode(self, request, plant, match, query, body):
+        plant.set_value("DhwMode", 0, body["new"])
+        return self._reply(request, 200, {})
+
+
+    def _set_dhw_temperature(self, request, plant, match, query, body):
+        plant.set_value("DhwTemp", 0, body["new"])
+        return self._reply(request, 200, {})
+
+
+    def _set_dhw_temperatures(self, request, plant, match, query, body):
+        plant.set_value("DhwTimeProgComfortTemp", 0, body["new"]["comf"])
+        plant.set_value("DhwTimeProgEconomyTemp", 0, body["new"]["econ"])
+        return self._reply(request, 200, {})
+
+
+    def _set_zone_mode(self, request, plant, match, query, body):
+        plant.set_value("ZoneMode", int(match.group("zone")), body["new"])
+        return self._reply(request, 200, {})
+
+
+    def _set_zone_temperatures(self, request, plant, match, query, body):
+        zone = int(match.group("zone"))
+        plant.set_value("ZoneComfortTemp", zone, body["new"]["comf"])
+        plant.set_value("ZoneEconomyTemp", zone, body["new"]["econ"])
+        plant.set_value("ZoneDesiredTemp", zone, body["new"]["comf"])
+        return self._reply(request, 200, {})
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Local stand-in of Ariston NET cloud")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--plants", type=int, default=1)
+    parser.add_argument("--zones", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before every reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum of random seconds added to latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of error reply to data requests")
+    parser.add_argument("--error-code", type=int, default=500)
+    parser.add_argument("--drift", type=float, default=0.0, help="maximum change of measured temperatures per read")
+    parser.add_argument("--no-login", action="store_true", help="do not require login")
+    parser.add_argument("--seed", type=int, default=None)
+    options = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    standin = AristonStandIn(
+        plants=options.plants,
+        zones=options.zones,
+        latency=options.latency,
+        jitter=options.jitter,
+        error_rate=options.error_rate,
+        error_code=options.error_code,
+        require_login=not options.no_login,
+        drift=options.drift,
+        seed=options.seed)
+    standin.start(options.host, options.port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
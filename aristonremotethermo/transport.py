@@ -0,0 +1,194 @@
+"""
+Recording and replaying of http exchanges with Ariston NET cloud.
+
+RecordingSession stores every exchange of a real session, ReplaySession serves them again without network,
+so decoding, storing of data and informing of subscribers can be profiled on captured traffic.
+Both are requests.Session objects, pass them to the handler with its 'session' argument.
+
+Recording is a gzip compressed file of JSON lines. The first line is a header, every other line is one exchange:
+    [offset, elapsed, method, path, request_json, status, body, error]
+where 'offset' is time since the start of recording, 'elapsed' is duration of the exchange and 'error' is
+name of the raised exception (status and body are then null). Login data (email, password) and the username
+in bodies are replaced with a placeholder, headers and cookies are never stored.
+"""
+import collections
+import datetime
+import gzip
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+import requests
+
+
+_FORMAT_VERSION = 1
+_SCRUBBED = "***"
+# keys of json data holding credentials
+_SECRET_KEYS = {"email", "password", "username", "user", "token", "accessToken", "refreshToken"}
+# exceptions which can be recorded and raised during replay
+_ERRORS = {
+    "Timeout": requests.exceptions.Timeout,
+    "ConnectionError": requests.exceptions.ConnectionError,
+}
+
+
+def _path(url):
+    """Return path and query of the url, host is not relevant for replay"""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def _scrub(data):
+    """Return copy of json data with values of secret keys replaced"""
+    if isinstance(data, dict):
+        return {key: _SCRUBBED if key in _SECRET_KEYS else _scrub(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_scrub(item) for item in data]
+    return data
+
+
+class RecordingSession(requests.Session):
+    """
+    Session recording every exchange to a file.
+
+    'path' - file of the recording, replaced if it exists.
+
+    The file is completed when the session is closed.
+    """
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"version": _FORMAT_VERSION, "started": time.time()}) + "\n")
+        self._file_lock = threading.Lock()
+        self._start = time.monotonic()
+        self._secrets = set()
+        self.exchanges = 0
+
+
+    def _scrub_text(self, text):
+        for secret in self._secrets:
+            text = text.replace(secret, _SCRUBBED)
+        return text
+
+
+    def request(self, method, url, *args, **kwargs):
+        json_data = kwargs.get("json")
+        if isinstance(json_data, dict):
+            self._secrets.update(
+                value for key, value in json_data.items() if key in _SECRET_KEYS and isinstance(value, str) and value)
+        offset = time.monotonic() - self._start
+        try:
+            resp = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as ex:
+            error = "Timeout" if isinstance(ex, requests.exceptions.Timeout) else "ConnectionError"
+            self._record(offset, time.monotonic() - self._start - offset, method, url, json_data, None, None, error)
+            raise
+        self._record(offset, resp.elapsed.total_seconds(), method, url, json_data, resp.status_code, resp.text, None)
+        return resp
+
+
+    def _record(self, offset, elapsed, method, url, json_data, status, body, error):
+        exchange = [
+            round(offset, 3),
+            round(elapsed, 3),
+            method.upper(),
+            self._scrub_text(_path(url)),
+            _scrub(json_data),
+            status,
+            self._scrub_text(body) if body is not None else None,
+            error,
+        ]
+        with self._file_lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(exchange, separators=(",", ":"), ensure_ascii=False) + "\n")
+            self.exchanges += 1
+
+
+    def close(self) -> None:
+        """Close session and complete the recording."""
+        super().close()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._LOGGER.info(f"Recorded {self.exchanges} exchanges to {self._path}")
+
+
+class ReplaySession(requests.Session):
+    """
+    Session serving recorded exchanges without network.
+
+    'path' - file of the recording (see RecordingSession);
+
+    'speed' - replay speed, recorded duration of every exchange is divided by it (0 - no delay);
+
+    'loop' - start from the beginning when recorded exchanges of a request are used up, otherwise
+    ConnectionError is raised.
+
+    Exchanges are matched by method and path (host and request data are ignored) in the recorded order.
+    """
+
+    _LOGGER = logging.getLogger(__name__)
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False) -> None:
+        if not isinstance(speed, (int, float)) or speed < 0:
+            raise Exception("Replay speed must be a positive number or 0")
+        super().__init__()
+        self._speed = speed
+        self._loop = loop
+        self._exchanges = collections.defaultdict(list)
+        with gzip.open(path, "rt", encoding="utf-8") as recording:
+            header = json.loads(recording.readline())
+            if header.get("version") != _FORMAT_VERSION:
+                raise Exception(f"Unsupported version of recording {header.get('version')}")
+            for line in recording:
+                exchange = json.loads(line)
+                self._exchanges[(exchange[2], exchange[3])].append(exchange)
+        self._positions = collections.Counter()
+        self._positions_lock = threading.Lock()
+        self.replayed = 0
+
+
+    @property
+    def recorded(self) -> int:
+        """Return number of recorded exchanges."""
+        return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+
+    def _next_exchange(self, method, url):
+        key = (method.upper(), _path(url))
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            raise requests.exceptions.ConnectionError(f"No recorded exchange for {key[0]} {key[1]}")
+        with self._positions_lock:
+            position = self._positions[key]
+            if position >= len(exchanges):
+                if not self._loop:
+                    raise requests.exceptions.ConnectionError(f"Recorded exchanges for {key[0]} {key[1]} are used up")
+                position = 0
+            self._positions[key] = position + 1
+            self.replayed += 1
+        return exchanges[position]
+
+
+    def request(self, method, url, *args, **kwargs):
+        _, elapsed, _, _, _, status, body, error = self._next_exchange(method, url)
+        if self._speed:
+            time.sleep(elapsed / self._speed)
+        if error is not None:
+            raise _ERRORS.get(error, requests.exceptions.ConnectionError)(f"Replayed {error}")
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = "Replayed"
+        resp.url = url
+        resp.encoding = "utf-8"
+        resp._content = body.encode("utf-8")
+        resp.elapsed = datetime.timedelta(seconds=elapsed)
+        return resp
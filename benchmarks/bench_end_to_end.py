@@ -0,0 +1,213 @@
+"""
+End-to-end benchmark of AristonHandler against the local stand-in of Ariston NET cloud.
+
+Reports per request type:
+    - latency percentiles of polls (http exchange and storing of data);
+    - CPU time of _store_data per poll;
+    - peak memory allocated by _store_data per poll (measured in a separate phase with tracemalloc);
+and for the whole run:
+    - maximum number of threads;
+    - time to the first complete snapshot (every enabled request stored at least once);
+    - latency from set_http_data until the value is confirmed in _get_visible_sensor_value.
+
+Periods are shortened so a run takes seconds, the stand-in runs in the same process.
+
+Usage:
+    python benchmarks/bench_end_to_end.py [--duration 10] [--zones 3] [--latency 0.02] [--sets 10] [--json results.json]
+"""
+import argparse
+import collections
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from aristonremotethermo.ariston import AristonHandler
+from aristonremotethermo.standin import AristonStandIn
+
+
+class _BenchHandler(AristonHandler):
+    """Handler with periods shortened for benchmarking"""
+
+    _GET_SENSORS_PERIOD_SECONDS = 0.05
+    _SET_SENSORS_PERIOD_SECONDS = 0.05
+    _MIN_REQUEST_INTERVAL = 0.02
+
+
+class _Probe:
+    """Measurements collected by wrapping methods of the handler"""
+
+    def __init__(self, handler, trace_memory=False):
+        self.handler = handler
+        self.trace_memory = trace_memory
+        self.lock = threading.Lock()
+        self.poll_latency = collections.defaultdict(list)
+        self.store_cpu = collections.defaultdict(list)
+        self.store_memory = collections.defaultdict(list)
+        self.first_stored = {}
+        self.set_requested = {}
+        self.set_confirmed = []
+        self.max_threads = threading.active_count()
+        self._wrap()
+
+    def _wrap(self):
+        handler = self.handler
+        get_http_data = handler._get_http_data
+        store_data = handler._store_data
+        get_visible_sensor_value = handler._get_visible_sensor_value
+
+        def timed_get_http_data(request_type=""):
+            start = time.perf_counter()
+            try:
+                return get_http_data(request_type)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.poll_latency[request_type].append(elapsed)
+                    self.max_threads = max(self.max_threads, threading.active_count())
+
+        def timed_store_data(json_data, request_type=""):
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            start = time.thread_time()
+            store_data(json_data, request_type)
+            elapsed = time.thread_time() - start
+            with self.lock:
+                self.store_cpu[request_type].append(elapsed)
+                self.first_stored.setdefault(request_type, time.perf_counter())
+                if self.trace_memory:
+                    _, peak = tracemalloc.get_traced_memory()
+                    self.store_memory[request_type].append(peak - before)
+
+        def timed_get_visible_sensor_value(sensor):
+            pending = sensor in handler._set_param
+            value = get_visible_sensor_value(sensor)
+            if pending and sensor not in handler._set_param and sensor in self.set_requested:
+                self.set_confirmed.append(time.perf_counter() - self.set_requested.pop(sensor))
+            return value
+
+        handler._get_http_data = timed_get_http_data
+        handler._store_data = timed_store_data
+        handler._get_visible_sensor_value = timed_get_visible_sensor_value
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _make_handler(standin):
+    handler = _BenchHandler(
+        "bench@example.com",
+        "password",
+        sensors=list(AristonHandler._SENSOR_LIST),
+        period_get_request=0.1,
+        period_set_request=0.5,
+        request_periods={request: 0.2 for request in AristonHandler._REQUEST_PERIODS},
+        set_debounce=0.05,
+        ariston_url=standin.url)
+    return handler
+
+
+def _wait_available(handler, timeout=10):
+    start = time.perf_counter()
+    while not handler.available and time.perf_counter() - start < timeout:
+        time.sleep(0.01)
+    return handler.available
+
+
+def _run(options, trace_memory):
+    with AristonStandIn(zones=options.zones, latency=options.latency, drift=0.2, seed=1) as standin:
+        handler = _make_handler(standin)
+        probe = _Probe(handler, trace_memory)
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        handler.start()
+        try:
+            if not _wait_available(handler):
+                raise Exception("Handler did not become available")
+            enabled_requests = set(handler._request_periods)
+            while set(probe.first_stored) < enabled_requests and time.perf_counter() - start < options.duration:
+                time.sleep(0.01)
+            first_snapshot = max(probe.first_stored.values()) - start if set(probe.first_stored) >= enabled_requests else None
+            set_interval = options.duration / (options.sets + 1)
+            for index in range(options.sets):
+                time.sleep(set_interval)
+                zone = index % options.zones + 1
+                sensor = f"ch_comfort_temperature_zone{zone}"
+                value = 18 + (index % 8) * 0.5
+                if value == handler.sensor_values[sensor]["value"]:
+                    value += 4
+                probe.set_requested[sensor] = time.perf_counter()
+                handler.set_http_data(**{sensor: value})
+            time.sleep(set_interval)
+        finally:
+            handler.stop()
+            if trace_memory:
+                tracemalloc.stop()
+        return probe, first_snapshot
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against local stand-in of Ariston NET cloud")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of every phase")
+    parser.add_argument("--zones", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="latency of the stand-in in seconds")
+    parser.add_argument("--sets", type=int, default=10, help="number of values set during the run")
+    parser.add_argument("--json", default=None, help="file to store results for comparison between releases")
+    options = parser.parse_args(args)
+
+    probe, first_snapshot = _run(options, trace_memory=False)
+    memory_probe, _ = _run(options, trace_memory=True)
+
+    results = {"requests": {}, "max_threads": probe.max_threads, "first_complete_snapshot_s": first_snapshot}
+    print(f"{'request':<18}{'polls':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'store cpu us':>14}{'store KiB':>11}")
+    for request_type in sorted(probe.poll_latency):
+        latency = probe.poll_latency[request_type]
+        cpu = probe.store_cpu.get(request_type, [])
+        memory = memory_probe.store_memory.get(request_type, [])
+        result = {
+            "polls": len(latency),
+            "p50_ms": _percentile(latency, 50) * 1e3,
+            "p90_ms": _percentile(latency, 90) * 1e3,
+            "p99_ms": _percentile(latency, 99) * 1e3,
+            "store_cpu_us": statistics.mean(cpu) * 1e6 if cpu else None,
+            "store_peak_kib": statistics.mean(memory) / 1024 if memory else None,
+        }
+        results["requests"][request_type] = result
+        store_cpu = f"{result['store_cpu_us']:.1f}" if cpu else "-"
+        store_memory = f"{result['store_peak_kib']:.1f}" if memory else "-"
+        print(f"{request_type:<18}{result['polls']:>6}{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}"
+              f"{result['p99_ms']:>9.1f}{store_cpu:>14}{store_memory:>11}")
+
+    if probe.set_confirmed:
+        results["set_confirmed_ms"] = {
+            "count": len(probe.set_confirmed),
+            "p50": _percentile(probe.set_confirmed, 50) * 1e3,
+            "p90": _percentile(probe.set_confirmed, 90) * 1e3,
+            "max": max(probe.set_confirmed) * 1e3,
+        }
+    print(f"max threads: {probe.max_threads}")
+    print(f"first complete snapshot: {first_snapshot:.3f} s" if first_snapshot is not None else "first complete snapshot: not reached")
+    if probe.set_confirmed:
+        set_confirmed = results["set_confirmed_ms"]
+        print(f"set to confirmed: {set_confirmed['count']} sets, p50 {set_confirmed['p50']:.1f} ms, "
+              f"p90 {set_confirmed['p90']:.1f} ms, max {set_confirmed['max']:.1f} ms")
+    else:
+        print("set to confirmed: no set was confirmed")
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
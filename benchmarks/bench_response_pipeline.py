@@ -0,0 +1,125 @@
+"""
+Microbenchmark of the response pipeline (decoding, validation and storing of received data).
+
+Compares the current single-parse pipeline with the former one, which decoded the body
+in the validator and again in _store_data and deep-copied the decoded object.
+
+Usage:
+    python benchmarks/bench_response_pipeline.py [iterations]
+"""
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from aristonremotethermo.ariston import AsyncAristonHandler
+
+
+class _Response:
+    """Minimal stand-in of requests.Response"""
+
+    def __init__(self, body):
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+
+_OPTION_ITEMS = {
+    "PlantMode": {"options": [0, 1, 5], "optTexts": ["Summer", "Winter", "OFF"]},
+    "DhwMode": {"options": [0, 1], "optTexts": ["Comfort", "Economy"]},
+    "ZoneMode": {"options": [0, 1, 2], "optTexts": ["OFF", "Time program", "Manual"]},
+    "Holiday": {"options": [0, 1]},
+    "IsFlameOn": {"options": [0, 1]},
+    "IsHeatingPumpOn": {"options": [0, 1]},
+    "ZoneHeatRequest": {"options": [0, 1]},
+    "IsZonePilotOn": {"options": [0, 1]},
+}
+
+
+def _item(param, zone):
+    if param in _OPTION_ITEMS:
+        return {"id": param, "zone": zone, "value": 1, **_OPTION_ITEMS[param]}
+    return {"id": param, "zone": zone, "value": 20.5, "min": 5, "max": 80, "step": 0.5, "unit": "°C"}
+
+
+def _main_body(zones):
+    items = [_item(param, 0) for param in AsyncAristonHandler._MAP_ARISTON_ZONE_0_PARAMS.values()]
+    for zone in zones:
+        items.extend(_item(param, zone) for param in AsyncAristonHandler._MAP_ARISTON_MULTIZONE_PARAMS.values())
+    return json.dumps({"items": items}).encode()
+
+
+def _energy_body():
+    series = []
+    for k_num in (7, 10, 1, 2, 20, 21):
+        for period, length in ((1, 12), (2, 7), (3, 31), (4, 12)):
+            series.append({"k": k_num, "p": period, "v": [float(i % 5) for i in range(length)]})
+    return json.dumps(series).encode()
+
+
+def _legacy_pipeline(handler, resp, request_type):
+    """Former pipeline: decode in validator, decode again and deep-copy before storing"""
+    handler._json_validator(resp.json(), request_type)
+    if request_type == handler._REQUEST_ENERGY:
+        resp.json()
+    handler._store_data(copy.deepcopy(resp.json()), request_type)
+
+
+def _current_pipeline(handler, resp, request_type):
+    handler._store_data(handler._decode_response(resp, request_type), request_type)
+
+
+def _measure_cpu(pipelines, handler, resp, request_type, iterations, rounds=5):
+    """Best CPU time per poll in seconds for every pipeline, rounds of the pipelines are interleaved"""
+    cpu = {}
+    for _ in range(rounds):
+        for name, pipeline in pipelines:
+            start = time.process_time()
+            for _ in range(iterations):
+                pipeline(handler, resp, request_type)
+            elapsed = (time.process_time() - start) / iterations
+            cpu[name] = min(cpu.get(name, elapsed), elapsed)
+    return cpu
+
+
+def _measure_memory(pipeline, handler, resp, request_type, iterations):
+    """Peak of memory allocated during one poll in bytes"""
+    peak_allocated = 0
+    tracemalloc.start()
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        pipeline(handler, resp, request_type)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_allocated = max(peak_allocated, peak - before)
+    tracemalloc.stop()
+    return peak_allocated
+
+
+def main(iterations=200):
+    handler = AsyncAristonHandler("user", "password")
+    handler._zones = list(range(1, 7))
+    handler._subscribers_sensors_inform = lambda *args, **kwargs: None
+    cases = {
+        handler._REQUEST_MAIN: _Response(_main_body(handler._zones)),
+        handler._REQUEST_ENERGY: _Response(_energy_body()),
+    }
+    print(f"{'request':<10}{'pipeline':<10}{'cpu us/poll':>14}{'peak KiB/poll':>16}")
+    pipelines = (("legacy", _legacy_pipeline), ("current", _current_pipeline))
+    for request_type, resp in cases.items():
+        cpu = _measure_cpu(pipelines, handler, resp, request_type, iterations)
+        memory = {name: _measure_memory(pipeline, handler, resp, request_type, iterations) for name, pipeline in pipelines}
+        for name, _ in pipelines:
+            print(f"{request_type:<10}{name:<10}{cpu[name] * 1e6:>14.1f}{memory[name] / 1024:>16.1f}")
+        cpu_gain = 1 - cpu["current"] / cpu["legacy"]
+        memory_gain = 1 - memory["current"] / memory["legacy"]
+        print(f"{request_type:<10}{'saved':<10}{cpu_gain:>14.0%}{memory_gain:>16.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
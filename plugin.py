@@ -16,6 +16,8 @@
         <param field="Password" label="Password" width="200px" required="true" password="true"/>
         <param field="Mode1" label="Gateway ID" width="200px" required="true"/>
         <param field="Mode2" label="Update interval (seconds)" width="75px" required="true" default="180"/>
+        <param field="Mode3" label="Keepalive interval (seconds)" width="75px" required="false" default="1800"/>
+        <param field="Mode4" label="Temperature deadband (°C)" width="75px" required="false" default="0.1"/>
         <param field="Mode6" label="Debug" width="75px">
             <options>
                 <option label="True" value="Debug"/>
@@ -31,6 +33,7 @@ import sys
 import os
 import asyncio
 import threading
+import time
 
 plugin_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(plugin_path)
@@ -61,6 +64,17 @@ class BasePlugin:
         self.UNIT_TEMP_TARGET = 3
         self.UNIT_STATUS = 4
         
+        # Last values sent to Domoticz per unit: (nValue, sValue, numeric value, time)
+        self.lastSent = {}
+        # Numeric changes smaller than deadband are not sent
+        self.temperatureDeadband = 0.1
+        self.deadbands = {
+            self.UNIT_TEMP_CURRENT: self.temperatureDeadband,
+            self.UNIT_TEMP_TARGET: self.temperatureDeadband,
+        }
+        # Unchanged values are sent again after keepalive interval, so devices do not time out
+        self.keepaliveInterval = 1800
+        
         return
 
     def onStart(self):
@@ -83,12 +97,7 @@ class BasePlugin:
             Domoticz.Error("Username, Password and Gateway ID required!")
             return
         
-        try:
-            self.runInterval = int(Parameters["Mode2"])
-            if self.runInterval < 60:
-                self.runInterval = 60
-        except:
-            self.runInterval = 180
+        self.load_settings()
             
         Domoticz.Heartbeat(10)
         
@@ -120,6 +129,31 @@ class BasePlugin:
         
         Domoticz.Log(f"Plugin configured for gateway {gateway_id}, interval: {self.runInterval}s")
 
+    def load_settings(self):
+        """Read intervals and deadband from parameters, invalid values fall back to defaults"""
+        try:
+            self.runInterval = int(Parameters["Mode2"])
+            if self.runInterval < 60:
+                self.runInterval = 60
+        except:
+            self.runInterval = 180
+        
+        try:
+            self.keepaliveInterval = int(Parameters["Mode3"])
+            if self.keepaliveInterval < self.runInterval:
+                self.keepaliveInterval = self.runInterval
+        except:
+            self.keepaliveInterval = 1800
+        
+        try:
+            self.temperatureDeadband = float(Parameters.get("Mode4") or 0.1)
+            if not 0 <= self.temperatureDeadband <= 10:
+                self.temperatureDeadband = 0.1
+        except:
+            self.temperatureDeadband = 0.1
+        self.deadbands[self.UNIT_TEMP_CURRENT] = self.temperatureDeadband
+        self.deadbands[self.UNIT_TEMP_TARGET] = self.temperatureDeadband
+
     def onStop(self):
         Domoticz.Log("Ariston plugin stopped")
         self.stop_thread = True
@@ -138,8 +172,7 @@ class BasePlugin:
             if Unit == self.UNIT_POWER:
                 success = self.run_async_command(self.async_set_power, Command == "On")
                 if success:
-                    Devices[Unit].Update(nValue=1 if Command == "On" else 0, 
-                                       sValue=Command)
+                    self.update_device(Unit, 1 if Command == "On" else 0, Command, force=True)
                         
             elif Unit == self.UNIT_TEMP_TARGET:
                 try:
@@ -152,7 +185,7 @@ class BasePlugin:
                             self.device.async_set_water_heater_temperature, temp
                         )
                         if success:
-                            Devices[Unit].Update(nValue=0, sValue=str(temp))
+                            self.update_device(Unit, 0, str(temp), numeric=temp, force=True)
                     else:
                         Domoticz.Error(f"Temperature {temp} out of range {min_temp}-{max_temp}°C")
                 except ValueError:
@@ -195,7 +228,6 @@ class BasePlugin:
                 for _ in range(self.runInterval):
                     if self.stop_thread:
                         break
-                    import time
                     time.sleep(1)
                     
         finally:
@@ -262,29 +294,26 @@ class BasePlugin:
             # Update current temperature
             current_temp = self.device.water_heater_current_temperature
             if current_temp is not None:
-                Devices[self.UNIT_TEMP_CURRENT].Update(nValue=0, sValue=str(current_temp))
+                self.update_device(self.UNIT_TEMP_CURRENT, 0, str(current_temp), numeric=current_temp)
                 Domoticz.Debug(f"Current temperature: {current_temp}°C")
             
             # Update target temperature
             target_temp = self.device.water_heater_target_temperature
             if target_temp is not None:
-                Devices[self.UNIT_TEMP_TARGET].Update(nValue=0, sValue=str(target_temp))
+                self.update_device(self.UNIT_TEMP_TARGET, 0, str(target_temp), numeric=target_temp)
                 Domoticz.Debug(f"Target temperature: {target_temp}°C")
             
             # Update power status
             power_value = self.device.water_heater_power_value
             if power_value is not None:
                 is_on = bool(power_value)
-                Devices[self.UNIT_POWER].Update(
-                    nValue=1 if is_on else 0,
-                    sValue="On" if is_on else "Off"
-                )
+                self.update_device(self.UNIT_POWER, 1 if is_on else 0, "On" if is_on else "Off")
                 Domoticz.Debug(f"Power: {'On' if is_on else 'Off'}")
             
             # Update status
             mode = self.device.water_heater_current_mode_text
             if mode:
-                Devices[self.UNIT_STATUS].Update(nValue=0, sValue=mode)
+                self.update_device(self.UNIT_STATUS, 0, mode)
                 Domoticz.Debug(f"Mode: {mode}")
             
             Domoticz.Debug("Update completed successfully")
@@ -294,6 +323,25 @@ class BasePlugin:
             import traceback
             Domoticz.Error(traceback.format_exc())
 
+    def update_device(self, unit, nValue, sValue, numeric=None, force=False):
+        """Update device only on real change (beyond deadband) or after keepalive interval"""
+        now = time.monotonic()
+        last = self.lastSent.get(unit)
+        if not force and last is not None and now - last[3] < self.keepaliveInterval:
+            last_nValue, last_sValue, last_numeric, _ = last
+            deadband = self.deadbands.get(unit, 0)
+            if nValue == last_nValue:
+                if numeric is not None and last_numeric is not None and deadband:
+                    # small tolerance, so a change of exactly one deadband is not lost to float rounding
+                    if abs(float(numeric) - last_numeric) < deadband - 1e-9:
+                        Domoticz.Debug(f"Unit {unit}: change {last_numeric} -> {numeric} within deadband")
+                        return False
+                elif sValue == last_sValue:
+                    return False
+        Devices[unit].Update(nValue=nValue, sValue=sValue)
+        self.lastSent[unit] = (nValue, sValue, float(numeric) if numeric is not None else None, now)
+        return True
+
     async def async_set_power(self, on):
         """Set power on/off"""
         if not self.device:
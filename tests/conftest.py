@@ -0,0 +1,53 @@
+"""Common fixtures of tests running handlers against the local stand-in of Ariston NET."""
+import time
+
+import pytest
+
+from aristonremotethermo.ariston import AristonHandler
+from aristonremotethermo.standin import AristonStandIn
+
+
+class FastHandler(AristonHandler):
+    """Handler with periods shortened for testing"""
+
+    _GET_SENSORS_PERIOD_SECONDS = 0.05
+    _SET_SENSORS_PERIOD_SECONDS = 0.05
+    _MIN_REQUEST_INTERVAL = 0.02
+
+
+def wait_for(condition, timeout=10):
+    """Wait until condition is true, return False on timeout"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def standin():
+    with AristonStandIn(zones=1, seed=1) as server:
+        yield server
+
+
+@pytest.fixture
+def make_handler(standin):
+    """Factory of handlers connected to the stand-in, started handlers are stopped after the test"""
+    handlers = []
+
+    def make(sensors=(AristonHandler._PARAM_MODE, AristonHandler._PARAM_DHW_SET_TEMPERATURE), **kwargs):
+        kwargs.setdefault("ariston_url", standin.url)
+        handler = FastHandler("test@example.com", "password", sensors=list(sensors), **kwargs)
+        handlers.append(handler)
+        return handler
+
+    yield make
+    for handler in handlers:
+        if handler._loop is not None:
+            handler.stop()
+
+
+@pytest.fixture
+def wait():
+    return wait_for
@@ -0,0 +1,97 @@
+"""Aggregate queries over rollups of the SQLite sink and over compressed segments."""
+import random
+import time
+
+import pytest
+
+from aristonremotethermo.segments import SegmentStore
+from aristonremotethermo.sink import SQLiteSink
+
+
+_HOUR = 3600
+_DAY = 86400
+
+
+@pytest.fixture
+def samples():
+    """Samples of three days ending a day before now, with a gap of more than a day"""
+    generator = random.Random(7)
+    end = int(time.time()) // _DAY * _DAY - _DAY
+    start = end - 3 * _DAY
+    timestamp = start + 1234
+    points = []
+    while timestamp < end:
+        points.append((timestamp, round(generator.uniform(15, 25), 1)))
+        timestamp += generator.choice((60, 300, 900, 2400)) if not start + _DAY < timestamp < start + 2 * _DAY + 7200 else 10000
+    return start, end, points
+
+
+def _brute_force(points, start, end, bucket, fn):
+    """Aggregate of the samples, values hold until the next sample"""
+    results = []
+    bucket_start = start - start % bucket
+    while bucket_start < end:
+        bucket_end = bucket_start + bucket
+        values = [value for timestamp, value in points if bucket_start <= timestamp < bucket_end]
+        if fn == "integral":
+            value = 0.0
+            for index, (timestamp, point_value) in enumerate(points):
+                following = points[index + 1][0] if index + 1 < len(points) else float("inf")
+                value += point_value * max(0, min(following, bucket_end) - max(timestamp, bucket_start))
+        elif fn == "count":
+            value = len(values)
+        elif not values:
+            value = None
+        else:
+            value = {"min": min, "max": max, "last": lambda items: items[-1],
+                     "mean": lambda items: sum(items) / len(items)}[fn](values)
+        results.append((bucket_start, value))
+        bucket_start = bucket_end
+    return results
+
+
+def _same(results, expected):
+    assert [bucket for bucket, _ in results] == [bucket for bucket, _ in expected]
+    for (_, value), (_, expected_value) in zip(results, expected):
+        assert value == pytest.approx(expected_value)
+
+
+def test_coarsest_dividing_resolution_is_used(tmp_path):
+    sink = SQLiteSink(str(tmp_path / "history.db"), rollups={60: None, _HOUR: None, _DAY: None})
+    try:
+        assert sink._aggregate_resolution(60) == 60
+        assert sink._aggregate_resolution(600) == 60
+        assert sink._aggregate_resolution(2 * _HOUR) == _HOUR
+        assert sink._aggregate_resolution(_DAY) == _DAY
+        assert sink._aggregate_resolution(7 * _DAY) == _DAY
+        with pytest.raises(Exception, match="multiple"):
+            sink._aggregate_resolution(90)
+        with pytest.raises(Exception, match="one of"):
+            sink.aggregate("temperature", 0, _DAY, _HOUR, "median")
+    finally:
+        sink.close()
+
+
+@pytest.mark.parametrize("bucket", [_HOUR, 3 * _HOUR, _DAY])
+@pytest.mark.parametrize("fn", ["min", "max", "mean", "last", "count", "integral"])
+def test_sqlite_aggregate_matches_samples(tmp_path, samples, bucket, fn):
+    start, end, points = samples
+    sink = SQLiteSink(str(tmp_path / "history.db"), batch_interval=0, retention=None, rollups={60: None, _HOUR: None, _DAY: None})
+    for timestamp, value in points:
+        sink.write_values(timestamp, {"temperature": value})
+    sink.close()
+
+    _same(sink.aggregate("temperature", start, end, bucket, fn), _brute_force(points, start, end, bucket, fn))
+
+
+@pytest.mark.parametrize("bucket", [_HOUR, 5400, _DAY])
+@pytest.mark.parametrize("fn", ["min", "max", "mean", "last", "count", "integral"])
+def test_segment_aggregate_matches_samples(tmp_path, samples, bucket, fn):
+    start, end, points = samples
+    store = SegmentStore(str(tmp_path), segment_size=256)
+    for timestamp, value in points:
+        store.append("temperature", timestamp, value)
+
+    # the range starts after the first segments, so the preceding point is taken from a sealed segment
+    range_start = start + _DAY + _HOUR
+    _same(store.aggregate("temperature", range_start, end, bucket, fn), _brute_force(points, range_start, end, bucket, fn))
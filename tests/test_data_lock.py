@@ -0,0 +1,82 @@
+"""Setting of data is not blocked by slow reads, the data lock is held only while received data is stored."""
+import threading
+import time
+
+import pytest
+
+from aristonremotethermo.ariston import AristonHandler
+
+
+_SLOW_LATENCY = 3.0
+
+
+@pytest.fixture
+def handler(make_handler):
+    handler = make_handler(period_get_request=0.1, period_set_request=0.5)
+    handler.start()
+    return handler
+
+
+def test_set_returns_while_main_read_is_in_flight(standin, handler, wait):
+    assert wait(lambda: handler.available)
+
+    main_read_sent = threading.Event()
+    request_post = handler._request_post
+
+    def watched_request_post(*args, **kwargs):
+        if kwargs.get("error_msg") == "Main read":
+            main_read_sent.set()
+        return request_post(*args, **kwargs)
+
+    handler._request_post = watched_request_post
+    standin.latency = _SLOW_LATENCY
+    assert main_read_sent.wait(10)
+    # the reply is delayed by the stand-in, so the read is still in flight
+    time.sleep(0.2)
+
+    start = time.perf_counter()
+    handler.set_http_data(**{AristonHandler._PARAM_DHW_SET_TEMPERATURE: 52})
+    elapsed = time.perf_counter() - start
+
+    # holding the lock during the read would block until the slow reply arrives
+    assert elapsed < _SLOW_LATENCY / 2
+    assert handler.sensor_values[AristonHandler._PARAM_DHW_SET_TEMPERATURE]["value"] == 52
+
+
+def test_periodic_reads_do_not_overlap(standin, handler, wait):
+    assert wait(lambda: handler.available)
+
+    lock = threading.Lock()
+    reads = {"running": 0, "max": 0, "count": 0}
+    get_http_data = handler._get_http_data
+
+    def counted_get_http_data(*args, **kwargs):
+        with lock:
+            reads["running"] += 1
+            reads["max"] = max(reads["max"], reads["running"])
+            reads["count"] += 1
+        try:
+            return get_http_data(*args, **kwargs)
+        finally:
+            with lock:
+                reads["running"] -= 1
+
+    handler._get_http_data = counted_get_http_data
+    # replies are slower than the period of reads
+    standin.latency = 0.3
+    time.sleep(2)
+
+    assert reads["count"] > 1
+    assert reads["max"] == 1
+
+
+def test_outdated_reply_is_dropped(make_handler):
+    handler = make_handler()
+    stored = []
+    handler._store_response = lambda resp, request_type: stored.append((resp, request_type))
+
+    handler._store_read("newer", AristonHandler._REQUEST_MAIN, 2)
+    handler._store_read("older", AristonHandler._REQUEST_MAIN, 1)
+    handler._store_read("other", AristonHandler._REQUEST_ERRORS, 1)
+
+    assert stored == [("newer", AristonHandler._REQUEST_MAIN), ("other", AristonHandler._REQUEST_ERRORS)]
@@ -0,0 +1,201 @@
+"""EnergyDecoder gives the same results as the decoding it replaced, including calendar boundaries."""
+import calendar
+import datetime
+
+import pytest
+
+from aristonremotethermo.energy import CalendarIndex, EnergyDecoder
+
+
+def _prev_month(month, year, scan_break):
+    if month > 1:
+        return month - 1, year, scan_break
+    else:
+        return 12, year - 1, scan_break + 1
+
+
+def _prev_day(day, month, year, scan_break):
+    if day > 1:
+        return day - 1, month, year, scan_break
+    else:
+        if month > 1:
+            return calendar.monthrange(year=year, month=month - 1)[1], month - 1, year, scan_break + 1
+        else:
+            return calendar.monthrange(year=year, month=12)[1], 12, year - 1, scan_break + 1
+
+
+def _prev_day_week(day):
+    if day > 0:
+        return day - 1
+    else:
+        return 6
+
+
+def _prev_hour(hour, scan_break):
+    if hour > 0:
+        return hour - 2, scan_break
+    else:
+        return 22, scan_break + 1
+
+
+def _reference_energy_data(energy_use_data, k_num, now):
+    """Decoding of AristonHandler._get_energy_data before EnergyDecoder, kept as the reference"""
+    this_year, this_month, this_day, this_day_week = now.year, now.month, now.day, now.weekday()
+    if now.hour % 2 == 1:
+        this_2hour = (now.hour // 2) * 2 + 2
+    else:
+        this_2hour = now.hour + 2
+    energy_today = 0
+    energy_yesterday = 0
+    energy_last_7_days = 0
+    energy_this_month = 0
+    energy_last_month = 0
+    energy_this_year = 0
+    energy_last_year = 0
+    energy_today_attr = {}
+    energy_yesterday_attr = {}
+    energy_last_7_days_attr = {}
+    energy_this_month_attr = {}
+    energy_last_month_attr = {}
+    energy_this_year_attr = {}
+    energy_last_year_attr = {}
+    hour_text = "{}_{}_{:02}_{:02}"
+    weekday_text = "{}_{}_{:02}_{}"
+    month_text = "{}_{}_{:02}"
+    year_text = "{}_{}"
+    found_key = False
+    for item in energy_use_data:
+        if item["k"] == k_num:
+            found_key = True
+            scan_month = this_month
+            scan_year = this_year
+            scan_day = this_day
+            scan_day_week = this_day_week
+            scan_2hour = this_2hour
+            scan_break = 0
+            if item['p'] == 1:
+                prev_day, prev_month, prev_year, _ = _prev_day(day=this_day, month=this_month, year=this_year, scan_break=0)
+                prev_day_2, prev_month_2, prev_year_2, _ = _prev_day(day=prev_day, month=prev_month, year=prev_year, scan_break=0)
+                use_day, use_month, use_year = this_day, this_month, this_year
+                midnight = this_2hour == 2
+                for value in reversed(item['v']):
+                    scan_2hour, scan_break = _prev_hour(hour=scan_2hour, scan_break=scan_break)
+                    if midnight and scan_break == 1:
+                        scan_break = 0
+                        use_day, use_month, use_year = prev_day, prev_month, prev_year
+                        prev_day, prev_month, prev_year = prev_day_2, prev_month_2, prev_year_2
+                        midnight = False
+                    if scan_break == 0:
+                        energy_today_attr[hour_text.format(use_year, calendar.month_abbr[use_month], use_day, scan_2hour)] = value
+                        energy_today += value
+                    elif scan_break == 1:
+                        energy_yesterday_attr[hour_text.format(prev_year, calendar.month_abbr[prev_month], prev_day, scan_2hour)] = value
+                        energy_yesterday += value
+            if item['p'] == 2:
+                for value in reversed(item['v']):
+                    scan_day, scan_month, scan_year, _ = _prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=0)
+                    scan_day_week = _prev_day_week(day=scan_day_week)
+                    energy_last_7_days_attr[weekday_text.format(scan_year, calendar.month_abbr[scan_month], scan_day, calendar.day_abbr[scan_day_week])] = value
+                    energy_last_7_days += value
+            if item['p'] == 3:
+                energy_this_month_attr[month_text.format(this_year, calendar.month_abbr[this_month], this_day)] = energy_today
+                energy_this_month += energy_today
+                for value in reversed(item['v']):
+                    scan_day, scan_month, scan_year, scan_break = _prev_day(day=scan_day, month=scan_month, year=scan_year, scan_break=scan_break)
+                    if scan_break == 0:
+                        energy_this_month_attr[month_text.format(scan_year, calendar.month_abbr[scan_month], scan_day)] = value
+                        energy_this_month += value
+                    elif scan_break == 1:
+                        energy_last_month_attr[month_text.format(scan_year, calendar.month_abbr[scan_month], scan_day)] = value
+                        energy_last_month += value
+            if item['p'] == 4:
+                energy_this_year_attr[year_text.format(this_year, calendar.month_abbr[this_month])] = energy_this_month
+                energy_this_year += energy_this_month
+                for value in reversed(item['v']):
+                    scan_month, scan_year, scan_break = _prev_month(month=scan_month, year=scan_year, scan_break=scan_break)
+                    if scan_break == 0:
+                        energy_this_year_attr[year_text.format(scan_year, calendar.month_abbr[scan_month])] = value
+                        energy_this_year += value
+                    elif scan_break == 1:
+                        energy_last_year_attr[year_text.format(scan_year, calendar.month_abbr[scan_month])] = value
+                        energy_last_year += value
+    if not found_key:
+        energy_today = None
+        energy_yesterday = None
+        energy_last_7_days = None
+        energy_this_month = None
+        energy_last_month = None
+        energy_this_year = None
+        energy_last_year = None
+    return (
+        energy_today,
+        energy_yesterday,
+        energy_last_7_days,
+        energy_this_month,
+        energy_last_month,
+        energy_this_year,
+        energy_last_year,
+        energy_today_attr,
+        energy_yesterday_attr,
+        energy_last_7_days_attr,
+        energy_this_month_attr,
+        energy_last_month_attr,
+        energy_this_year_attr,
+        energy_last_year_attr,
+        found_key
+    )
+
+
+# series key -> (period, number of values), values are not exact in binary floats, so order of additions matters
+_PAYLOAD_SHAPE = {
+    7: ((1, 24), (2, 7), (3, 62), (4, 24)),
+    10: ((1, 12), (3, 31), (4, 12)),
+    1: ((2, 7),),
+    20: ((1, 18), (3, 40), (4, 15)),
+}
+
+
+def _payload():
+    payload = []
+    for k_num, periods in _PAYLOAD_SHAPE.items():
+        for period, length in periods:
+            payload.append({"k": k_num, "p": period, "v": [round(0.1 * k_num + 0.37 * i + 0.01 * period, 2) for i in range(length)]})
+    return payload
+
+
+_BOUNDARIES = [
+    datetime.datetime(2023, 6, 14, 0, 30),   # midnight
+    datetime.datetime(2023, 6, 14, 1, 59),   # midnight, odd hour
+    datetime.datetime(2023, 6, 14, 13, 5),
+    datetime.datetime(2023, 4, 30, 23, 10),  # month end
+    datetime.datetime(2023, 5, 1, 0, 5),     # first day of month at midnight
+    datetime.datetime(2023, 12, 31, 22, 0),  # year end
+    datetime.datetime(2024, 1, 1, 0, 0),     # new year at midnight
+    datetime.datetime(2024, 1, 1, 3, 0),
+    datetime.datetime(2024, 2, 29, 12, 0),   # leap day
+    datetime.datetime(2024, 3, 1, 0, 45),    # after leap day at midnight
+    datetime.datetime(2023, 3, 1, 1, 0),     # after February of a common year
+]
+
+
+@pytest.mark.parametrize("now", _BOUNDARIES, ids=[now.isoformat() for now in _BOUNDARIES])
+def test_decoder_matches_previous_decoding(now):
+    payload = _payload()
+    decoder = EnergyDecoder(now=now)
+    decoder.load(payload)
+    for k_num in list(_PAYLOAD_SHAPE) + [2]:
+        assert decoder.series(k_num) == _reference_energy_data(payload, k_num, now)
+
+
+def test_reused_calendar_index_matches_previous_decoding():
+    payload = _payload()
+    now = datetime.datetime(2024, 2, 29, 23, 0)
+    index = CalendarIndex(now)
+    for minutes in (0, 30, 59):
+        later = now + datetime.timedelta(minutes=minutes)
+        decoder = EnergyDecoder(now=later, calendar_index=index)
+        assert decoder.calendar_index is index
+        decoder.load(payload)
+        assert decoder.series(7) == _reference_energy_data(payload, 7, later)
+    next_day = EnergyDecoder(now=datetime.datetime(2024, 3, 1, 1, 0), calendar_index=index)
+    assert next_day.calendar_index is not index
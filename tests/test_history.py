@@ -0,0 +1,60 @@
+"""Ring buffers of sensor history keep the latest values in order."""
+from aristonremotethermo.history import SensorHistory
+
+
+def test_values_are_kept_in_order_until_capacity():
+    history = SensorHistory(capacity=4)
+    for index in range(3):
+        history.append("temperature", 100.0 + index, 20.0 + index)
+
+    timestamps, values = history.history("temperature")
+
+    assert timestamps.tolist() == [100.0, 101.0, 102.0]
+    assert values.tolist() == [20.0, 21.0, 22.0]
+
+
+def test_oldest_values_are_dropped_at_capacity():
+    history = SensorHistory(capacity=4)
+    for index in range(5):
+        history.append("temperature", 100.0 + index, 20.0 + index)
+
+    timestamps, values = history.history("temperature")
+
+    assert timestamps.tolist() == [101.0, 102.0, 103.0, 104.0]
+    assert values.tolist() == [21.0, 22.0, 23.0, 24.0]
+
+
+def test_views_are_contiguous_after_several_wraps():
+    capacity = 5
+    history = SensorHistory(capacity=capacity)
+    for index in range(capacity * 3 + 2):
+        history.append("pressure", float(index), index / 10)
+        timestamps, values = history.history("pressure")
+        expected = list(range(max(0, index - capacity + 1), index + 1))
+
+        assert timestamps.contiguous and values.contiguous
+        assert timestamps.tolist() == [float(item) for item in expected]
+        assert values.tolist() == [item / 10 for item in expected]
+
+
+def test_since_selects_latest_values_after_wrap():
+    history = SensorHistory(capacity=3)
+    for index in range(7):
+        history.append("temperature", float(index), float(index))
+
+    timestamps, values = history.history("temperature", since=5)
+
+    assert timestamps.tolist() == [5.0, 6.0]
+    assert history.history("temperature", since=100)[0].tolist() == []
+
+
+def test_repeated_and_non_numeric_values_are_skipped():
+    history = SensorHistory(capacity=3)
+
+    assert history.append("mode", 1.0, "Winter") is False
+    assert history.append("flame", 1.0, True) is False
+    assert history.append("temperature", 1.0, 20.5)
+    assert history.append("temperature", 2.0, 20.5) is False
+    assert history.history("temperature")[1].tolist() == [20.5]
+    assert history.history("unknown")[0].tolist() == []
+    assert history.sensors == ["temperature"]
@@ -0,0 +1,57 @@
+"""Metrics are exposed in Prometheus text format."""
+import pytest
+
+from aristonremotethermo.metrics import Counter, Gauge, Histogram, MetricsRegistry, _Metric
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("name", "documentation", ())
+
+
+def test_exposition_of_help_and_type_lines():
+    registry = MetricsRegistry()
+    registry.counter("ariston_requests_total", "Requests sent\nto the \\ cloud", ("gw",)).inc(gw="GW1")
+    registry.gauge("ariston_available", 'Plant is "available"').set(1)
+
+    lines = registry.exposition().splitlines()
+
+    assert lines == [
+        "# HELP ariston_requests_total Requests sent\\nto the \\\\ cloud",
+        "# TYPE ariston_requests_total counter",
+        'ariston_requests_total{gw="GW1"} 1',
+        '# HELP ariston_available Plant is "available"',
+        "# TYPE ariston_available gauge",
+        "ariston_available 1",
+    ]
+    assert registry.exposition().endswith("\n")
+
+
+def test_label_values_are_escaped():
+    counter = Counter("ariston_errors_total", "Errors", ("endpoint",))
+    counter.inc(2, endpoint='Set "CH"\\mode\nread')
+
+    assert counter.exposition() == ['ariston_errors_total{endpoint="Set \\"CH\\"\\\\mode\\nread"} 2']
+
+
+def test_gauge_function_is_computed_at_collection():
+    gauge = Gauge("ariston_queue_depth", "Queue depth", ("gw",))
+    depth = [3]
+    gauge.set_function(lambda: depth[0], gw="GW1")
+    depth[0] = 5
+
+    assert gauge.exposition() == ['ariston_queue_depth{gw="GW1"} 5']
+
+
+def test_histogram_buckets_sum_and_count():
+    histogram = Histogram("ariston_http_seconds", "Duration", ("gw",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, gw="GW1")
+
+    assert histogram.exposition() == [
+        'ariston_http_seconds_bucket{gw="GW1",le="0.1"} 2',
+        'ariston_http_seconds_bucket{gw="GW1",le="1"} 3',
+        'ariston_http_seconds_bucket{gw="GW1",le="+Inf"} 4',
+        'ariston_http_seconds_sum{gw="GW1"} 3.65',
+        'ariston_http_seconds_count{gw="GW1"} 4',
+    ]
@@ -0,0 +1,99 @@
+"""Domoticz devices are updated only on real changes, after keepalive interval or when forced."""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+
+_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugin.py")
+
+
+class _Device:
+
+    def __init__(self):
+        self.updates = []
+
+    def Update(self, nValue, sValue):
+        self.updates.append((nValue, sValue))
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    domoticz = types.ModuleType("Domoticz")
+    for name in ("Log", "Debug", "Error", "Debugging", "Heartbeat"):
+        setattr(domoticz, name, lambda *args, **kwargs: None)
+    monkeypatch.setitem(sys.modules, "Domoticz", domoticz)
+    spec = importlib.util.spec_from_file_location("ariston_domoticz_plugin", _PLUGIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.Devices = {unit: _Device() for unit in range(1, 5)}
+    module.Parameters = {"Mode2": "180", "Mode3": "1800", "Mode4": "0.5"}
+    clock = _Clock()
+    module.time = types.SimpleNamespace(monotonic=clock.monotonic)
+    instance = module.BasePlugin()
+    instance.load_settings()
+    instance.clock = clock
+    instance.devices = module.Devices
+    instance.parameters = module.Parameters
+    return instance
+
+
+def _temperature(plugin, value, **kwargs):
+    return plugin.update_device(plugin.UNIT_TEMP_CURRENT, 0, str(value), numeric=value, **kwargs)
+
+
+def test_deadband_is_read_from_parameters(plugin):
+    assert plugin.deadbands[plugin.UNIT_TEMP_CURRENT] == 0.5
+    assert plugin.deadbands[plugin.UNIT_TEMP_TARGET] == 0.5
+    assert plugin.keepaliveInterval == 1800
+
+
+def test_changes_within_deadband_are_suppressed(plugin):
+    assert _temperature(plugin, 50.0)
+    assert not _temperature(plugin, 50.3)
+    assert not _temperature(plugin, 49.6)
+    assert _temperature(plugin, 50.5)
+
+    assert plugin.devices[plugin.UNIT_TEMP_CURRENT].updates == [(0, "50.0"), (0, "50.5")]
+
+
+def test_unchanged_text_is_not_sent_again(plugin):
+    assert plugin.update_device(plugin.UNIT_STATUS, 0, "Manual")
+    assert not plugin.update_device(plugin.UNIT_STATUS, 0, "Manual")
+    assert plugin.update_device(plugin.UNIT_STATUS, 0, "Boost")
+
+
+def test_keepalive_refreshes_unchanged_value(plugin):
+    assert _temperature(plugin, 50.0)
+    plugin.clock.now += 1799
+    assert not _temperature(plugin, 50.0)
+    plugin.clock.now += 2
+    assert _temperature(plugin, 50.0)
+
+    assert len(plugin.devices[plugin.UNIT_TEMP_CURRENT].updates) == 2
+
+
+def test_forced_update_is_always_sent(plugin):
+    assert plugin.update_device(plugin.UNIT_POWER, 1, "On")
+    assert plugin.update_device(plugin.UNIT_POWER, 1, "On", force=True)
+    assert _temperature(plugin, 50.0)
+    assert _temperature(plugin, 50.1, force=True)
+
+
+@pytest.mark.parametrize("deadband", ["", "abc", "-1", "nan"])
+def test_invalid_deadband_falls_back_to_default(plugin, deadband):
+    plugin.parameters["Mode4"] = deadband
+    plugin.load_settings()
+
+    assert plugin.temperatureDeadband == 0.1
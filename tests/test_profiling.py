@@ -0,0 +1,46 @@
+"""Profilers attached to the handler cover whole poll and set cycles."""
+import threading
+import time
+
+from aristonremotethermo.ariston import AristonHandler
+from aristonremotethermo.profiling import SamplingProfiler, SpanTimer
+
+
+def test_set_cycle_covers_posts_and_completion(standin, make_handler, wait):
+    handler = make_handler(period_get_request=60, period_set_request=60)
+    profiler = SpanTimer()
+    handler.set_profiler(profiler)
+    handler.start()
+    assert wait(lambda: handler.available)
+
+    handler.set_http_data(**{AristonHandler._PARAM_DHW_SET_TEMPERATURE: 52})
+
+    assert wait(lambda: "_setting_http_data_done" in profiler.statistics().get("set", {}))
+    assert {"_preparing_setting_http_data", "_send_set_post", "_setting_http_data_done"} <= set(profiler.statistics()["set"])
+
+
+def test_sampling_profiler_reports_while_sampling(tmp_path):
+    profiler = SamplingProfiler(interval=0.0005)
+    stop = threading.Event()
+
+    def cycle():
+        time.sleep(0.0002)
+
+    def worker(request_type):
+        wrapped = profiler.wrap("cycle", cycle, request_type=request_type)
+        while not stop.is_set():
+            wrapped()
+
+    threads = [threading.Thread(target=worker, args=(f"request{index}",)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(100):
+            profiler.report()
+            profiler.dump(str(tmp_path))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        profiler.close()
+    assert "samples" in profiler.report()
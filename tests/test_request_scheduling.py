@@ -0,0 +1,48 @@
+"""Scheduling of requests by priority, requests of lower priority are read even if the urgent ones are due all the time."""
+import threading
+
+import pytest
+
+from aristonremotethermo.ariston import AristonHandler
+
+
+def test_every_request_type_is_read_while_urgent_requests_are_due(standin, make_handler, wait):
+    periods = {request: 0.05 if priority == 0 else 0.5 for request, priority in AristonHandler._REQUEST_PRIORITIES.items()}
+    handler = make_handler(
+        sensors=AristonHandler._SENSOR_LIST,
+        period_get_request=0.05,
+        request_periods=periods)
+
+    lock = threading.Lock()
+    read = set()
+    get_http_data = handler._get_http_data
+
+    def recorded_get_http_data(request_type=""):
+        with lock:
+            read.add(request_type)
+        return get_http_data(request_type)
+
+    handler._get_http_data = recorded_get_http_data
+    # every read takes longer than the period of the urgent requests
+    standin.latency = 0.1
+    handler.start()
+
+    assert wait(lambda: read >= set(handler._request_periods), timeout=20), set(handler._request_periods) - read
+
+
+def test_priorities_can_be_overridden(make_handler):
+    handler = make_handler(sensors=AristonHandler._SENSOR_LIST, request_priorities={"energy": 0, "errors": 1})
+    now = 1000.0
+    for request in handler._request_deadlines:
+        handler._request_deadlines[request] = now - 0.01
+    due = [AristonHandler._REQUEST_ERRORS, AristonHandler._REQUEST_ENERGY]
+
+    assert handler._request_priority(AristonHandler._REQUEST_ENERGY) == 0
+    assert min(due, key=lambda request: handler._request_rank(request, now)) == AristonHandler._REQUEST_ENERGY
+
+
+def test_invalid_priorities_are_rejected(make_handler):
+    with pytest.raises(Exception, match="Unknown request"):
+        make_handler(request_priorities={"unknown": 0})
+    with pytest.raises(Exception, match="must be an integer"):
+        make_handler(request_priorities={"energy": "high"})
@@ -0,0 +1,61 @@
+"""Bodies of responses equal to the last stored body are neither decoded nor stored."""
+import json
+
+import pytest
+import requests
+
+from aristonremotethermo.ariston import AristonHandler
+
+
+def _response(data):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = json.dumps(data).encode()
+    return resp
+
+
+@pytest.fixture
+def handler(make_handler):
+    handler = make_handler()
+    handler.stored = []
+    handler._store_data = lambda data, request_type: handler.stored.append((data, request_type))
+    return handler
+
+
+def test_identical_body_is_skipped(handler):
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+
+    assert handler.stored == [({"items": [1]}, AristonHandler._REQUEST_MAIN)]
+    assert handler.response_statistics[AristonHandler._REQUEST_MAIN] == {"hits": 1, "misses": 1}
+
+
+def test_changed_body_is_stored(handler):
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._store_response(_response({"items": [2]}), AristonHandler._REQUEST_MAIN)
+    # digests are kept per request type
+    handler._store_response(_response({"items": [2]}), AristonHandler._REQUEST_ERRORS)
+
+    assert [data for data, _ in handler.stored] == [{"items": [1]}, {"items": [2]}, {"items": [2]}]
+
+
+def test_pending_set_forces_store(handler):
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._set_param[AristonHandler._PARAM_MODE] = {}
+
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    del handler._set_param[AristonHandler._PARAM_MODE]
+    # body stored while setting is not remembered, so the first body after setting is stored too
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+
+    assert len(handler.stored) == 4
+
+
+def test_clear_data_resets_digests(handler):
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+    handler._clear_data()
+    handler._store_response(_response({"items": [1]}), AristonHandler._REQUEST_MAIN)
+
+    assert len(handler.stored) == 2
@@ -0,0 +1,82 @@
+"""Points of compressed segments are decoded exactly as they were appended."""
+import math
+import random
+
+import pytest
+
+from aristonremotethermo.segments import SegmentStore
+
+
+_START = 1700000000
+
+
+def _round_trip(store, sensor, points):
+    for timestamp, value in points:
+        assert store.append(sensor, timestamp, value)
+    return store.query(sensor)
+
+
+def _same(decoded, points):
+    assert len(decoded) == len(points)
+    for (timestamp, value), (expected_timestamp, expected_value) in zip(decoded, points):
+        assert timestamp == expected_timestamp
+        if math.isnan(expected_value):
+            assert math.isnan(value)
+        else:
+            assert value == expected_value and math.copysign(1, value) == math.copysign(1, expected_value)
+
+
+def test_regular_and_irregular_gaps(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    gaps = [30, 30, 30, 31, 29, 300, 1, 0, 3600, 86400, 30, 400 * 86400, 30, 7]
+    points = []
+    timestamp = _START
+    for index, gap in enumerate(gaps):
+        timestamp += gap
+        points.append((timestamp, 20 + index / 2))
+
+    _same(_round_trip(store, "temperature", points), points)
+
+
+def test_delta_of_delta_overflow_starts_new_segment(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    points = [(_START, 1.0), (_START + 30, 2.0), (_START + 30 + 2 ** 33, 3.0), (_START + 60 + 2 ** 33, 4.0)]
+
+    _same(_round_trip(store, "temperature", points), points)
+    assert store.statistics["segments"] == 2
+
+
+def test_identical_and_special_values(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    values = [21.5, 21.5, 21.5, math.nan, math.nan, 21.5, math.inf, -math.inf, 0.0, -0.0, 0.1 + 0.2, 1e300, -1e-300, 5]
+    points = [(_START + index * 30, float(value)) for index, value in enumerate(values)]
+
+    _same(_round_trip(store, "temperature", points), points)
+
+
+def test_segment_rollover_and_reopening(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_size=256)
+    generator = random.Random(1)
+    points = []
+    timestamp = _START
+    for _ in range(2000):
+        timestamp += generator.choice((30, 30, 60, generator.randint(1, 5000)))
+        points.append((timestamp, generator.choice((round(generator.uniform(-10, 40), 2), generator.random()))))
+
+    _same(_round_trip(store, "temperature", points), points)
+    assert store.statistics["segments"] > 10
+    store.close()
+
+    reopened = SegmentStore(str(tmp_path), segment_size=256)
+    _same(reopened.query("temperature"), points)
+    more = [(timestamp + 30, 1.25), (timestamp + 60, math.nan)]
+    _same(_round_trip(reopened, "temperature", more), points + more)
+    assert reopened.query("temperature", points[100][0], points[200][0]) == points[100:200]
+
+
+@pytest.mark.parametrize("value", ["Winter", True, None])
+def test_non_numeric_values_are_ignored(tmp_path, value):
+    store = SegmentStore(str(tmp_path))
+
+    assert not store.append("mode", _START, value)
+    assert store.query("mode") == []
@@ -0,0 +1,64 @@
+"""Cached login sessions are private to the owner, expire after TTL and are replaced after rejection."""
+import os
+import stat
+
+import requests
+
+from aristonremotethermo import session as session_module
+from aristonremotethermo.session import SessionCache
+
+
+def _store(cache):
+    http_session = requests.Session()
+    http_session.cookies.set("auth", "secret", domain="127.0.0.1", path="/")
+    cache.store("test@example.com", http_session, "GW1", {"zones": []}, [1])
+
+
+def test_cache_file_is_readable_only_by_owner(tmp_path):
+    cache = SessionCache(str(tmp_path / "session.json"))
+    _store(cache)
+
+    assert stat.S_IMODE(os.stat(tmp_path / "session.json").st_mode) == 0o600
+    assert "test@example.com" not in (tmp_path / "session.json").read_text()
+
+
+def test_cached_session_expires_after_ttl(tmp_path, monkeypatch):
+    cache = SessionCache(str(tmp_path / "session.json"), ttl=60)
+    _store(cache)
+    saved = session_module.time.time()
+
+    monkeypatch.setattr(session_module.time, "time", lambda: saved + 59)
+    assert cache.load("test@example.com", "GW1")["plant_id"] == "GW1"
+    assert cache.load("other@example.com") is None
+
+    monkeypatch.setattr(session_module.time, "time", lambda: saved + 61)
+    assert cache.load("test@example.com", "GW1") is None
+
+
+def test_handler_passes_ttl_to_the_cache(tmp_path, make_handler):
+    handler = make_handler(session_cache=str(tmp_path / "session.json"), session_cache_ttl=600)
+
+    assert handler._session_cache._ttl == 600
+
+
+def test_rejected_cached_session_falls_back_to_login(tmp_path, standin, make_handler, wait):
+    path = str(tmp_path / "session.json")
+    first = make_handler(gw="GW1", session_cache=path, period_get_request=0.1)
+    first.start()
+    assert wait(lambda: first.available)
+    first.stop()
+    logins = standin.statistics["requests"]["login"]
+
+    # restart with the cached session
+    second = make_handler(gw="GW1", session_cache=path, period_get_request=0.1)
+    second.start()
+    assert wait(lambda: second.available)
+    second.stop()
+    assert standin.statistics["requests"]["login"] == logins
+
+    # cached session is rejected by the server
+    standin.clear_sessions()
+    third = make_handler(gw="GW1", session_cache=path, period_get_request=0.1)
+    third.start()
+    assert wait(lambda: standin.statistics["requests"]["login"] == logins + 1)
+    assert wait(lambda: third.available)
@@ -0,0 +1,23 @@
+"""Quick changes of a parameter are merged into one request carrying the latest value."""
+import time
+
+from aristonremotethermo.ariston import AristonHandler
+
+
+def test_quick_changes_produce_one_post_with_the_last_value(standin, make_handler, wait):
+    handler = make_handler(period_get_request=60, period_set_request=60, set_debounce=0.3)
+    handler.start()
+    assert wait(lambda: handler.available)
+
+    for value in (46, 47, 48, 49, 51):
+        handler.set_http_data(**{AristonHandler._PARAM_DHW_SET_TEMPERATURE: value})
+        time.sleep(0.02)
+
+    assert wait(lambda: standin.statistics["requests"].get("set_dhw_temperature", 0) >= 1)
+    time.sleep(0.5)
+    assert standin.statistics["requests"]["set_dhw_temperature"] == 1
+    assert standin.plant()[("DhwTemp", 0)] == 51
+
+
+def test_default_debounce_keeps_delay_of_setting():
+    assert AristonHandler._SET_DEBOUNCE_SECONDS == AristonHandler._TIME_SPLIT
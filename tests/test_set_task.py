@@ -0,0 +1,39 @@
+"""New values do not cancel setting of data whose requests are in flight."""
+import threading
+import time
+
+from aristonremotethermo.ariston import AristonHandler
+
+
+def test_set_in_flight_is_completed(standin, make_handler, wait):
+    handler = make_handler(period_get_request=60, period_set_request=60, set_debounce=0.05)
+
+    lock = threading.Lock()
+    phases = {"prepared": 0, "done": 0}
+    preparing = handler._preparing_setting_http_data
+    done = handler._setting_http_data_done
+
+    def counted_preparing():
+        prepared = preparing()
+        if prepared is not None:
+            with lock:
+                phases["prepared"] += 1
+        return prepared
+
+    def counted_done(*args):
+        with lock:
+            phases["done"] += 1
+        return done(*args)
+
+    handler._preparing_setting_http_data = counted_preparing
+    handler._setting_http_data_done = counted_done
+
+    handler.start()
+    assert wait(lambda: handler.available)
+    standin.latency = 0.5
+    for value in range(45, 53):
+        handler.set_http_data(**{AristonHandler._PARAM_DHW_SET_TEMPERATURE: value})
+        time.sleep(0.15)
+    assert wait(lambda: phases["prepared"] > 1 and phases["prepared"] == phases["done"])
+    time.sleep(1)
+    assert phases["prepared"] == phases["done"]
@@ -0,0 +1,50 @@
+"""Login of an account shared by plants survives stopping of one plant, it is renewed when the session is rejected."""
+import time
+
+import pytest
+
+from aristonremotethermo.ariston import AristonAccount
+from aristonremotethermo.standin import AristonStandIn
+
+
+@pytest.fixture
+def standin():
+    with AristonStandIn(plants=2, zones=1, seed=1) as server:
+        yield server
+
+
+def _logins(standin):
+    return standin.statistics["requests"].get("login", 0)
+
+
+def test_stopping_one_plant_keeps_login_of_the_others(standin, make_handler, wait):
+    account = AristonAccount("test@example.com", "password")
+    first = make_handler(gw="GW1", account=account, period_get_request=0.1)
+    second = make_handler(gw="GW2", account=account, period_get_request=0.1)
+    first.start()
+    second.start()
+    assert wait(lambda: first.available and second.available)
+    logins = _logins(standin)
+
+    first.stop()
+    reads = standin.statistics["requests"]["data_items"]
+    assert wait(lambda: standin.statistics["requests"]["data_items"] > reads + 3)
+
+    assert account.logged_in
+    assert second.available
+    assert _logins(standin) == logins
+
+
+def test_rejected_session_renews_login(standin, make_handler, wait):
+    account = AristonAccount("test@example.com", "password")
+    handler = make_handler(gw="GW1", account=account, period_get_request=0.1)
+    handler.start()
+    assert wait(lambda: handler.available)
+    logins = _logins(standin)
+
+    standin.clear_sessions()
+
+    assert wait(lambda: _logins(standin) > logins)
+    assert wait(lambda: account.logged_in and handler.available)
+    time.sleep(0.5)
+    assert handler.available
@@ -0,0 +1,99 @@
+"""SQLite sink writes history in batches, prunes it and keeps rollups."""
+import sqlite3
+import time
+
+import pytest
+
+from aristonremotethermo.sink import SQLiteSink
+
+
+# start of a minute, hour and day
+_BASE = 1700006400.0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.db")
+
+
+def _rollup(path, sensor, resolution, bucket):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            "SELECT count, min, max, sum, last, first_ts, integral FROM rollups "
+            "WHERE sensor = ? AND resolution = ? AND bucket = ?", (sensor, resolution, bucket)).fetchone()
+    finally:
+        connection.close()
+
+
+def test_batch_is_written_when_full_and_on_close(path):
+    sink = SQLiteSink(path, batch_interval=60, batch_size=3, retention=None)
+    sink.write_values(_BASE, {"temperature": {"value": 20.5}, "mode": {"value": "Winter"}})
+    time.sleep(0.2)
+    assert sink.statistics["written"] == 0
+
+    sink.write_values(_BASE + 1, {"temperature": {"value": 21.0}})
+    deadline = time.monotonic() + 5
+    while sink.statistics["written"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sink.statistics["written"] == 3
+    assert sink.statistics["transactions"] == 1
+
+    sink.write_values(_BASE + 2, {"temperature": {"value": 21.5}})
+    sink.write_energy(_BASE + 2, {"ch_gas_today": {"2023_Nov_15_02": 1.5}})
+    sink.close()
+
+    assert sink.query("temperature") == [(_BASE, 20.5), (_BASE + 1, 21.0), (_BASE + 2, 21.5)]
+    assert sink.query("mode") == [(_BASE, "Winter")]
+    assert sink.statistics == {"written": 5, "transactions": 2, "late": 0, "pending": 0}
+
+
+def test_old_samples_and_rollups_are_pruned(path):
+    now = time.time()
+    sink = SQLiteSink(path, batch_interval=0, retention=100, rollups={60: 200, 3600: None})
+    sink.write_values(now - 1000, {"temperature": 20.0})
+    sink.write_values(now, {"temperature": 21.0})
+    sink.close()
+
+    assert [value for _, value in sink.query("temperature")] == [21.0]
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute("SELECT resolution, count(*) FROM rollups GROUP BY resolution ORDER BY resolution").fetchall()
+    finally:
+        connection.close()
+    old_hour = now - 1000 - (now - 1000) % 3600
+    assert rows == [(60, 1), (3600, 1 if old_hour == now - now % 3600 else 2)]
+
+
+def test_rollup_values(path):
+    sink = SQLiteSink(path, batch_interval=60, retention=None, rollups={60: None, 3600: None})
+    for offset, value in ((0, 10.0), (20, 30.0), (50, 20.0)):
+        sink.write_values(_BASE + offset, {"temperature": value})
+    sink.close()
+
+    # values hold until the next sample, the last one to the end of the bucket
+    assert _rollup(path, "temperature", 60, _BASE) == (3, 10.0, 30.0, 60.0, 20.0, _BASE, 10 * 20 + 30 * 30 + 20 * 10)
+    assert _rollup(path, "temperature", 3600, _BASE) == (3, 10.0, 30.0, 60.0, 20.0, _BASE, 10 * 20 + 30 * 30 + 20 * 3550)
+
+
+def test_samples_of_a_batch_are_rolled_up_in_time_order(path):
+    sink = SQLiteSink(path, batch_interval=60, retention=None, rollups={60: None})
+    sink.write_values(_BASE + 50, {"temperature": 20.0})
+    sink.write_values(_BASE, {"temperature": 10.0})
+    sink.close()
+
+    assert _rollup(path, "temperature", 60, _BASE) == (2, 10.0, 20.0, 30.0, 20.0, _BASE, 10 * 50 + 20 * 10)
+
+
+def test_late_sample_is_kept_out_of_rollups(path):
+    sink = SQLiteSink(path, batch_interval=0, retention=None, rollups={60: None})
+    sink.write_values(_BASE, {"temperature": 10.0})
+    sink.write_values(_BASE + 50, {"temperature": 20.0})
+    sink.close()
+    late = SQLiteSink(path, batch_interval=0, retention=None, rollups={60: None})
+    late.write_values(_BASE + 20, {"temperature": 30.0})
+    late.close()
+
+    assert late.statistics["late"] == 1
+    assert [value for _, value in late.query("temperature")] == [10.0, 30.0, 20.0]
+    assert _rollup(path, "temperature", 60, _BASE) == (2, 10.0, 20.0, 30.0, 20.0, _BASE, 10 * 50 + 20 * 10)